@@ -0,0 +1,185 @@
+# Import necessary modules
+# math for the growth term of the adaptive limit
+# cachetools for the size-bounded token bucket tables
+# Typed settings for the limits
+# Metrics for the limit, admitted requests and rejections
+
+import math
+import time
+from typing import Dict, Optional
+
+from cachetools import LRUCache
+
+from app.core.config import get_settings
+from app.core.metrics import admission_in_flight, admission_limit, admission_rejections_total
+
+# Whether the admission middleware limits requests at all
+ADMISSION_CONTROL = get_settings().admission_control
+
+# Priority classes, a higher class is shed later
+PUBLIC, OPERATOR_READ, OPERATOR_WRITE = 0, 1, 2
+PRIORITY_NAMES = {PUBLIC: "public", OPERATOR_READ: "operator_read", OPERATOR_WRITE: "operator_write"}
+
+# Share of the concurrency limit each class may fill
+# Anonymous reads are shed once half the limit is in use, operator reads at 80%,
+# and operator writes only when the whole limit is in use
+PRIORITY_SHARES = {PUBLIC: 0.5, OPERATOR_READ: 0.8, OPERATOR_WRITE: 1.0}
+
+
+# Concurrency limit adapting to observed latency, after Netflix's gradient limiter
+# A long-term average latency stands for the healthy baseline; when the recent
+# average rises above it the limit shrinks by their ratio, otherwise it grows by
+# about the square root of the limit so it probes for more capacity
+class AdaptiveLimit:
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        smoothing: float = 0.2,
+        tolerance: float = 1.5,
+        long_window: int = 600,
+        short_window: int = 10,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.smoothing = smoothing
+        self.tolerance = tolerance
+        self.long_window = long_window
+        self.short_window = short_window
+        self._long_latency: Optional[float] = None
+        self._short_latency: Optional[float] = None
+        admission_limit.set(value=self.limit)
+
+    # Update the limit with the latency of a finished request
+    def update(self, latency: float, in_flight: int) -> None:
+        if self._long_latency is None:
+            self._long_latency = self._short_latency = latency
+            return
+        self._long_latency += (latency - self._long_latency) / self.long_window
+        self._short_latency += (latency - self._short_latency) / self.short_window
+        # After a long overload the baseline itself is inflated, let it recover faster
+        if self._long_latency > 2 * self._short_latency:
+            self._long_latency *= 0.95
+        # The limit says nothing about capacity while far from being reached
+        if in_flight < self.limit / 2:
+            return
+        gradient = max(0.5, min(1.0, self.tolerance * self._long_latency / self._short_latency))
+        target = self.limit * gradient + math.sqrt(self.limit)
+        limit = self.limit * (1 - self.smoothing) + target * self.smoothing
+        self.limit = max(self.min_limit, min(self.max_limit, limit))
+        admission_limit.set(value=self.limit)
+
+
+# Token buckets keyed by client IP, organization or any other string
+# Buckets are kept in an LRU so a flood of distinct keys cannot grow memory;
+# an evicted key starts again with a full bucket
+class TokenBuckets:
+    def __init__(self, rate: float, burst: int, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: LRUCache = LRUCache(maxsize=max_keys)
+
+    # Take a token for the key
+    # Returns 0 when one was available, otherwise the seconds until there is one
+    def take(self, key: str) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            return 0.0
+        self._buckets[key] = (tokens, now)
+        return (1 - tokens) / self.rate
+
+
+# Admission controller of the worker
+# Every admitted request holds a slot until it finishes; public requests must also
+# get a token from their client IP's and organization's buckets first, and requests
+# with credentials, which are not verified yet, from their client IP's own bucket.
+# Only used from the event loop, so it needs no lock
+class AdmissionController:
+    def __init__(
+        self,
+        limit: AdaptiveLimit,
+        ip_buckets: TokenBuckets,
+        org_buckets: TokenBuckets,
+        credential_ip_buckets: TokenBuckets,
+    ):
+        self.limit = limit
+        self.ip_buckets = ip_buckets
+        self.org_buckets = org_buckets
+        self.credential_ip_buckets = credential_ip_buckets
+        self.in_flight = 0
+        self._in_flight_by_priority: Dict[int, int] = {priority: 0 for priority in PRIORITY_NAMES}
+
+    # Take tokens for a public request
+    # Returns 0 when admitted, otherwise the seconds the client should wait
+    def rate_limit(self, client_ip: Optional[str], org_key: Optional[str]) -> float:
+        if client_ip is not None:
+            wait = self.ip_buckets.take(client_ip)
+            if wait:
+                admission_rejections_total.inc(PRIORITY_NAMES[PUBLIC], "ip_rate")
+                return wait
+        if org_key is not None:
+            wait = self.org_buckets.take(org_key)
+            if wait:
+                admission_rejections_total.inc(PRIORITY_NAMES[PUBLIC], "org_rate")
+                return wait
+        return 0.0
+
+    # Take a token for a request carrying credentials
+    # Anyone can send a made-up token, so operator requests are rate limited per client
+    # IP as well, with a larger bucket than public ones
+    # Returns 0 when admitted, otherwise the seconds the client should wait
+    def rate_limit_credentials(self, client_ip: Optional[str], priority: int) -> float:
+        if client_ip is None:
+            return 0.0
+        wait = self.credential_ip_buckets.take(client_ip)
+        if wait:
+            admission_rejections_total.inc(PRIORITY_NAMES[priority], "ip_rate")
+        return wait
+
+    # Take a concurrency slot, False when the request should be shed
+    def try_acquire(self, priority: int) -> bool:
+        if self.in_flight >= self.limit.limit * PRIORITY_SHARES[priority]:
+            admission_rejections_total.inc(PRIORITY_NAMES[priority], "concurrency")
+            return False
+        self.in_flight += 1
+        self._in_flight_by_priority[priority] += 1
+        admission_in_flight.inc(PRIORITY_NAMES[priority])
+        return True
+
+    # Give back a slot, feeding the request's latency to the adaptive limit
+    def release(self, priority: int, latency: float) -> None:
+        self.limit.update(latency, self.in_flight)
+        self.in_flight -= 1
+        self._in_flight_by_priority[priority] -= 1
+        admission_in_flight.dec(PRIORITY_NAMES[priority])
+
+    # Expose the limit and admitted requests for monitoring
+    def stats(self) -> Dict[str, float]:
+        return {
+            "limit": round(self.limit.limit, 1),
+            "in_flight": self.in_flight,
+            **{
+                PRIORITY_NAMES[priority]: count
+                for priority, count in self._in_flight_by_priority.items()
+            },
+        }
+
+
+# Shared admission controller for the worker
+admission = AdmissionController(
+    AdaptiveLimit(
+        get_settings().admission_initial_limit,
+        get_settings().admission_min_limit,
+        get_settings().admission_max_limit,
+    ),
+    TokenBuckets(get_settings().admission_ip_rate, get_settings().admission_ip_burst),
+    TokenBuckets(get_settings().admission_org_rate, get_settings().admission_org_burst),
+    TokenBuckets(
+        get_settings().admission_credential_ip_rate, get_settings().admission_credential_ip_burst
+    ),
+)
@@ -0,0 +1,581 @@
+# Import necessary modules
+# cachetools for the window in which repeated alerts are dropped
+# pymongo's UpdateOne for writing the incidents of many services in one bulk write
+# Custom models for API keys, incidents, services and audit log entries
+# Service status write path shared with the batch status endpoint and health checks
+# Websocket manager, static status pages, status streams and analytics told about
+# the incidents
+# Metrics for ingested alerts and flushes
+#
+# External monitors (Alertmanager, Datadog webhooks) post batches of alerts. Each
+# alert names a service by label or tag and is either firing or resolved. Requests
+# only parse and queue their alerts; a background task writes the queue every
+# INGEST_FLUSH_INTERVAL seconds with a few queries and bulk writes per organization,
+# whatever the number of alerts.
+# While alerts of a service fire, it has one open incident listing their fingerprints.
+# Its severity is that of the worst alert seen while open, and the service takes the
+# matching status. When the last alert resolves, the incident is resolved and the
+# service is operational again. A unique index on the open incident of a service and
+# atomic $addToSet / $pull of the fingerprints keep workers ingesting alerts of the
+# same service from opening two incidents or losing alerts.
+
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from cachetools import TTLCache
+from pymongo import UpdateOne
+
+from app.core.circuit_breaker import guarded
+from app.core.config import get_settings
+from app.core.incident_analytics import invalidate_incident_analytics
+from app.core.logger import logger
+from app.core.metrics import (
+    ingest_alerts_total,
+    ingest_flush_duration_seconds,
+    ingest_pending_alerts,
+)
+from app.core.service_status import apply_service_statuses
+from app.core.status_page import schedule_status_export
+from app.core.status_stream import publish_status_events
+from app.core.tracing import span
+from app.models.api_key_model import ApiKey
+from app.models.incident_model import (
+    ALERT_FIELDS,
+    AffectedService,
+    Incident,
+    IncidentSeverity,
+    IncidentStatus,
+    IncidentUpdate,
+)
+from app.models.log_model import ChangeType, EntityType, LogEntry
+from app.models.service_model import Service, ServiceStatus
+from app.websocket_manager import broadcast_message
+
+# Seconds a repeated alert with the same state is dropped
+INGEST_DEDUPE_WINDOW = get_settings().ingest_dedupe_window
+# Seconds between writes of the queued alerts
+INGEST_FLUSH_INTERVAL = get_settings().ingest_flush_interval
+# Alerts queued at most; requests beyond are refused until a flush made room
+INGEST_MAX_PENDING = get_settings().ingest_max_pending
+# Alerts of one organization queued at most, so one sender cannot fill the queue
+INGEST_MAX_PENDING_PER_ORG = get_settings().ingest_max_pending_per_org
+# Alerts one request may carry
+INGEST_MAX_BATCH = get_settings().ingest_max_batch
+
+# Alert states remembered for deduplication, by organization and fingerprint
+DEDUPE_CAPACITY = 1_000_000
+# Labels and tags naming the service of an alert, the first one present wins
+SERVICE_LABELS = ("status_page_service", "service")
+# Service status while an alert of the given severity fires; unknown severities
+# count as outages, like a failing health check
+SEVERITY_STATUSES = {
+    "critical": ServiceStatus.OUTAGE,
+    "error": ServiceStatus.OUTAGE,
+    "page": ServiceStatus.OUTAGE,
+    "warning": ServiceStatus.DEGRADED_PERFORMANCE,
+    "warn": ServiceStatus.DEGRADED_PERFORMANCE,
+    "minor": ServiceStatus.DEGRADED_PERFORMANCE,
+    "info": ServiceStatus.DEGRADED_PERFORMANCE,
+}
+# Incident severity for the worst status of a service's firing alerts
+INCIDENT_SEVERITIES = {
+    ServiceStatus.OUTAGE: IncidentSeverity.CRITICAL,
+    ServiceStatus.DEGRADED_PERFORMANCE: IncidentSeverity.MAJOR,
+}
+# Incident severities from the least to the most severe
+SEVERITY_ORDER = [IncidentSeverity.MINOR, IncidentSeverity.MAJOR, IncidentSeverity.CRITICAL]
+# Datadog transitions and alert types of a recovered monitor
+DATADOG_RESOLVED = {"recovered", "resolved", "success"}
+# Transition prefixes Datadog puts in event titles, e.g. "[Triggered] " or "[P1] [Warn] "
+DATADOG_TITLE_PREFIX = re.compile(r"^(\s*\[[^\]]*\])+\s*")
+# Characters of alert titles and descriptions kept
+MAX_TEXT_LENGTH = 500
+
+
+# Raised when the queue is full; the sender should retry later
+class IngestQueueFull(Exception):
+    pass
+
+
+# Alert taken from a webhook payload
+@dataclass
+class Alert:
+    fingerprint: str  # Stable across the firing and resolved notifications of one alert
+    service: str  # Name or ID of the service
+    firing: bool
+    status: ServiceStatus  # Status of the service while the alert fires
+    title: str
+    description: str
+
+
+def _text(value: Any) -> str:
+    return str(value)[:MAX_TEXT_LENGTH] if value is not None else ""
+
+
+def _hash(*parts: Any) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _status_for(severity: Any) -> ServiceStatus:
+    return SEVERITY_STATUSES.get(str(severity).lower(), ServiceStatus.OUTAGE)
+
+
+# Alerts of an Alertmanager webhook, the service named by a label
+def _alertmanager_alerts(payload: Dict[str, Any]) -> List[Optional[Alert]]:
+    alerts: List[Optional[Alert]] = []
+    for item in payload["alerts"]:
+        labels = item.get("labels") or {}
+        annotations = item.get("annotations") or {}
+        service = next((labels[name] for name in SERVICE_LABELS if labels.get(name)), None)
+        if service is None:
+            alerts.append(None)
+            continue
+        alerts.append(
+            Alert(
+                fingerprint=_text(item.get("fingerprint") or _hash(labels)),
+                service=_text(service),
+                firing=(item.get("status") or payload.get("status")) != "resolved",
+                status=_status_for(labels.get("severity")),
+                title=_text(annotations.get("summary") or labels.get("alertname") or "Alert"),
+                description=_text(annotations.get("description")),
+            )
+        )
+    return alerts
+
+
+# Alert of a Datadog webhook event, the service named by a tag
+# Tags are a comma separated string in the default payload, a list in custom ones
+def _datadog_alert(event: Dict[str, Any]) -> Optional[Alert]:
+    tags = event.get("tags") or []
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    values = dict(tag.strip().split(":", 1) for tag in tags if ":" in tag)
+    service = next((values[name] for name in SERVICE_LABELS if values.get(name)), None)
+    if service is None:
+        return None
+    transition = str(event.get("alert_transition") or "").lower()
+    alert_type = str(event.get("alert_type") or "").lower()
+    title = event.get("title") or event.get("alert_title") or "Alert"
+    # Without an ID, the title less its transition prefix identifies the alert, so the
+    # recovery matches the notification that triggered it
+    fingerprint = event.get("aggregate") or event.get("alert_id")
+    if not fingerprint:
+        fingerprint = _hash(DATADOG_TITLE_PREFIX.sub("", str(title)), service)
+    return Alert(
+        fingerprint=_text(fingerprint),
+        service=_text(service),
+        firing=transition not in DATADOG_RESOLVED and alert_type not in DATADOG_RESOLVED,
+        status=_status_for("warning" if transition == "warn" else alert_type or "error"),
+        title=_text(title),
+        description=_text(event.get("body") or event.get("text_only_msg")),
+    )
+
+
+# Parse a webhook payload into its alerts, None for alerts naming no service
+# Alertmanager payloads carry an "alerts" list; anything else is taken as one Datadog
+# event or a list of them. Raises ValueError for payloads of neither shape
+def parse_alerts(payload: Any) -> List[Optional[Alert]]:
+    try:
+        if isinstance(payload, dict) and isinstance(payload.get("alerts"), list):
+            return _alertmanager_alerts(payload)
+        events = payload if isinstance(payload, list) else [payload]
+        return [_datadog_alert(event) for event in events]
+    except (AttributeError, TypeError) as e:
+        raise ValueError(f"Unsupported alert payload: {e}")
+
+
+def _severity_rank(severity: Optional[IncidentSeverity]) -> int:
+    return SEVERITY_ORDER.index(severity) if severity in SEVERITY_ORDER else -1
+
+
+# Service status while an incident of the given severity is open
+def _status_of(severity: Optional[IncidentSeverity]) -> ServiceStatus:
+    if severity == IncidentSeverity.CRITICAL:
+        return ServiceStatus.OUTAGE
+    return ServiceStatus.DEGRADED_PERFORMANCE
+
+
+# Queue of ingested alerts, written in bulk by a background task
+# Alerts are queued by organization and fingerprint, so an alert repeated before the
+# next flush is written once, in its latest state. Alerts repeating a state already
+# queued or written within INGEST_DEDUPE_WINDOW seconds are dropped on arrival; the
+# window is per worker, alerts repeated on another worker are merged by the database.
+class AlertPipeline:
+    def __init__(
+        self,
+        flush_interval: float = INGEST_FLUSH_INTERVAL,
+        max_pending: int = INGEST_MAX_PENDING,
+        max_pending_per_org: int = INGEST_MAX_PENDING_PER_ORG,
+        dedupe_window: float = INGEST_DEDUPE_WINDOW,
+    ):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_pending_per_org = max_pending_per_org
+        # Organization ID -> fingerprint -> latest alert and the key that sent it
+        self._pending: Dict[ObjectId, Dict[str, Tuple[Alert, ApiKey]]] = {}
+        self._count = 0
+        # (organization ID, fingerprint) -> whether the alert was last seen firing, and
+        # with which status
+        self._seen: TTLCache = TTLCache(maxsize=DEDUPE_CAPACITY, ttl=dedupe_window)
+        self._full = asyncio.Event()
+
+    # Queue the alerts a key sent, returning how many were queued, merged into a queued
+    # alert, dropped as duplicates and dropped for naming no service
+    # Raises IngestQueueFull, for the whole batch, when they would not fit in the queue
+    # or in the organization's share of it
+    def submit(self, api_key: ApiKey, alerts: List[Optional[Alert]]) -> Dict[str, int]:
+        pending = self._pending.get(api_key.org_id, {})  # type: ignore
+        if (
+            self._count + len(alerts) > self.max_pending
+            or len(pending) + len(alerts) > self.max_pending_per_org
+        ):
+            ingest_alerts_total.inc("refused", amount=len(alerts))
+            raise IngestQueueFull()
+        counts = {"accepted": 0, "duplicate": 0, "coalesced": 0, "unmatched": 0}
+        pending = self._pending.setdefault(api_key.org_id, {})  # type: ignore
+        for alert in alerts:
+            if alert is None:
+                counts["unmatched"] += 1
+                continue
+            key = (api_key.org_id, alert.fingerprint)
+            state = (alert.firing, alert.status)
+            if self._seen.get(key) == state:
+                counts["duplicate"] += 1
+                continue
+            self._seen[key] = state
+            if alert.fingerprint in pending:
+                counts["coalesced"] += 1
+            else:
+                counts["accepted"] += 1
+                self._count += 1
+            pending[alert.fingerprint] = (alert, api_key)
+        for result, count in counts.items():
+            if count:
+                ingest_alerts_total.inc(result, amount=count)
+        ingest_pending_alerts.set(value=self._count)
+        # Write early rather than refuse the next batch
+        if (
+            self._count >= self.max_pending // 2
+            or len(pending) >= self.max_pending_per_org // 2
+        ):
+            self._full.set()
+        return counts
+
+    # Flush every flush_interval seconds, or as soon as the queue is half full
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+    # Write the queued alerts, the organizations concurrently
+    # Alerts of an organization that could not be written are queued again for the next
+    # flush, as their senders were already answered 202
+    async def flush(self) -> None:
+        pending, self._pending, self._count = self._pending, {}, 0
+        ingest_pending_alerts.set(value=0)
+        if not pending:
+            return
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(write_alerts(org_id, list(alerts.values())) for org_id, alerts in pending.items()),
+            return_exceptions=True,
+        )
+        for (org_id, alerts), result in zip(pending.items(), results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to write {len(alerts)} alerts of org {org_id}: {result}")
+                self._requeue(org_id, alerts)
+        ingest_flush_duration_seconds.observe(time.perf_counter() - start)
+
+    # Queue alerts that failed to write again, unless a newer state of the same alert
+    # arrived meanwhile. Alerts beyond the caps are dropped and forgotten by the
+    # deduplication, so the sender's next notification of them is accepted again
+    def _requeue(self, org_id: ObjectId, alerts: Dict[str, Tuple[Alert, ApiKey]]) -> None:
+        pending = self._pending.setdefault(org_id, {})
+        dropped = 0
+        for fingerprint, entry in alerts.items():
+            if fingerprint in pending:
+                continue
+            if self._count >= self.max_pending or len(pending) >= self.max_pending_per_org:
+                self._seen.pop((org_id, fingerprint), None)
+                dropped += 1
+                continue
+            pending[fingerprint] = entry
+            self._count += 1
+        if not pending:
+            del self._pending[org_id]
+        if dropped:
+            logger.error(f"Dropped {dropped} alerts of org {org_id} that did not fit the queue")
+            ingest_alerts_total.inc("dropped", amount=dropped)
+        ingest_pending_alerts.set(value=self._count)
+
+
+# Find the services of an organization the alerts name, by ID or name
+async def _resolve_services(org_id: ObjectId, names: Set[str]) -> Dict[str, Service]:
+    ids = [ObjectId(name) for name in names if ObjectId.is_valid(name)]
+    services = await Service.find_all(
+        {"org_id": org_id, "$or": [{"name": {"$in": list(names)}}, {"_id": {"$in": ids}}]},
+        limit=0,
+    )
+    by_name: Dict[str, Service] = {}
+    for service in services:
+        by_name[service.name] = service
+        by_name[str(service.id)] = service
+    return by_name
+
+
+# Fields of a new alert incident, written only when the upsert inserts it
+def _new_incident(
+    org_id: ObjectId, service: Service, alerts: List[Alert], api_key: ApiKey, now: datetime
+) -> Dict[str, Any]:
+    worst = max(alerts, key=lambda alert: _severity_rank(INCIDENT_SEVERITIES[alert.status]))
+    incident = Incident(
+        title=f"{service.name}: {worst.title}",
+        description=worst.description or f"Opened by alert {worst.fingerprint}",
+        status=IncidentStatus.INVESTIGATING,
+        severity=INCIDENT_SEVERITIES[worst.status],
+        affected_services=[
+            AffectedService(
+                service_id=service.id,  # type: ignore
+                service_name=service.name,
+                status=worst.status,
+                created_at=now,
+            )
+        ],
+        org_id=org_id,
+        started_at=now,
+        updates=[
+            IncidentUpdate(
+                message=f"Alert firing: {alert.title}",
+                created_by=api_key.created_by,
+                created_by_username=api_key.name,
+                created_at=now,
+            )
+            for alert in alerts
+        ],
+        created_at=now,
+        created_by=api_key.created_by,
+        created_by_username=api_key.name,
+    )
+    document = incident.dict(by_alias=True, exclude_none=True)
+    for field in ("_id", "alert_key", "alert_fingerprints", "updated_at"):
+        document.pop(field, None)
+    return document
+
+
+# Write the queued alerts of one organization
+# 1. add and remove the fingerprints of each service's open incident, opening it if
+#    needed, in one bulk write
+# 2. read the incidents back and, in a second bulk write, resolve those left without
+#    firing alerts and raise the severity of those with worse ones
+# 3. set the service statuses and tell clients about the changed incidents
+async def write_alerts(org_id: ObjectId, entries: List[Tuple[Alert, ApiKey]]) -> None:
+    now = datetime.utcnow()
+    services = await _resolve_services(org_id, {alert.service for alert, _ in entries})
+    firing: Dict[ObjectId, List[Alert]] = defaultdict(list)
+    resolved: Dict[ObjectId, List[str]] = defaultdict(list)
+    by_id: Dict[ObjectId, Service] = {}
+    api_keys: Dict[ObjectId, ApiKey] = {}
+    unmatched = 0
+    for alert, api_key in entries:
+        service = services.get(alert.service)
+        if service is None:
+            unmatched += 1
+            continue
+        by_id[service.id] = service  # type: ignore
+        api_keys[service.id] = api_key  # type: ignore
+        if alert.firing:
+            firing[service.id].append(alert)  # type: ignore
+        else:
+            resolved[service.id].append(alert.fingerprint)  # type: ignore
+    if unmatched:
+        ingest_alerts_total.inc("unmatched", amount=unmatched)
+    if not by_id:
+        return
+
+    # Open or update the incident of every service in one bulk write
+    operations = []
+    for service_id, alerts in firing.items():
+        operations.append(
+            UpdateOne(
+                {"alert_key": str(service_id)},
+                {
+                    "$addToSet": {
+                        "alert_fingerprints": {"$each": [alert.fingerprint for alert in alerts]}
+                    },
+                    "$set": {"updated_at": now},
+                    "$setOnInsert": _new_incident(
+                        org_id, by_id[service_id], alerts, api_keys[service_id], now
+                    ),
+                },
+                upsert=True,
+            )
+        )
+    for service_id, fingerprints in resolved.items():
+        operations.append(
+            UpdateOne(
+                {"alert_key": str(service_id)},
+                {
+                    "$pull": {"alert_fingerprints": {"$in": fingerprints}},
+                    "$set": {"updated_at": now},
+                },
+            )
+        )
+    collection = Incident.collection()
+    with span("db.bulk_write", collection=collection.name) as current:
+        result = await guarded(collection.bulk_write, operations, ordered=False)
+        current.set_attribute("count", len(operations))
+    created = set(result.upserted_ids.values())
+
+    # Resolve incidents without firing alerts and escalate the others
+    incidents = await Incident.find_all({"alert_key": {"$in": [str(i) for i in by_id]}}, limit=0)
+    Incident.invalidate_cache([incident.id for incident in incidents])
+    operations = []
+    changed: Dict[ObjectId, Incident] = {}
+    resolving: List[ObjectId] = []
+    for incident in incidents:
+        service_id = ObjectId(incident.alert_key)
+        api_key = api_keys[service_id]
+        if not incident.alert_fingerprints:
+            update = IncidentUpdate(
+                message="All alerts resolved",
+                created_by=api_key.created_by,
+                created_by_username=api_key.name,
+                created_at=now,
+            )
+            # Another worker may have added an alert since it was read
+            operations.append(
+                UpdateOne(
+                    {"_id": incident.id, "alert_fingerprints": {"$size": 0}},
+                    {
+                        "$set": {
+                            "status": IncidentStatus.RESOLVED.value,
+                            "resolved_at": now,
+                            "alert_key": None,
+                        },
+                        "$push": {"updates": update.dict(by_alias=True, exclude_none=True)},
+                    },
+                )
+            )
+            incident.status, incident.resolved_at = IncidentStatus.RESOLVED, now
+            incident.updates = [*(incident.updates or []), update]
+            resolving.append(incident.id)  # type: ignore
+            changed[service_id] = incident
+            continue
+        worst = max(
+            (INCIDENT_SEVERITIES[alert.status] for alert in firing.get(service_id, [])),
+            key=_severity_rank,
+            default=None,
+        )
+        if _severity_rank(worst) > _severity_rank(incident.severity):
+            incident.severity = worst
+            operations.append(
+                UpdateOne({"_id": incident.id}, {"$set": {"severity": worst.value}})  # type: ignore
+            )
+            changed[service_id] = incident
+        elif incident.id in created:
+            changed[service_id] = incident
+    if operations:
+        with span("db.bulk_write", collection=collection.name) as current:
+            result = await guarded(collection.bulk_write, operations, ordered=False)
+            current.set_attribute("count", len(operations))
+        Incident.invalidate_cache([incident.id for incident in changed.values()])
+        # Incidents that got a new alert meanwhile stay open, their writer reports them
+        if resolving and result.modified_count < len(operations):
+            still_open = set(
+                await Incident.find_values("_id", {"_id": {"$in": resolving}, "resolved_at": None})
+            )
+            changed = {
+                service_id: incident
+                for service_id, incident in changed.items()
+                if incident.id not in still_open
+            }
+    if not changed:
+        return
+
+    # Services follow their incident: the status of its severity while open, operational
+    # once resolved; services in maintenance are left alone
+    statuses: Dict[Any, ServiceStatus] = {
+        service_id: (
+            ServiceStatus.OPERATIONAL
+            if incident.resolved_at
+            else _status_of(incident.severity)
+        )
+        for service_id, incident in changed.items()
+    }
+    targets = [
+        by_id[service_id]
+        for service_id in statuses
+        if by_id[service_id].status != ServiceStatus.MAINTENANCE
+    ]
+    if targets:
+        await apply_service_statuses(
+            org_id, targets, statuses, api_keys[targets[0].id].created_by  # type: ignore
+        )
+
+    # Log and broadcast the changed incidents like the incident endpoints do
+    log_errors = await LogEntry.insert_many(
+        [
+            LogEntry(
+                entity_id=incident.id,
+                entity_type=EntityType.INCIDENT,
+                change_type=ChangeType.CREATE if incident.id in created else ChangeType.UPDATE,
+                changes={
+                    "name": incident.title,
+                    "description": incident.description,
+                    "status": incident.status,
+                    "severity": incident.severity,
+                },
+                org_id=org_id,
+                created_by=api_keys[service_id].created_by,
+            )
+            for service_id, incident in changed.items()
+        ]
+    )
+    if log_errors:
+        logger.error(f"Failed to log {len(log_errors)} incidents opened by alerts")
+    events = []
+    for incident in changed.values():
+        action = "create" if incident.id in created else "update"
+        await broadcast_message(
+            {"type": "incident", "data": incident.model_dump_json(), "action": action}
+        )
+        events.append(("incident", action, incident.model_dump_json(exclude=ALERT_FIELDS)))
+    schedule_status_export(org_id)
+    invalidate_incident_analytics(org_id)
+    publish_status_events(org_id, events)
+
+
+# Pipeline of this worker, flushed by a task started from the app's lifespan
+alert_pipeline = AlertPipeline()
+_pipeline_task: Optional[asyncio.Task] = None
+
+
+def start_alert_ingest() -> None:
+    global _pipeline_task
+    if _pipeline_task is None:
+        _pipeline_task = asyncio.ensure_future(alert_pipeline.run())
+
+
+# Stop flushing periodically and write what is still queued
+async def stop_alert_ingest() -> None:
+    global _pipeline_task
+    if _pipeline_task is not None:
+        _pipeline_task.cancel()
+        try:
+            await _pipeline_task
+        except asyncio.CancelledError:
+            pass
+        _pipeline_task = None
+    await alert_pipeline.flush()
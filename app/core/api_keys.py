@@ -0,0 +1,33 @@
+# Import necessary modules
+# secrets and hashlib for generating keys and storing only their hash
+# Custom API key model
+
+import hashlib
+import secrets
+from typing import Optional, Tuple
+
+from app.models.api_key_model import ApiKey
+
+# Start of every key, so leaked keys are easy to recognize in code and logs
+KEY_PREFIX = "sk_"
+# Characters of a key stored in the clear to tell keys apart
+SHOWN_PREFIX_LENGTH = 8
+
+
+# Hash a key the way it is stored
+# Keys are random, so a plain SHA-256 suffices and lookups stay cheap
+def hash_api_key(key: str) -> str:
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+# Generate a new key, returned with its shown prefix and its hash
+def generate_api_key() -> Tuple[str, str, str]:
+    key = KEY_PREFIX + secrets.token_urlsafe(32)
+    return key, key[: len(KEY_PREFIX) + SHOWN_PREFIX_LENGTH], hash_api_key(key)
+
+
+# Find the API key a request presented, None when it is unknown or revoked
+async def find_api_key(key: str) -> Optional[ApiKey]:
+    if not key.startswith(KEY_PREFIX):
+        return None
+    return await ApiKey.find_one({"key_hash": hash_api_key(key)})
@@ -0,0 +1,240 @@
+# Import necessary modules
+# asyncio for the futures of queued requests and the database semaphores
+# contextvars for the organization of the current request
+# Typed settings for the limits and weights
+# Request deadlines bounding the time spent waiting
+# Metrics for per-tenant load and queue depth
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Deque, Dict, Optional, Set, Tuple
+
+from app.core.config import get_settings
+from app.core.deadlines import DeadlineExceeded, remaining
+from app.core.metrics import (
+    tenant_db_waiting,
+    tenant_in_flight,
+    tenant_queue_depth,
+    tenant_queue_wait_seconds,
+    tenant_rejections_total,
+)
+
+# Whether requests are scheduled per organization at all
+BULKHEADS = get_settings().bulkheads
+
+# Organization of the current request, None outside requests or when unknown
+current_tenant: ContextVar[Optional[str]] = ContextVar("current_tenant", default=None)
+
+
+# Raised when an organization already has too many requests waiting
+class TenantQueueFull(Exception):
+    pass
+
+
+# Scheduling state of one organization, dropped again once it is idle
+class _Tenant:
+    def __init__(self, weight: int):
+        self.weight = max(1, weight)
+        self.in_flight = 0
+        self.last_tag = 0.0
+        # Waiting requests in arrival order, with their virtual finish tags
+        self.queue: Deque[Tuple[float, asyncio.Future]] = deque()
+
+
+# Scheduler sharing a worker's request slots fairly between organizations
+# Each organization runs at most per_tenant_limit requests at once (its bulkhead) and
+# queues at most max_queue more. When slots are scarce, waiting requests are started in
+# weighted fair queuing order: each gets a virtual finish tag advancing by 1 / weight per
+# request of its organization, and the smallest tag goes first. A busy organization
+# therefore waits behind quieter ones instead of in front of them.
+# Only used from the event loop, so it needs no lock
+class FairScheduler:
+    def __init__(
+        self,
+        capacity: int,
+        per_tenant_limit: int,
+        max_queue: int,
+        weights: Optional[Dict[str, int]] = None,
+    ):
+        self.capacity = capacity
+        self.per_tenant_limit = per_tenant_limit
+        self.max_queue = max_queue
+        self.weights = weights or {}
+        self.in_flight = 0
+        self.virtual_time = 0.0
+        self._tenants: Dict[str, _Tenant] = {}
+        self._backlogged: Set[str] = set()
+
+    def _tenant(self, key: str) -> _Tenant:
+        tenant = self._tenants.get(key)
+        if tenant is None:
+            tenant = self._tenants[key] = _Tenant(self.weights.get(key, 1))
+        return tenant
+
+    def _forget_if_idle(self, key: str, tenant: _Tenant) -> None:
+        if tenant.in_flight == 0 and not tenant.queue:
+            del self._tenants[key]
+            tenant_in_flight.remove(key)
+            tenant_queue_depth.remove(key)
+
+    def _start(self, key: str, tenant: _Tenant) -> None:
+        self.in_flight += 1
+        tenant.in_flight += 1
+        tenant_in_flight.set(key, value=tenant.in_flight)
+
+    # Wait for a slot for a request of the organization
+    # Raises TenantQueueFull when its queue is full and DeadlineExceeded when the
+    # request's deadline passes while waiting
+    async def acquire(self, key: str) -> None:
+        tenant = self._tenant(key)
+        if (
+            self.in_flight < self.capacity
+            and tenant.in_flight < self.per_tenant_limit
+            and not tenant.queue
+        ):
+            self._start(key, tenant)
+            return
+        if len(tenant.queue) >= self.max_queue:
+            tenant_rejections_total.inc(key)
+            self._forget_if_idle(key, tenant)
+            raise TenantQueueFull(key)
+
+        tag = max(self.virtual_time, tenant.last_tag) + 1 / tenant.weight
+        tenant.last_tag = tag
+        future = asyncio.get_running_loop().create_future()
+        entry = (tag, future)
+        tenant.queue.append(entry)
+        self._backlogged.add(key)
+        tenant_queue_depth.set(key, value=len(tenant.queue))
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, remaining())
+        except asyncio.TimeoutError:
+            self._abandon(key, tenant, entry)
+            raise DeadlineExceeded("Request deadline exceeded while queued") from None
+        except BaseException:
+            self._abandon(key, tenant, entry)
+            raise
+        finally:
+            tenant_queue_wait_seconds.observe(time.perf_counter() - start)
+
+    # Clean up after a queued request gave up, releasing its slot if it was granted
+    def _abandon(self, key: str, tenant: _Tenant, entry: Tuple[float, asyncio.Future]) -> None:
+        future = entry[1]
+        if future.done() and not future.cancelled():
+            self.release(key)
+            return
+        try:
+            tenant.queue.remove(entry)
+        except ValueError:
+            pass
+        tenant_queue_depth.set(key, value=len(tenant.queue))
+        if not tenant.queue:
+            self._backlogged.discard(key)
+        self._forget_if_idle(key, tenant)
+
+    # Give back the slot of a finished request and start waiting ones
+    def release(self, key: str) -> None:
+        tenant = self._tenants[key]
+        self.in_flight -= 1
+        tenant.in_flight -= 1
+        tenant_in_flight.set(key, value=tenant.in_flight)
+        self._dispatch()
+        self._forget_if_idle(key, tenant)
+
+    # Start the waiting requests with the smallest tags while slots are free
+    def _dispatch(self) -> None:
+        while self.in_flight < self.capacity:
+            best: Optional[str] = None
+            best_tag = 0.0
+            for key in self._backlogged:
+                tenant = self._tenants[key]
+                if tenant.in_flight < self.per_tenant_limit and (
+                    best is None or tenant.queue[0][0] < best_tag
+                ):
+                    best, best_tag = key, tenant.queue[0][0]
+            if best is None:
+                return
+            tenant = self._tenants[best]
+            tag, future = tenant.queue.popleft()
+            tenant_queue_depth.set(best, value=len(tenant.queue))
+            if not tenant.queue:
+                self._backlogged.discard(best)
+            # The request gave up and its task has not removed it yet
+            if future.done():
+                continue
+            self.virtual_time = tag
+            self._start(best, tenant)
+            future.set_result(None)
+
+    # Expose per-organization load for monitoring
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            key: {"in_flight": tenant.in_flight, "queued": len(tenant.queue)}
+            for key, tenant in self._tenants.items()
+        }
+
+
+# Semaphores giving each organization at most a share of the MongoDB pool
+# Without them one organization's queries could hold every pooled connection and
+# make other organizations' operations wait for the pool
+class DatabaseShares:
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        # Per organization: semaphore and the operations holding or awaiting it
+        self._semaphores: Dict[str, list] = {}
+
+    @asynccontextmanager
+    async def slot(self, key: str) -> AsyncIterator[None]:
+        entry = self._semaphores.get(key)
+        if entry is None:
+            entry = self._semaphores[key] = [asyncio.Semaphore(self.limit), 0]
+        semaphore = entry[0]
+        entry[1] += 1
+        try:
+            if semaphore.locked():
+                tenant_db_waiting.inc(key)
+                try:
+                    await asyncio.wait_for(semaphore.acquire(), remaining())
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded("Request deadline exceeded waiting for the pool") from None
+                finally:
+                    tenant_db_waiting.dec(key)
+            else:
+                await semaphore.acquire()
+            try:
+                yield
+            finally:
+                semaphore.release()
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._semaphores[key]
+                tenant_db_waiting.remove(key)
+
+
+# Shared scheduler and pool shares for the worker
+scheduler = FairScheduler(
+    get_settings().tenant_total_concurrency,
+    get_settings().tenant_max_concurrency,
+    get_settings().tenant_max_queue,
+    get_settings().tenant_weights,
+)
+database_shares = DatabaseShares(
+    int(get_settings().mongo_max_pool_size * get_settings().tenant_pool_share)
+)
+
+
+# Hold one of the current organization's database slots for the duration of the block
+# Does nothing without bulkheads or outside a request made for an organization
+@asynccontextmanager
+async def database_slot() -> AsyncIterator[None]:
+    key = current_tenant.get()
+    if not BULKHEADS or key is None:
+        yield
+        return
+    async with database_shares.slot(key):
+        yield
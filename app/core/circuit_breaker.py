@@ -0,0 +1,187 @@
+# Import necessary modules
+# asyncio for bounding operations by the request deadline
+# PyMongo errors to tell database failures from application errors
+# Deadlines of the current request
+# Per-organization shares of the connection pool
+# JSON responses for requests the database cannot serve
+# Metrics for the circuit state and rejected operations
+
+import asyncio
+import math
+import time
+from typing import Any, Awaitable, Callable, List, TypeVar
+
+from fastapi.responses import JSONResponse
+from pymongo.errors import ConnectionFailure, PyMongoError
+
+from app.core.bulkheads import database_slot
+from app.core.config import get_settings
+from app.core.deadlines import DeadlineExceeded, remaining
+from app.core.logger import logger
+from app.core.metrics import (
+    mongo_circuit_rejections_total,
+    mongo_circuit_state,
+    mongo_deadline_exceeded_total,
+)
+
+T = TypeVar("T")
+
+# States of a circuit, as reported by the mongo_circuit_state gauge
+CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+STATE_NAMES = {CLOSED: "closed", HALF_OPEN: "half-open", OPEN: "open"}
+
+
+# Raised instead of calling the database while the circuit is open
+class DatabaseUnavailable(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__("Database unavailable")
+        self.retry_after = retry_after
+
+
+# Whether an error means the database is unhealthy rather than the request wrong
+# Connection problems and timeouts count; duplicate keys or bad queries do not
+def is_database_failure(error: BaseException) -> bool:
+    if isinstance(error, (ConnectionFailure, DeadlineExceeded)):
+        return True
+    return isinstance(error, PyMongoError) and error.timeout
+
+
+# Circuit breaker over the failure rate of a rolling time window
+# Closed: operations run and their outcomes are counted in per-second buckets.
+# Open: operations fail immediately with DatabaseUnavailable for open_seconds.
+# Half-open: a single trial operation runs; success closes the circuit, failure reopens it.
+# Only used from the event loop, so it needs no lock
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float,
+        min_calls: int,
+        window_seconds: int,
+        open_seconds: float,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = max(1, window_seconds)
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._trial_running = False
+        # Per-second [second, calls, failures], indexed by second modulo the window
+        self._buckets: List[List[int]] = [[0, 0, 0] for _ in range(self.window_seconds)]
+        mongo_circuit_state.set(name, value=CLOSED)
+
+    def _set_state(self, state: int) -> None:
+        if state != self.state:
+            logger.warning(
+                f"Circuit {self.name} {STATE_NAMES[self.state]} -> {STATE_NAMES[state]}"
+            )
+        self.state = state
+        mongo_circuit_state.set(self.name, value=state)
+
+    # Seconds until the circuit lets a trial operation through
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    # Let an operation through or raise DatabaseUnavailable
+    # Returns True when the operation is the half-open trial
+    def before_call(self) -> bool:
+        if self.state == CLOSED:
+            return False
+        if self.state == OPEN and self.retry_after() == 0:
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN and not self._trial_running:
+            self._trial_running = True
+            return True
+        mongo_circuit_rejections_total.inc(self.name)
+        raise DatabaseUnavailable(self.retry_after() or self.open_seconds)
+
+    # Raise DatabaseUnavailable while the circuit is open, without starting an operation
+    # For work the breaker cannot wrap, such as cursors streamed by the caller
+    def check(self) -> None:
+        if self.state == OPEN and self.retry_after() > 0:
+            mongo_circuit_rejections_total.inc(self.name)
+            raise DatabaseUnavailable(self.retry_after())
+
+    # Record the outcome of an operation that was let through
+    def after_call(self, failed: bool, trial: bool) -> None:
+        if trial:
+            self._trial_running = False
+            if failed:
+                self._open()
+            else:
+                self._reset()
+            return
+        second = int(time.monotonic())
+        bucket = self._buckets[second % self.window_seconds]
+        if bucket[0] != second:
+            bucket[:] = [second, 0, 0]
+        bucket[1] += 1
+        bucket[2] += failed
+        if failed and self.state == CLOSED:
+            oldest = second - self.window_seconds
+            calls = sum(b[1] for b in self._buckets if b[0] > oldest)
+            failures = sum(b[2] for b in self._buckets if b[0] > oldest)
+            if calls >= self.min_calls and failures / calls >= self.failure_rate:
+                self._open()
+
+    def _open(self) -> None:
+        self._opened_at = time.monotonic()
+        self._set_state(OPEN)
+
+    def _reset(self) -> None:
+        for bucket in self._buckets:
+            bucket[:] = [0, 0, 0]
+        self._set_state(CLOSED)
+
+    # Run an operation through the breaker, bounded by the request deadline
+    # operation is called only when the circuit lets it through, so an open circuit
+    # never hands work to the driver's thread pool
+    async def call(self, operation: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        timeout = remaining()
+        trial = self.before_call()
+        try:
+            result = await asyncio.wait_for(operation(*args, **kwargs), timeout)
+        except asyncio.TimeoutError:
+            mongo_deadline_exceeded_total.inc()
+            self.after_call(True, trial)
+            raise DeadlineExceeded("Request deadline exceeded") from None
+        except BaseException as error:
+            if trial and not isinstance(error, Exception):
+                # Cancelled before an outcome, let the next operation be the trial
+                self._trial_running = False
+            elif isinstance(error, Exception):
+                self.after_call(is_database_failure(error), trial)
+            raise
+        self.after_call(False, trial)
+        return result
+
+
+# Breaker shared by every MongoDB operation of the worker
+mongo_breaker = CircuitBreaker(
+    "mongo",
+    failure_rate=get_settings().circuit_failure_rate,
+    min_calls=get_settings().circuit_min_calls,
+    window_seconds=get_settings().circuit_window_seconds,
+    open_seconds=get_settings().circuit_open_seconds,
+)
+
+
+# Run a MongoDB operation through the shared breaker, see CircuitBreaker.call
+# The operation first waits for a slot in its organization's share of the pool
+async def guarded(operation: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+    async with database_slot():
+        return await mongo_breaker.call(operation, *args, **kwargs)
+
+
+# Response for a request the database could not serve in time
+# 503 with Retry-After while the circuit is open, 504 when the deadline passed
+def unavailable_response(error: Exception) -> JSONResponse:
+    if isinstance(error, DatabaseUnavailable):
+        return JSONResponse(
+            {"detail": "Service temporarily unavailable"},
+            status_code=503,
+            headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))},
+        )
+    return JSONResponse({"detail": "Request deadline exceeded"}, status_code=504)
@@ -0,0 +1,235 @@
+# Import necessary modules
+# dataclasses for the typed settings object
+# dotenv for loading environment variables from a .env file, once per process
+# lru_cache so every module shares the same settings instance
+
+import os
+import secrets
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+from dotenv import load_dotenv
+
+T = TypeVar("T")
+
+
+# Parse a boolean environment variable such as "true", "1" or "yes"
+def _bool(value: str) -> bool:
+    if value.lower() in ("1", "true", "yes", "on"):
+        return True
+    if value.lower() in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(value)
+
+
+# Parse a shard such as "0/4" into (index, count)
+def _shard(value: str) -> Tuple[int, int]:
+    index, separator, count = value.partition("/")
+    if not separator or not 0 <= int(index) < int(count):
+        raise ValueError(value)
+    return int(index), int(count)
+
+
+# Parse a comma-separated list of key=integer pairs, e.g. "/a=500,/b=0"
+def _int_mapping(value: str) -> Dict[str, int]:
+    mapping = {}
+    for item in value.split(","):
+        key, separator, number = item.strip().rpartition("=")
+        if not separator or not key:
+            raise ValueError(value)
+        mapping[key] = int(number)
+    return mapping
+
+
+# Read an environment variable, converting it with cast
+# Unset and empty variables return the default
+def _env(name: str, default: Optional[T] = None, cast: Callable[[str], T] = str) -> Optional[T]:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        raise ValueError(f"Invalid value for {name}: {value!r}")
+
+
+# Application settings, read from the environment once per process
+@dataclass(frozen=True)
+class Settings:
+    # ========== MongoDB ==========
+    mongo_url: str
+    mongo_db: str
+    mongo_max_pool_size: int  # Connections per server in the pool
+    mongo_min_pool_size: int  # Connections kept open while idle
+    mongo_max_idle_time_ms: Optional[int]  # Idle time before a pooled connection is closed
+    mongo_server_selection_timeout_ms: int  # Time to find a suitable server before failing
+    mongo_socket_timeout_ms: Optional[int]  # Time a socket read or write may block
+    mongo_compressors: Optional[str]  # Wire compression, e.g. "zstd,snappy,zlib"
+    mongo_zlib_compression_level: Optional[int]  # -1 to 9, only used with zlib
+    mongo_secondary_reads: bool  # Route staleness-tolerant reads to secondaries
+    mongo_max_staleness_seconds: int  # Maximum replication lag of those secondaries
+    # ========== Deadlines and circuit breaker ==========
+    request_budget_ms: int  # Database time budget of a request, 0 disables deadlines
+    route_budgets_ms: Dict[str, int]  # Budgets per route template, 0 for no deadline
+    circuit_failure_rate: float  # Share of failed operations that opens the circuit
+    circuit_min_calls: int  # Operations in the window before the rate is considered
+    circuit_window_seconds: int  # Rolling window the failure rate is computed over
+    circuit_open_seconds: float  # Time the circuit stays open before a trial operation
+    status_stale_ttl: int  # Seconds a status page may be served stale while the DB is down
+    # ========== Admission control ==========
+    admission_control: bool  # Limit concurrency and rate limit public routes
+    admission_initial_limit: int  # Concurrent requests admitted before latency is known
+    admission_min_limit: int  # Lower bound of the adaptive concurrency limit
+    admission_max_limit: int  # Upper bound of the adaptive concurrency limit
+    admission_ip_rate: float  # Public requests per second per client IP
+    admission_ip_burst: int  # Public requests a client IP may burst
+    admission_org_rate: float  # Public requests per second per organization
+    admission_org_burst: int  # Public requests an organization may burst
+    admission_credential_ip_rate: float  # Requests with credentials per second per client IP
+    admission_credential_ip_burst: int  # Requests with credentials a client IP may burst
+    admission_trusted_proxies: int  # Proxies in front of the app adding X-Forwarded-For
+    # ========== Tenant bulkheads ==========
+    bulkheads: bool  # Schedule requests fairly between organizations
+    tenant_total_concurrency: int  # Requests running at once, shared between organizations
+    tenant_max_concurrency: int  # Requests of one organization running at once
+    tenant_max_queue: int  # Requests of one organization waiting before 429
+    tenant_weights: Dict[str, int]  # Scheduling weight per organization ID, default 1
+    tenant_pool_share: float  # Share of the MongoDB pool one organization may hold
+    # ========== Firebase ==========
+    firebase_admin_credentials: Optional[str]  # Service account JSON
+    # ========== Caches ==========
+    org_directory_max_size: int  # Organizations kept in memory
+    org_directory_negative_ttl: int  # Seconds unknown domains and slugs are remembered
+    incident_analytics_cache_ttl: int  # Seconds analytics results are cached
+    entity_cache: bool  # Cache documents of models declaring a cache policy
+    entity_cache_socket_dir: Optional[str]  # Sockets for invalidations between workers
+    # ========== Status stream ==========
+    status_stream_buffer: int  # Events kept per organization for resuming viewers
+    status_stream_heartbeat: float  # Seconds between keep-alive comments
+    status_stream_resync: float  # Seconds between snapshot checks of open streams, 0 disables
+    status_stream_max_viewers: int  # Streams one worker holds open at most
+    status_stream_socket_dir: Optional[str]  # Sockets for events between workers
+    # ========== Health checks ==========
+    health_checks: bool  # Run the health check scheduler in this process
+    health_check_concurrency: int  # Probes in flight at once
+    health_check_jitter: float  # Share of the interval runs are moved by at random
+    health_check_reload: float  # Seconds between reloads of the registered checks
+    health_check_shard: Tuple[int, int]  # Services probed by this process, as index/count
+    health_check_min_interval: float  # Shortest interval a check may register
+    health_check_allow_private: bool  # Allow checks of loopback and private addresses
+    # ========== Probe metrics ==========
+    probe_samples_retention_days: int  # Days raw probe samples are kept, 0 keeps them
+    probe_minute_retention_days: int  # Days 1-minute aggregates are kept, 0 keeps them
+    probe_hour_retention_days: int  # Days 1-hour aggregates are kept, 0 keeps them
+    probe_day_retention_days: int  # Days 1-day aggregates are kept, 0 keeps them
+    probe_downsample_interval: float  # Seconds between downsampling runs, 0 disables them
+    # ========== Alert ingestion ==========
+    ingest_dedupe_window: float  # Seconds a repeated alert with the same state is dropped
+    ingest_flush_interval: float  # Seconds between writes of the ingested alerts
+    ingest_max_pending: int  # Alerts waiting to be written before requests are refused
+    ingest_max_pending_per_org: int  # The same for the alerts of one organization
+    ingest_max_batch: int  # Alerts one request may carry
+    # ========== Exports ==========
+    export_batch_size: int  # Documents fetched per batch by streaming exports
+    status_export_dir: Optional[str]  # Directory for static status pages, disabled when unset
+    # ========== Profiling ==========
+    profile_token: Optional[str]  # Secret enabling per-request profiles, disabled when unset
+    profile_dir: str  # Directory the request profiles are written to
+    profile_interval: float  # Seconds between two stack samples
+    # ========== Tracing ==========
+    trace_sample_rate: float  # Fraction of requests traced, 0 disables sampling
+    trace_file: Optional[str]  # File spans are appended to, tracing is disabled when unset
+    trace_token: Optional[str]  # Secret letting callers decide whether a request is traced
+    # ========== Traffic recording ==========
+    traffic_record_path: Optional[str]  # File request shapes are appended to
+    traffic_record_sample_rate: float  # Fraction of requests recorded
+    traffic_record_key: str  # Key for pseudonymizing identifiers
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            mongo_url=_env("MONGO_URL", "mongodb://localhost:27017"),
+            mongo_db=_env("MONGO_DB", "mydatabase"),
+            mongo_max_pool_size=_env("MONGO_MAX_POOL_SIZE", 100, int),
+            mongo_min_pool_size=_env("MONGO_MIN_POOL_SIZE", 0, int),
+            mongo_max_idle_time_ms=_env("MONGO_MAX_IDLE_TIME_MS", None, int),
+            mongo_server_selection_timeout_ms=_env("MONGO_SERVER_SELECTION_TIMEOUT_MS", 30000, int),
+            mongo_socket_timeout_ms=_env("MONGO_SOCKET_TIMEOUT_MS", None, int),
+            mongo_compressors=_env("MONGO_COMPRESSORS"),
+            mongo_zlib_compression_level=_env("MONGO_ZLIB_COMPRESSION_LEVEL", None, int),
+            mongo_secondary_reads=_env("MONGO_SECONDARY_READS", False, _bool),
+            # 90 seconds is the smallest staleness MongoDB accepts
+            mongo_max_staleness_seconds=_env("MONGO_MAX_STALENESS_SECONDS", 90, int),
+            request_budget_ms=_env("REQUEST_BUDGET_MS", 10000, int),
+            route_budgets_ms=_env("ROUTE_BUDGETS_MS", {}, _int_mapping),
+            circuit_failure_rate=_env("CIRCUIT_FAILURE_RATE", 0.5, float),
+            circuit_min_calls=_env("CIRCUIT_MIN_CALLS", 20, int),
+            circuit_window_seconds=_env("CIRCUIT_WINDOW_SECONDS", 10, int),
+            circuit_open_seconds=_env("CIRCUIT_OPEN_SECONDS", 5.0, float),
+            status_stale_ttl=_env("STATUS_STALE_TTL", 3600, int),
+            admission_control=_env("ADMISSION_CONTROL", False, _bool),
+            admission_initial_limit=_env("ADMISSION_INITIAL_LIMIT", 50, int),
+            admission_min_limit=_env("ADMISSION_MIN_LIMIT", 10, int),
+            admission_max_limit=_env("ADMISSION_MAX_LIMIT", 500, int),
+            admission_ip_rate=_env("ADMISSION_IP_RATE", 10.0, float),
+            admission_ip_burst=_env("ADMISSION_IP_BURST", 20, int),
+            admission_org_rate=_env("ADMISSION_ORG_RATE", 50.0, float),
+            admission_org_burst=_env("ADMISSION_ORG_BURST", 100, int),
+            admission_credential_ip_rate=_env("ADMISSION_CREDENTIAL_IP_RATE", 50.0, float),
+            admission_credential_ip_burst=_env("ADMISSION_CREDENTIAL_IP_BURST", 100, int),
+            admission_trusted_proxies=_env("ADMISSION_TRUSTED_PROXIES", 0, int),
+            bulkheads=_env("BULKHEADS", False, _bool),
+            tenant_total_concurrency=_env("TENANT_TOTAL_CONCURRENCY", 100, int),
+            tenant_max_concurrency=_env("TENANT_MAX_CONCURRENCY", 20, int),
+            tenant_max_queue=_env("TENANT_MAX_QUEUE", 50, int),
+            tenant_weights=_env("TENANT_WEIGHTS", {}, _int_mapping),
+            tenant_pool_share=_env("TENANT_POOL_SHARE", 0.5, float),
+            firebase_admin_credentials=_env("FIREBASE_ADMIN_CREDENTIALS"),
+            org_directory_max_size=_env("ORG_DIRECTORY_MAX_SIZE", 10000, int),
+            org_directory_negative_ttl=_env("ORG_DIRECTORY_NEGATIVE_TTL", 60, int),
+            incident_analytics_cache_ttl=_env("INCIDENT_ANALYTICS_CACHE_TTL", 300, int),
+            entity_cache=_env("ENTITY_CACHE", False, _bool),
+            entity_cache_socket_dir=_env("ENTITY_CACHE_SOCKET_DIR"),
+            status_stream_buffer=_env("STATUS_STREAM_BUFFER", 256, int),
+            status_stream_heartbeat=_env("STATUS_STREAM_HEARTBEAT", 15.0, float),
+            status_stream_resync=_env("STATUS_STREAM_RESYNC", 300.0, float),
+            status_stream_max_viewers=_env("STATUS_STREAM_MAX_VIEWERS", 10000, int),
+            status_stream_socket_dir=_env("STATUS_STREAM_SOCKET_DIR"),
+            health_checks=_env("HEALTH_CHECKS", False, _bool),
+            health_check_concurrency=_env("HEALTH_CHECK_CONCURRENCY", 200, int),
+            health_check_jitter=_env("HEALTH_CHECK_JITTER", 0.1, float),
+            health_check_reload=_env("HEALTH_CHECK_RELOAD", 30.0, float),
+            health_check_shard=_env("HEALTH_CHECK_SHARD", (0, 1), _shard),
+            health_check_min_interval=_env("HEALTH_CHECK_MIN_INTERVAL", 10.0, float),
+            health_check_allow_private=_env("HEALTH_CHECK_ALLOW_PRIVATE", False, _bool),
+            probe_samples_retention_days=_env("PROBE_SAMPLES_RETENTION_DAYS", 7, int),
+            probe_minute_retention_days=_env("PROBE_MINUTE_RETENTION_DAYS", 30, int),
+            probe_hour_retention_days=_env("PROBE_HOUR_RETENTION_DAYS", 400, int),
+            probe_day_retention_days=_env("PROBE_DAY_RETENTION_DAYS", 0, int),
+            probe_downsample_interval=_env("PROBE_DOWNSAMPLE_INTERVAL", 60.0, float),
+            ingest_dedupe_window=_env("INGEST_DEDUPE_WINDOW", 300.0, float),
+            ingest_flush_interval=_env("INGEST_FLUSH_INTERVAL", 0.5, float),
+            ingest_max_pending=_env("INGEST_MAX_PENDING", 100000, int),
+            ingest_max_pending_per_org=_env("INGEST_MAX_PENDING_PER_ORG", 20000, int),
+            ingest_max_batch=_env("INGEST_MAX_BATCH", 10000, int),
+            export_batch_size=_env("EXPORT_BATCH_SIZE", 1000, int),
+            status_export_dir=_env("STATUS_EXPORT_DIR"),
+            profile_token=_env("PROFILE_TOKEN"),
+            profile_dir=_env("PROFILE_DIR", "/tmp/status-app-profiles"),
+            profile_interval=_env("PROFILE_INTERVAL", 0.005, float),
+            trace_sample_rate=_env("TRACE_SAMPLE_RATE", 0.0, float),
+            trace_file=_env("TRACE_FILE"),
+            trace_token=_env("TRACE_TOKEN"),
+            traffic_record_path=_env("TRAFFIC_RECORD_PATH"),
+            traffic_record_sample_rate=_env("TRAFFIC_RECORD_SAMPLE_RATE", 1.0, float),
+            # A random key keeps pseudonyms stable for one process only
+            traffic_record_key=_env("TRAFFIC_RECORD_KEY") or secrets.token_hex(16),
+        )
+
+
+# Get the settings of this process, loading the .env file on first use
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    load_dotenv()
+    return Settings.from_env()
@@ -0,0 +1,86 @@
+# Import necessary modules
+# contextvars for the deadline of the current request
+# Typed settings for the request and per-route budgets
+
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+from app.core.config import get_settings
+
+# Database time budget of a request in seconds, None disables deadlines
+REQUEST_BUDGET = get_settings().request_budget_ms / 1000 or None
+
+# Budgets of routes that need more or less than the default, by route template
+# None means the route runs without a deadline, e.g. streaming exports
+DEFAULT_ROUTE_BUDGETS: Dict[str, Optional[float]] = {
+    "/status/get-org-status": 2.0,  # Public status page, served stale when the DB is slow
+    "/org/get-org-by-domain": 2.0,  # Public lookup on the sign-in path
+    "/incident/get-incident-analytics": 30.0,  # Aggregates the whole incident history
+    "/incident/export-incidents": None,
+    "/log/export-logs": None,
+    "/user/bulk-create-users-in-org": None,  # Firebase calls take most of the request
+    "/status/stream": None,  # Snapshots get the status page budget instead
+}
+ROUTE_BUDGETS: Dict[str, Optional[float]] = {
+    **DEFAULT_ROUTE_BUDGETS,
+    **{
+        route: budget_ms / 1000 or None
+        for route, budget_ms in get_settings().route_budgets_ms.items()
+    },
+}
+
+# Monotonic time by which the current request's database work must be done
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+# Raised when an operation would run past the request's deadline
+class DeadlineExceeded(Exception):
+    pass
+
+
+# Get the budget of a route in seconds, None for no deadline
+def route_budget(route: str) -> Optional[float]:
+    return ROUTE_BUDGETS.get(route, REQUEST_BUDGET)
+
+
+# Run a block with a deadline budget seconds from now
+# A nested deadline never extends the one already in place
+@contextmanager
+def deadline(budget: Optional[float]) -> Iterator[None]:
+    current = _deadline.get()
+    if budget is not None:
+        expires = time.monotonic() + budget
+        current = expires if current is None else min(current, expires)
+    token = _deadline.set(current)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+# Get the seconds left until the deadline, None without a deadline
+# Raises DeadlineExceeded once the deadline has passed
+def remaining() -> Optional[float]:
+    expires = _deadline.get()
+    if expires is None:
+        return None
+    left = expires - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return left
+
+
+# Get the time left as a maxTimeMS value for MongoDB, None without a deadline
+def max_time_ms() -> Optional[int]:
+    left = remaining()
+    return None if left is None else max(1, math.floor(left * 1000))
+
+
+# Get the time left as command options, for commands taking maxTimeMS as a keyword
+# Empty without a deadline, as the server rejects a null maxTimeMS
+def max_time_options() -> Dict[str, Any]:
+    ms = max_time_ms()
+    return {} if ms is None else {"maxTimeMS": ms}
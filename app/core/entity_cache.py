@@ -0,0 +1,202 @@
+# Import necessary modules
+# cachetools for the size- and TTL-bounded caches
+# bson for measuring the size of cached documents
+# Worker bus for broadcasting invalidations to the other workers of the host
+# Typed settings for enabling the cache and the socket directory
+# Metrics for hit ratio and memory use
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import bson
+from bson import ObjectId
+from cachetools import TTLCache
+
+from app.core.config import get_settings
+from app.core.metrics import (
+    entity_cache_bytes,
+    entity_cache_entries,
+    entity_cache_invalidations_total,
+    entity_cache_requests_total,
+)
+from app.core.worker_bus import WorkerBus
+
+# Whether models that declare a cache policy cache their documents at all
+ENTITY_CACHE = get_settings().entity_cache
+# Directory of the sockets workers receive invalidations on, None to not broadcast
+# Used for the invalidation handlers below even when ENTITY_CACHE is off
+ENTITY_CACHE_SOCKET_DIR = get_settings().entity_cache_socket_dir
+
+# Bytes accounted for an alias entry mapping a unique key to an ID
+ALIAS_SIZE = 128
+# IDs per invalidation message, an ObjectId takes 27 bytes in the JSON list
+IDS_PER_MESSAGE = 1000
+
+
+# Cache policy of a model, returned by DocumentModel.cache_policy()
+# unique_keys are fields with unique values; find_one with exactly one of them as
+# an equality filter is served from the cache too
+@dataclass(frozen=True)
+class CachePolicy:
+    ttl: float = 30.0  # Seconds a document is served from memory at most
+    max_bytes: int = 16 * 1024 * 1024  # BSON size of all cached documents of the model
+    unique_keys: Tuple[str, ...] = ()
+
+
+# Read-through cache of one model's documents, by ID and unique keys
+# Raw documents are cached and every hit builds a new model, so callers never share
+# instances. Writes invalidate by ID; a read that started before an invalidation does
+# not fill the cache (version check), so it cannot bring back a stale document.
+# Only used from the event loop, so it needs no lock
+class EntityCache:
+    def __init__(self, name: str, policy: CachePolicy):
+        self.name = name
+        self.policy = policy
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        # ("_id", id) -> (document, size) and (field, value) -> (id, ALIAS_SIZE)
+        self._entries: TTLCache = TTLCache(
+            maxsize=policy.max_bytes, ttl=policy.ttl, getsizeof=lambda entry: entry[1]
+        )
+
+    # Get the cache key of a find_one filter, None when the filter cannot be cached
+    def key_of(self, filter: Dict[str, Any]) -> Optional[Tuple[str, Any]]:
+        if len(filter) != 1:
+            return None
+        field, value = next(iter(filter.items()))
+        if field != "_id" and field not in self.policy.unique_keys:
+            return None
+        # Operators, e.g. {"$in": [...]}, are not cached
+        if isinstance(value, (dict, list)):
+            return None
+        return field, value
+
+    # Get a cached document by key, None on a miss
+    def get(self, key: Tuple[str, Any]) -> Optional[Dict[str, Any]]:
+        document = None
+        entry = self._entries.get(key if key[0] == "_id" else ("_id", self._alias(key)))
+        if entry is not None:
+            document = entry[0]
+            # The alias may outlive a change of the key, e.g. a new email
+            if key[0] != "_id" and document.get(key[0]) != key[1]:
+                document = None
+        if document is None:
+            self.misses += 1
+            entity_cache_requests_total.inc(self.name, "miss")
+        else:
+            self.hits += 1
+            entity_cache_requests_total.inc(self.name, "hit")
+        return document
+
+    def _alias(self, key: Tuple[str, Any]) -> Any:
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    # Cache a document read from the database
+    # Skipped when an invalidation happened since the read started (version)
+    def fill(self, document: Dict[str, Any], version: int) -> None:
+        if version != self.version:
+            return
+        size = len(bson.encode(document))
+        if size > self.policy.max_bytes:
+            return
+        self._entries[("_id", document["_id"])] = (document, size)
+        for field in self.policy.unique_keys:
+            if field in document:
+                self._entries[(field, document[field])] = (document["_id"], ALIAS_SIZE)
+        self._report()
+
+    # Drop the documents with the given IDs
+    # Local invalidations are also broadcast to the other workers of the host
+    def invalidate(self, ids: Iterable[Any], broadcast: bool = True) -> None:
+        ids = [_id for _id in ids if _id is not None]
+        if not ids:
+            return
+        self.version += 1
+        for _id in ids:
+            self._entries.pop(("_id", _id), None)
+        entity_cache_invalidations_total.inc(
+            self.name, "local" if broadcast else "remote", amount=len(ids)
+        )
+        self._report()
+        if broadcast:
+            for message in _messages(self.name, [str(_id) for _id in ids]):
+                invalidation_bus.publish(message)
+
+    # Drop every cached document
+    def clear(self) -> None:
+        self.version += 1
+        self._entries.clear()
+        self._report()
+
+    def _report(self) -> None:
+        entity_cache_entries.set(self.name, value=len(self._entries))
+        entity_cache_bytes.set(self.name, value=self._entries.currsize)
+
+    # Expose hit ratio and memory use for monitoring
+    def stats(self) -> Dict[str, Any]:
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / requests, 4) if requests else None,
+            "entries": len(self._entries),
+            "bytes": self._entries.currsize,
+            "max_bytes": self.policy.max_bytes,
+            "ttl": self.policy.ttl,
+        }
+
+
+# Caches of the models, by model name
+caches: Dict[str, EntityCache] = {}
+
+
+# Get the cache of a model, creating it on first use
+# None when the entity cache is disabled or the model has no cache policy
+def entity_cache_for(name: str, policy: Optional[CachePolicy]) -> Optional[EntityCache]:
+    if not ENTITY_CACHE or policy is None:
+        return None
+    cache = caches.get(name)
+    if cache is None:
+        cache = caches[name] = EntityCache(name, policy)
+    return cache
+
+
+# Handlers of the invalidations of other per-worker caches, by cache name
+# Called with the invalidated keys, e.g. the organizations of incident analytics
+invalidation_handlers: Dict[str, Callable[[List[str]], None]] = {}
+
+
+# Send the invalidated keys of a cache with a handler to the other workers
+def publish_invalidation(name: str, keys: List[str]) -> None:
+    for message in _messages(name, keys):
+        invalidation_bus.publish(message)
+
+
+# Drop the documents another worker of the host invalidated
+def _receive_invalidation(message: Dict[str, Any]) -> None:
+    handler = invalidation_handlers.get(message["model"])
+    if handler is not None:
+        handler(message["ids"])
+        return
+    cache = caches.get(message["model"])
+    if cache is not None:
+        cache.invalidate(
+            [ObjectId(_id) if ObjectId.is_valid(_id) else _id for _id in message["ids"]],
+            broadcast=False,
+        )
+
+
+# Split the invalidated IDs of a model into messages that fit in one datagram
+def _messages(name: str, ids: List[str]) -> Iterable[Dict[str, Any]]:
+    for start in range(0, len(ids), IDS_PER_MESSAGE):
+        yield {"model": name, "ids": ids[start : start + IDS_PER_MESSAGE]}
+
+
+# Shared invalidation bus for the worker
+invalidation_bus = WorkerBus(
+    "cache invalidation",
+    ENTITY_CACHE_SOCKET_DIR,
+    _receive_invalidation,
+)
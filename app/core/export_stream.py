@@ -0,0 +1,134 @@
+# Import necessary modules
+# csv and io for writing CSV rows
+# json for writing NDJSON rows
+# Enum for the supported export formats
+# Starlette streaming response for sending rows as they arrive
+
+import csv
+import io
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, List
+
+from bson import ObjectId
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorCursor
+
+from app.core.config import get_settings
+
+# Number of documents fetched from MongoDB per round trip
+EXPORT_BATCH_SIZE = get_settings().export_batch_size
+# Rows are buffered into chunks of roughly this many bytes before being sent
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+# Define the supported export formats
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+# Media types for each export format
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+}
+
+
+# Convert MongoDB values into JSON compatible values
+def _json_default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Convert a single value into a CSV cell
+# Nested documents and arrays are written as JSON
+def _csv_cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default, separators=(",", ":"))
+    if isinstance(value, (ObjectId, datetime, Enum)):
+        return _json_default(value)
+    return value
+
+
+# Stream documents from a cursor as NDJSON lines
+async def _ndjson_rows(
+    cursor: AsyncIOMotorCursor, columns: List[str]
+) -> AsyncIterator[str]:
+    async for doc in cursor:
+        row = {column: doc.get(column) for column in columns}
+        yield json.dumps(row, default=_json_default, separators=(",", ":")) + "\n"
+
+
+# Stream documents from a cursor as CSV rows, starting with the header
+async def _csv_rows(
+    cursor: AsyncIOMotorCursor, columns: List[str]
+) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def render(values: List[Any]) -> str:
+        writer.writerow(values)
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    yield render(columns)
+    async for doc in cursor:
+        yield render([_csv_cell(doc.get(column)) for column in columns])
+
+
+# Group rows into chunks so the response is not written one tiny row at a time
+# The first row is sent on its own so clients receive the first byte immediately
+async def stream_export(
+    cursor: AsyncIOMotorCursor, export_format: ExportFormat, columns: List[str]
+) -> AsyncIterator[bytes]:
+    rows = (
+        _csv_rows(cursor, columns)
+        if export_format == ExportFormat.CSV
+        else _ndjson_rows(cursor, columns)
+    )
+    chunk: List[str] = []
+    chunk_size = 0
+    first = True
+    async for row in rows:
+        if first:
+            first = False
+            yield row.encode("utf-8")
+            continue
+        chunk.append(row)
+        chunk_size += len(row)
+        if chunk_size >= EXPORT_CHUNK_SIZE:
+            yield "".join(chunk).encode("utf-8")
+            chunk, chunk_size = [], 0
+    if chunk:
+        yield "".join(chunk).encode("utf-8")
+
+
+# Build a streaming response that exports the documents of a cursor
+def export_response(
+    cursor: AsyncIOMotorCursor,
+    export_format: ExportFormat,
+    columns: List[str],
+    filename: str,
+) -> StreamingResponse:
+    headers: Dict[str, str] = {
+        "Content-Disposition": f'attachment; filename="{filename}.{export_format.value}"',
+        "Cache-Control": "no-store",
+        # Ask reverse proxies not to buffer the export
+        "X-Accel-Buffering": "no",
+    }
+    return StreamingResponse(
+        stream_export(cursor, export_format, columns),
+        media_type=MEDIA_TYPES[export_format],
+        headers=headers,
+    )
@@ -1,19 +1,34 @@
 # Import necessary modules
-# Firebase Admin SDK for server-side Firebase operations
-# OS and JSON modules for environment variable handling
-import firebase_admin
-from firebase_admin import credentials
-import os
+# Firebase Admin SDK for server-side Firebase operations, imported on first use
+# as loading it takes a few hundred milliseconds
+# JSON module for parsing the service account credentials
+# Typed settings for the credentials
+
 import json
-from dotenv import load_dotenv
 
-load_dotenv()
+from app.core.config import get_settings
+from app.core.logger import logger
+
 
-firebase_json = os.getenv("FIREBASE_ADMIN_CREDENTIALS")
+# Initialize the default Firebase app, does nothing if it is already initialized
+# Called from the app's lifespan, so importing the app needs no credentials
+def init_firebase() -> None:
+    import firebase_admin
+    from firebase_admin import credentials
 
-# Check if any Firebase app instances are already initialized
-if not firebase_admin._apps:
-    # Load Firebase credentials from environment variable
-    cred = credentials.Certificate(json.loads(firebase_json))  # type: ignore
+    # Check if any Firebase app instances are already initialized
+    if firebase_admin._apps:
+        return
+    credentials_json = get_settings().firebase_admin_credentials
+    if not credentials_json:
+        raise RuntimeError("FIREBASE_ADMIN_CREDENTIALS is not set")
     # Initialize the Firebase app with the loaded credentials
-    firebase_admin.initialize_app(cred)
+    firebase_admin.initialize_app(credentials.Certificate(json.loads(credentials_json)))
+    logger.info("Firebase initialized")
+
+
+# Get the Firebase auth module, importing it on first use
+def get_auth():
+    from firebase_admin import auth
+
+    return auth
@@ -0,0 +1,558 @@
+# Import necessary modules
+# asyncio for scheduling probes with bounded concurrency
+# heapq for the queue of checks ordered by their next run
+# httpx for HTTP probes over a pool of keep-alive connections
+# httpcore for the network backend that connects HTTP probes to checked addresses only
+# dnspython's asyncio resolver for DNS probes without worker threads
+# Custom models for health checks and services
+# Service status write path shared with the batch status endpoint
+# Probe measurement storage and downsampling
+# Metrics for probe results, latency and scheduling lag
+
+import asyncio
+import heapq
+import ipaddress
+import itertools
+import random
+import socket
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple, Union
+from urllib.parse import urlsplit
+
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+import httpcore
+import httpx
+from bson import ObjectId
+
+from app.core.config import get_settings
+from app.core.logger import logger
+from app.core.metrics import (
+    health_check_lag_seconds,
+    health_check_probe_duration_seconds,
+    health_check_probes_total,
+    health_check_transitions_total,
+    health_checks_scheduled,
+)
+from app.core.probe_metrics import (
+    PROBE_DOWNSAMPLE_INTERVAL,
+    Sample,
+    downsample_periodically,
+    write_samples,
+)
+from app.core.service_status import apply_service_statuses
+from app.models.health_check_model import CheckKind, HealthCheck
+from app.models.service_model import Service, ServiceStatus
+
+# Whether this process runs the scheduler
+HEALTH_CHECKS = get_settings().health_checks
+# Probes running at once, also the size of the HTTP connection pool
+HEALTH_CHECK_CONCURRENCY = get_settings().health_check_concurrency
+# Share of the interval each run is moved by at random, e.g. 0.1 for +/- 10%
+HEALTH_CHECK_JITTER = get_settings().health_check_jitter
+# Seconds between reloads of the registered checks
+HEALTH_CHECK_RELOAD = get_settings().health_check_reload
+# Shard of the services this process probes, as (index, count)
+HEALTH_CHECK_SHARD = get_settings().health_check_shard
+# Whether checks may target loopback, private and link-local addresses
+HEALTH_CHECK_ALLOW_PRIVATE = get_settings().health_check_allow_private
+
+# Seconds between writes of the probe samples, and of the check states and service
+# statuses that changed
+FLUSH_INTERVAL = 1.0
+# HTTP clients the connections are spread over, by origin
+POOL_SHARDS = 64
+# Connections open in one client at most, probes beyond wait for one of them
+MAX_POOL_CONNECTIONS = 32
+# Idle keep-alive connections kept per client; every request checks each of them for
+# expiry, so bursts open extra connections that are closed afterwards
+MAX_IDLE_CONNECTIONS = 4
+# Characters of a probe error kept on the check
+MAX_ERROR_LENGTH = 200
+# Failure statuses from the least to the most severe, the worst failing check wins
+SEVERITY = [ServiceStatus.MAINTENANCE, ServiceStatus.DEGRADED_PERFORMANCE, ServiceStatus.OUTAGE]
+
+
+IPAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+
+# Whether probes may connect to an address
+# IPv4-mapped IPv6 addresses are judged by the IPv4 address they carry
+def is_public_address(address: IPAddress) -> bool:
+    if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return not (
+        address.is_private
+        or address.is_loopback
+        or address.is_link_local
+        or address.is_reserved
+        or address.is_unspecified
+        or address.is_multicast
+    )
+
+
+# Parse a host written as an IP address, including the short, decimal and hex IPv4
+# forms such as 127.1 or 2130706433 the system resolver accepts; None for names
+def _literal_address(host: str) -> Optional[IPAddress]:
+    try:
+        return ipaddress.ip_address(host)
+    except ValueError:
+        pass
+    try:
+        return ipaddress.ip_address(socket.inet_aton(host))
+    except OSError:
+        return None
+
+
+# Split the target of a check into host and port, raising ValueError when invalid
+# A fast check when a check is saved: localhost and literal addresses probes may not
+# connect to are refused unless allowed. Hostnames are not resolved here, probes
+# resolve them with resolve_target
+def parse_target(kind: CheckKind, target: str) -> Tuple[str, Optional[int]]:
+    if kind == CheckKind.HTTP:
+        url = urlsplit(target)
+        if url.scheme not in ("http", "https") or not url.hostname:
+            raise ValueError("HTTP checks need an http:// or https:// URL")
+        host, port = url.hostname, url.port
+    elif kind == CheckKind.TCP:
+        host, separator, port_text = target.rpartition(":")
+        host = host.strip("[]")
+        if not separator or not host or not port_text.isdigit() or not 0 < int(port_text) < 65536:
+            raise ValueError("TCP checks need a host:port target")
+        port = int(port_text)
+    else:
+        host, port = target.rstrip("."), None
+        if not host or "/" in host or ":" in host:
+            raise ValueError("DNS checks need a hostname")
+    if not HEALTH_CHECK_ALLOW_PRIVATE:
+        name = host.lower().rstrip(".")
+        address = _literal_address(host)
+        if (
+            name == "localhost"
+            or name.endswith(".localhost")
+            or (address is not None and not is_public_address(address))
+        ):
+            raise ValueError("Checks may not target private addresses")
+    return host, port
+
+
+# Resolve the host of a probe to the addresses it may connect to, raising ValueError
+# when any of them is refused. Probes connect to these addresses rather than the name,
+# so a record changed after the check was saved cannot point them at internal hosts
+async def resolve_target(host: str, port: int) -> List[str]:
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    addresses = list(dict.fromkeys(info[4][0] for info in infos))
+    if not HEALTH_CHECK_ALLOW_PRIVATE and not all(
+        is_public_address(ipaddress.ip_address(address)) for address in addresses
+    ):
+        raise ValueError("Checks may not target private addresses")
+    return addresses
+
+
+# Network backend of the HTTP probes: resolves every connection through resolve_target
+# and connects to the checked address. TLS still verifies the certificate against the
+# hostname of the URL
+class CheckedAddressBackend(httpcore.AsyncNetworkBackend):
+    def __init__(self):
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(
+        self, host, port, timeout=None, local_address=None, socket_options=None
+    ) -> httpcore.AsyncNetworkStream:
+        addresses = await asyncio.wait_for(resolve_target(host, port), timeout)
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(
+                    address, port, timeout, local_address, socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        raise error
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+# HTTP transport whose connections go through CheckedAddressBackend
+class CheckedAddressTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, ssl_context, limits: httpx.Limits):
+        super().__init__(verify=ssl_context, limits=limits, trust_env=False)
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=ssl_context,
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            network_backend=CheckedAddressBackend(),
+        )
+
+
+# Result of one probe
+@dataclass
+class ProbeResult:
+    ok: bool
+    duration: float
+    error: Optional[str] = None
+
+
+# Runs probes, sharing keep-alive HTTP connections and a DNS resolver between checks
+# HTTP connections are pooled by origin over POOL_SHARDS clients: finding a connection
+# scans the whole pool, so many small pools cost less CPU than one large one
+class Prober:
+    def __init__(self, concurrency: int = HEALTH_CHECK_CONCURRENCY):
+        limits = httpx.Limits(
+            max_connections=min(concurrency, MAX_POOL_CONNECTIONS),
+            max_keepalive_connections=MAX_IDLE_CONNECTIONS,
+        )
+        # One TLS context for all clients, loading the CA bundle takes tens of milliseconds
+        ssl_context = httpx.create_ssl_context()
+        self.pools = [
+            httpx.AsyncClient(
+                transport=CheckedAddressTransport(ssl_context, limits),
+                trust_env=False,
+                follow_redirects=False,
+                headers={"User-Agent": "status-app-health-check"},
+            )
+            for _ in range(POOL_SHARDS)
+        ]
+        self.resolver = dns.asyncresolver.Resolver()
+
+    async def probe(self, check: HealthCheck) -> ProbeResult:
+        start = time.perf_counter()
+        try:
+            if check.kind == CheckKind.HTTP:
+                error = await self._http(check)
+            elif check.kind == CheckKind.TCP:
+                error = await asyncio.wait_for(self._tcp(check), check.timeout)
+            else:
+                error = await self._dns(check)
+        except (
+            OSError,
+            ValueError,
+            asyncio.TimeoutError,
+            httpx.HTTPError,
+            httpx.InvalidURL,
+            dns.exception.DNSException,
+        ) as e:
+            error = f"{type(e).__name__}: {e}"[:MAX_ERROR_LENGTH]
+        duration = time.perf_counter() - start
+        health_check_probe_duration_seconds.observe(duration, check.kind.value)
+        health_check_probes_total.inc(check.kind.value, "fail" if error else "ok")
+        return ProbeResult(ok=error is None, duration=duration, error=error)
+
+    async def _http(self, check: HealthCheck) -> Optional[str]:
+        url = urlsplit(check.target)
+        pool = self.pools[hash((url.scheme, url.netloc)) % POOL_SHARDS]
+        response = await pool.get(check.target, timeout=check.timeout)
+        if check.expected_status is not None:
+            if response.status_code != check.expected_status:
+                return f"HTTP {response.status_code}, expected {check.expected_status}"
+        elif response.status_code >= 400:
+            return f"HTTP {response.status_code}"
+        return None
+
+    async def _tcp(self, check: HealthCheck) -> Optional[str]:
+        host, port = parse_target(check.kind, check.target)
+        for address in await resolve_target(host, port):
+            try:
+                _, writer = await asyncio.open_connection(address, port)
+                break
+            except OSError as e:
+                error = e
+        else:
+            raise error
+        writer.close()
+        await writer.wait_closed()
+        return None
+
+    async def _dns(self, check: HealthCheck) -> Optional[str]:
+        host, _ = parse_target(check.kind, check.target)
+        try:
+            await self.resolver.resolve(host, "A", lifetime=check.timeout)
+        except dns.resolver.NoAnswer:
+            await self.resolver.resolve(host, "AAAA", lifetime=check.timeout)
+        return None
+
+    async def close(self) -> None:
+        for pool in self.pools:
+            await pool.aclose()
+
+
+# Consecutive results of a check, kept in memory by the scheduler
+@dataclass
+class CheckState:
+    healthy: Optional[bool]
+    failures: int = 0
+    successes: int = 0
+    error: Optional[str] = None
+
+
+# Probes the registered checks of its shard and drives the status of their services
+# Checks wait in a heap ordered by their next run. Each run is moved by a random share
+# of the interval so checks registered together spread out, and runs start only while
+# fewer than concurrency probes are in flight. The next run of a check is scheduled
+# when its probe finishes, so probes of one check never overlap.
+# Crossing a threshold changes the check's state; changed states and the statuses of
+# their services are written every FLUSH_INTERVAL seconds, through the same write path
+# as a user changing service statuses, together with the latency of every probe.
+# Run in its own process, the websocket broadcast of that write path reaches no
+# clients, and stream events and cache invalidations only the workers of its host.
+# The scheduler of the first shard also downsamples the measurements of all shards.
+class HealthCheckScheduler:
+    def __init__(
+        self,
+        concurrency: int = HEALTH_CHECK_CONCURRENCY,
+        jitter: float = HEALTH_CHECK_JITTER,
+        shard: Tuple[int, int] = HEALTH_CHECK_SHARD,
+        reload_interval: float = HEALTH_CHECK_RELOAD,
+    ):
+        self.jitter = jitter
+        self.shard = shard
+        self.reload_interval = reload_interval
+        self.prober = Prober(concurrency)
+        self.checks: Dict[ObjectId, HealthCheck] = {}
+        self.states: Dict[ObjectId, CheckState] = {}
+        self.probes = 0
+        # (loop time of the next run, tie breaker, check ID, generation)
+        self._queue: List[Tuple[float, int, ObjectId, int]] = []
+        self._order = itertools.count()
+        # Generation of each scheduled check, a check added again after its removal gets
+        # a new one and the queued runs of the old one are skipped
+        self._generations: Dict[ObjectId, int] = {}
+        self._slots = asyncio.Semaphore(concurrency)
+        self._wakeup = asyncio.Event()
+        self._tasks: Set[asyncio.Task] = set()
+        self._changed_checks: Set[ObjectId] = set()
+        self._changed_services: Set[ObjectId] = set()
+        self._samples: List[Sample] = []
+
+    # Whether a service's checks belong to this scheduler
+    def owns(self, service_id: ObjectId) -> bool:
+        index, count = self.shard
+        return int(str(service_id), 16) % count == index
+
+    # Add or replace a check; new checks first run at a random point of their interval
+    def add(self, check: HealthCheck) -> None:
+        known = check.id in self.checks
+        self.checks[check.id] = check
+        if known:
+            return
+        self.states[check.id] = CheckState(healthy=check.healthy)
+        self._generations[check.id] = next(self._order)
+        self._push(check.id, random.uniform(0, check.interval))
+        health_checks_scheduled.set(value=len(self.checks))
+
+    # Stop probing a check; its queued run is skipped
+    def remove(self, check_id: ObjectId) -> None:
+        self.checks.pop(check_id, None)
+        self.states.pop(check_id, None)
+        self._generations.pop(check_id, None)
+        health_checks_scheduled.set(value=len(self.checks))
+
+    # Load the enabled checks of this shard, adding new ones and dropping removed ones
+    async def reload(self) -> None:
+        found = set()
+        async for document in HealthCheck.find_cursor({"enabled": True}):
+            check = HealthCheck(**document)
+            if self.owns(check.service_id):
+                found.add(check.id)
+                self.add(check)
+        for check_id in set(self.checks) - found:
+            self.remove(check_id)
+
+    def _push(self, check_id: ObjectId, delay: float) -> None:
+        due = asyncio.get_running_loop().time() + delay
+        generation = self._generations[check_id]
+        heapq.heappush(self._queue, (due, next(self._order), check_id, generation))
+        if self._queue[0][2] == check_id:
+            self._wakeup.set()
+
+    # Run checks until cancelled
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        flusher = asyncio.ensure_future(self._flush_periodically())
+        downsampler = (
+            asyncio.ensure_future(downsample_periodically())
+            if self.shard[0] == 0 and PROBE_DOWNSAMPLE_INTERVAL > 0
+            else None
+        )
+        next_reload = loop.time()
+        try:
+            while True:
+                now = loop.time()
+                if now >= next_reload:
+                    try:
+                        await self.reload()
+                    except Exception as e:
+                        logger.error(f"Failed to reload health checks: {e}")
+                    next_reload = now + self.reload_interval
+                while self._queue and self._queue[0][0] <= loop.time():
+                    due, _, check_id, generation = heapq.heappop(self._queue)
+                    if self._generations.get(check_id) != generation:
+                        continue
+                    await self._slots.acquire()
+                    health_check_lag_seconds.observe(loop.time() - due)
+                    task = asyncio.ensure_future(self._probe(check_id, due, generation))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                wake_at = min(self._queue[0][0], next_reload) if self._queue else next_reload
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), max(0, wake_at - loop.time()))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            flusher.cancel()
+            if downsampler is not None:
+                downsampler.cancel()
+            for task in list(self._tasks):
+                task.cancel()
+            await self.prober.close()
+
+    # Probe a check and schedule its next run, whatever the probe raised, unless the
+    # check was removed meanwhile
+    async def _probe(self, check_id: ObjectId, due: float, generation: int) -> None:
+        try:
+            check = self.checks.get(check_id)
+            if check is not None:
+                result = await self.prober.probe(check)
+                self.probes += 1
+                self._samples.append(
+                    Sample(
+                        check.service_id, datetime.utcnow(), result.duration * 1000, result.ok
+                    )
+                )
+                self._record(check, result)
+        except Exception as e:
+            logger.error(f"Failed to probe health check {check_id}: {e}")
+        finally:
+            self._slots.release()
+            if self._generations.get(check_id) == generation:
+                interval = self.checks[check_id].interval
+                spread = interval * random.uniform(-self.jitter, self.jitter)
+                loop_time = asyncio.get_running_loop().time()
+                self._push(check_id, max(0.0, due + interval + spread - loop_time))
+
+    # Count consecutive results and change the check's state at its thresholds
+    def _record(self, check: HealthCheck, result: ProbeResult) -> None:
+        state = self.states.get(check.id)
+        if state is None:
+            return
+        if result.ok:
+            state.successes += 1
+            state.failures = 0
+            if state.successes >= check.success_threshold and state.healthy is not True:
+                self._transition(check, state, True)
+        else:
+            state.failures += 1
+            state.successes = 0
+            state.error = result.error
+            if state.failures >= check.failure_threshold and state.healthy is not False:
+                self._transition(check, state, False)
+
+    def _transition(self, check: HealthCheck, state: CheckState, healthy: bool) -> None:
+        state.healthy = healthy
+        self._changed_services.add(check.service_id)
+        self._changed_checks.add(check.id)
+        health_check_transitions_total.inc("healthy" if healthy else "failing")
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to write health check results: {e}")
+
+    # Write the probe samples and changed check states, and set the status of their
+    # services; samples are dropped when they cannot be written, changed checks and
+    # services are kept for the next flush
+    async def flush(self) -> None:
+        check_ids, self._changed_checks = self._changed_checks, set()
+        service_ids, self._changed_services = self._changed_services, set()
+        samples, self._samples = self._samples, []
+        try:
+            await write_samples(samples)
+        except Exception as e:
+            logger.error(f"Failed to write {len(samples)} probe samples: {e}")
+        now = datetime.utcnow()
+        try:
+            await HealthCheck.bulk_update(
+                [
+                    (
+                        check_id,
+                        {
+                            "healthy": self.states[check_id].healthy,
+                            "last_error": self.states[check_id].error,
+                            "state_changed_at": now,
+                        },
+                    )
+                    for check_id in check_ids
+                    if check_id in self.states
+                ]
+            )
+        except Exception:
+            self._changed_checks |= check_ids
+            self._changed_services |= service_ids
+            raise
+        if service_ids:
+            try:
+                await self._update_services(service_ids)
+            except Exception:
+                self._changed_services |= service_ids
+                raise
+
+    # Set each service to the failure status of its worst failing check, or to
+    # operational when every check passes; services in maintenance are left alone
+    async def _update_services(self, service_ids: Set[ObjectId]) -> None:
+        checks_by_service = defaultdict(list)
+        for check_id, check in self.checks.items():
+            if check.service_id in service_ids:
+                checks_by_service[check.service_id].append(check)
+        statuses: Dict[ObjectId, ServiceStatus] = {}
+        for service_id, checks in checks_by_service.items():
+            failing = [c for c in checks if self.states[c.id].healthy is False]
+            if failing:
+                statuses[service_id] = max(
+                    (c.failure_status for c in failing), key=_severity
+                )
+            elif all(self.states[c.id].healthy for c in checks):
+                statuses[service_id] = ServiceStatus.OPERATIONAL
+        services = await Service.find_by_ids(list(statuses))
+        by_org = defaultdict(list)
+        for service in services:
+            if service.status != ServiceStatus.MAINTENANCE:
+                by_org[service.org_id].append(service)
+        for org_id, org_services in by_org.items():
+            # Changes are logged as made by the user who registered the check
+            created_by = checks_by_service[org_services[0].id][0].created_by
+            await apply_service_statuses(org_id, org_services, statuses, created_by)
+
+
+def _severity(status: ServiceStatus) -> int:
+    return SEVERITY.index(status) if status in SEVERITY else -1
+
+
+_scheduler_task: Optional[asyncio.Task] = None
+
+
+# Start the scheduler when HEALTH_CHECKS is set, from the app's lifespan
+def start_health_checks() -> None:
+    global _scheduler_task
+    if HEALTH_CHECKS and _scheduler_task is None:
+        _scheduler_task = asyncio.ensure_future(HealthCheckScheduler().run())
+
+
+# Stop the scheduler
+async def stop_health_checks() -> None:
+    global _scheduler_task
+    if _scheduler_task is not None:
+        _scheduler_task.cancel()
+        try:
+            await _scheduler_task
+        except asyncio.CancelledError:
+            pass
+        _scheduler_task = None
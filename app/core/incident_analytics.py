@@ -0,0 +1,188 @@
+# Import necessary modules
+# cachetools for the per-org analytics cache
+# Custom incident model
+# Circuit breaker and deadline bounding the aggregation
+# Entity cache invalidations, to reach the other workers of the host
+# Enum for the supported time buckets
+
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional, Union
+
+from bson import ObjectId
+from cachetools import TTLCache
+
+from app.core.circuit_breaker import guarded
+from app.core.config import get_settings
+from app.core.deadlines import max_time_options
+from app.core.entity_cache import invalidation_handlers, publish_invalidation
+from app.models.incident_model import Incident
+
+# Seconds an analytics result is served from cache
+INCIDENT_ANALYTICS_CACHE_TTL = get_settings().incident_analytics_cache_ttl
+# Number of affected services returned in the per-service breakdown
+TOP_SERVICES_LIMIT = 50
+
+
+# Define the time buckets incidents can be grouped by
+class AnalyticsBucket(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+# Cached analytics results, keyed by org, generation, time window and bucket
+_analytics_cache: TTLCache = TTLCache(maxsize=1024, ttl=INCIDENT_ANALYTICS_CACHE_TTL)
+# Generation per org, bumped on every incident change so older results are never served
+# Changes reach the other workers of the host over the entity cache invalidation bus;
+# workers on other hosts serve their results until INCIDENT_ANALYTICS_CACHE_TTL expires
+_org_generations: Dict[str, int] = {}
+
+
+# Milliseconds between the start and the resolution of an incident
+_RESOLUTION_MS = {"$subtract": ["$resolved_at", "$started_at"]}
+# Resolution time for resolved incidents, null otherwise so $avg ignores them
+_MTTR_MS = {
+    "$cond": [{"$ifNull": ["$resolved_at", False]}, _RESOLUTION_MS, None]
+}
+
+
+# Group stage fields shared by every breakdown
+def _summary_fields() -> Dict[str, Any]:
+    return {
+        "count": {"$sum": 1},
+        "resolved": {"$sum": {"$cond": [{"$ifNull": ["$resolved_at", False]}, 1, 0]}},
+        "mttr_ms": {"$avg": _MTTR_MS},
+    }
+
+
+# Build the aggregation pipeline computing all incident analytics in one round trip
+def build_incident_analytics_pipeline(
+    org_id: ObjectId,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    bucket: AnalyticsBucket,
+) -> List[Dict[str, Any]]:
+    match: Dict[str, Any] = {"org_id": org_id}
+    # Restrict to incidents started in the requested time window
+    if start or end:
+        match["started_at"] = {}
+        if start:
+            match["started_at"]["$gte"] = start
+        if end:
+            match["started_at"]["$lt"] = end
+
+    return [
+        {"$match": match},
+        {
+            "$facet": {
+                "totals": [{"$group": {"_id": None, **_summary_fields()}}],
+                "by_bucket": [
+                    {
+                        "$group": {
+                            "_id": {
+                                "$dateTrunc": {
+                                    "date": "$started_at",
+                                    "unit": bucket.value,
+                                }
+                            },
+                            **_summary_fields(),
+                        }
+                    },
+                    {"$sort": {"_id": 1}},
+                ],
+                "by_severity": [
+                    {"$group": {"_id": "$severity", **_summary_fields()}},
+                    {"$sort": {"count": -1}},
+                ],
+                "by_status": [
+                    {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1}},
+                ],
+                "by_service": [
+                    {"$unwind": "$affected_services"},
+                    {
+                        "$group": {
+                            "_id": {"$toString": "$affected_services.service_id"},
+                            "service_name": {"$last": "$affected_services.service_name"},
+                            **_summary_fields(),
+                        }
+                    },
+                    {"$sort": {"count": -1}},
+                    {"$limit": TOP_SERVICES_LIMIT},
+                ],
+            }
+        },
+    ]
+
+
+# Convert one aggregated group into the response shape
+def _format_group(group: Dict[str, Any], key: Optional[str] = None) -> Dict[str, Any]:
+    result = {key: group["_id"]} if key else {}
+    result["count"] = group["count"]
+    if "resolved" in group:
+        result["resolved"] = group["resolved"]
+        mttr_ms = group.get("mttr_ms")
+        result["mttr_seconds"] = round(mttr_ms / 1000, 3) if mttr_ms is not None else None
+    if "service_name" in group:
+        result["service_name"] = group["service_name"]
+    return result
+
+
+# Compute incident analytics for an organization, served from cache when possible
+async def get_incident_analytics(
+    org_id: Union[str, ObjectId],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    bucket: AnalyticsBucket = AnalyticsBucket.DAY,
+) -> Dict[str, Any]:
+    org_key = str(org_id)
+    cache_key = (org_key, _org_generations.get(org_key, 0), start, end, bucket)
+    cached = _analytics_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    pipeline = build_incident_analytics_pipeline(ObjectId(org_key), start, end, bucket)
+    cursor = Incident.collection().aggregate(pipeline, **max_time_options())
+    facets = (await guarded(cursor.to_list, length=1))[0]
+
+    totals = facets["totals"][0] if facets["totals"] else None
+    result = {
+        "org_id": org_key,
+        "start": start,
+        "end": end,
+        "bucket": bucket.value,
+        "totals": (
+            _format_group(totals)
+            if totals
+            else {"count": 0, "resolved": 0, "mttr_seconds": None}
+        ),
+        "by_bucket": [_format_group(group, "bucket_start") for group in facets["by_bucket"]],
+        "by_severity": [_format_group(group, "severity") for group in facets["by_severity"]],
+        "by_status": [_format_group(group, "status") for group in facets["by_status"]],
+        "by_service": [_format_group(group, "service_id") for group in facets["by_service"]],
+    }
+
+    # Only cache the result if no incident changed while it was computed
+    if _org_generations.get(org_key, 0) == cache_key[1]:
+        _analytics_cache[cache_key] = result
+    return result
+
+
+# Invalidate the cached analytics of an organization after an incident change
+# broadcast sends the invalidation to the other workers of the host
+def invalidate_incident_analytics(org_id: Union[str, ObjectId], broadcast: bool = True) -> None:
+    org_key = str(org_id)
+    _org_generations[org_key] = _org_generations.get(org_key, 0) + 1
+    if broadcast:
+        publish_invalidation("incident_analytics", [org_key])
+
+
+# Drop the analytics of organizations another worker of the host invalidated
+def _receive_invalidation(org_ids: List[str]) -> None:
+    for org_id in org_ids:
+        invalidate_incident_analytics(org_id, broadcast=False)
+
+
+invalidation_handlers["incident_analytics"] = _receive_invalidation
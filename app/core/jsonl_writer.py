@@ -0,0 +1,60 @@
+# Import necessary modules
+# json for serializing the records
+# queue and threading for writing records off the event loop
+# Metrics for records dropped while the disk falls behind
+
+import json
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.metrics import jsonl_records_dropped_total
+
+# Batches of records queued at most; when the disk falls behind, further batches are
+# dropped rather than held in memory
+MAX_PENDING = 10_000
+
+
+# Writer appending one JSON object per record to a local file, used by the span
+# exporter and the traffic recorder
+# Records are handed to a background thread so the event loop never waits on disk.
+# Create writers at startup, so the thread runs in the worker process rather than in
+# a parent that forked it
+class JsonLinesWriter:
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        to_dict: Callable[[Any], Dict[str, Any]] = dict,
+        max_pending: int = MAX_PENDING,
+    ):
+        self.name = name  # Label of the dropped records metric
+        self.path = path
+        self.to_dict = to_dict  # Turns a record into the object written, on the thread
+        self._queue: "queue.Queue[Optional[List[Any]]]" = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # Queue records to be written together, dropping them when the queue is full
+    def write(self, records: List[Any]) -> None:
+        try:
+            self._queue.put_nowait(records)
+        except queue.Full:
+            jsonl_records_dropped_total.inc(self.name, amount=len(records))
+
+    # Write the queued records and stop the thread, giving up after a few seconds
+    def close(self) -> None:
+        try:
+            self._queue.put(None, timeout=5)
+        except queue.Full:
+            return
+        self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        with open(self.path, "a", buffering=1) as output:
+            while True:
+                records = self._queue.get()
+                if records is None:
+                    return
+                for record in records:
+                    output.write(json.dumps(self.to_dict(record), default=str) + "\n")
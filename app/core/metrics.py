@@ -0,0 +1,353 @@
+# Import necessary modules
+# bisect for finding histogram buckets
+# threading for serializing the MongoDB command listener's updates
+# PyMongo monitoring for timing MongoDB commands
+
+import bisect
+import threading
+import time
+from typing import Dict, List, Sequence, Tuple
+
+from pymongo import monitoring
+
+# Default histogram buckets in seconds, suited to request and query latencies
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# All metrics, in the order they are rendered
+REGISTRY: List["Metric"] = []
+
+
+# Escape a label value for the Prometheus text format
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# Base class for metrics with a fixed set of label names
+# Recording costs a dict lookup and an addition, without a lock: metrics are updated
+# from the event loop thread. Observers running on other threads serialize their own
+# updates, like MongoCommandMetrics. Rendering copies the values first, which the GIL
+# keeps atomic, so it never iterates a dict another thread is adding to
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def _labels(self, labels: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [
+            f'{name}="{_escape(str(value))}"'
+            for name, value in zip(self.labelnames, labels)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+# Monotonically increasing counter
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        values = list(self._values.items())
+        lines += [f"{self.name}{self._labels(labels)} {value}" for labels, value in values]
+        return lines
+
+
+# Value that can go up and down
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        self._values[labels] = value
+
+    def remove(self, *labels: str) -> None:
+        self._values.pop(labels, None)
+
+
+# Distribution of observed values over fixed buckets
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: per-bucket counts (the last one is +Inf), sum and count
+        self._values: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        values = [
+            (labels, list(s[0]), s[1], s[2]) for labels, s in list(self._values.items())
+        ]
+        for labels, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = self._labels(labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {total}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {count}")
+        return lines
+
+
+# Render all metrics in the Prometheus text exposition format
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+# ========== HTTP ==========
+http_requests_total = Counter(
+    "http_requests_total", "HTTP requests handled", ("method", "route", "status")
+)
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "HTTP requests being handled", ("method", "route")
+)
+
+# ========== Admission ==========
+admission_limit = Gauge(
+    "admission_limit", "Adaptive concurrency limit of the admission controller"
+)
+admission_in_flight = Gauge(
+    "admission_in_flight", "Requests admitted and not yet finished", ("priority",)
+)
+admission_rejections_total = Counter(
+    "admission_rejections_total",
+    "Requests shed by the admission controller",
+    ("priority", "reason"),
+)
+
+# ========== Tenants ==========
+tenant_in_flight = Gauge(
+    "tenant_in_flight", "Requests of an organization being handled", ("tenant",)
+)
+tenant_queue_depth = Gauge(
+    "tenant_queue_depth", "Requests of an organization waiting for a slot", ("tenant",)
+)
+tenant_db_waiting = Gauge(
+    "tenant_db_waiting",
+    "Database operations of an organization waiting for its pool share",
+    ("tenant",),
+)
+tenant_queue_wait_seconds = Histogram(
+    "tenant_queue_wait_seconds", "Time requests waited for a tenant slot"
+)
+tenant_rejections_total = Counter(
+    "tenant_rejections_total",
+    "Requests rejected because their organization's queue was full",
+    ("tenant",),
+)
+
+# ========== Auth ==========
+auth_duration_seconds = Histogram(
+    "auth_duration_seconds",
+    "Authentication middleware latency by stage (verify, user_lookup)",
+    ("stage",),
+)
+
+# ========== MongoDB ==========
+mongo_command_duration_seconds = Histogram(
+    "mongo_command_duration_seconds",
+    "MongoDB command latency",
+    ("collection", "command"),
+)
+mongo_command_failures_total = Counter(
+    "mongo_command_failures_total",
+    "MongoDB commands that failed",
+    ("collection", "command"),
+)
+mongo_circuit_state = Gauge(
+    "mongo_circuit_state",
+    "State of the MongoDB circuit breaker (0 closed, 1 half-open, 2 open)",
+    ("circuit",),
+)
+mongo_circuit_rejections_total = Counter(
+    "mongo_circuit_rejections_total",
+    "MongoDB operations rejected by an open circuit",
+    ("circuit",),
+)
+mongo_deadline_exceeded_total = Counter(
+    "mongo_deadline_exceeded_total",
+    "MongoDB operations abandoned at the request deadline",
+)
+
+# ========== Entity cache ==========
+entity_cache_requests_total = Counter(
+    "entity_cache_requests_total",
+    "Entity cache lookups by result (hit, miss)",
+    ("model", "result"),
+)
+entity_cache_entries = Gauge(
+    "entity_cache_entries", "Documents and key aliases in the entity cache", ("model",)
+)
+entity_cache_bytes = Gauge(
+    "entity_cache_bytes", "BSON size of the documents in the entity cache", ("model",)
+)
+entity_cache_invalidations_total = Counter(
+    "entity_cache_invalidations_total",
+    "Documents invalidated, by this worker's writes (local) or other workers' (remote)",
+    ("model", "source"),
+)
+
+# ========== Status stream ==========
+status_stream_viewers = Gauge("status_stream_viewers", "Open status page event streams")
+status_stream_viewers.set(value=0)
+status_stream_events_total = Counter(
+    "status_stream_events_total", "Events added to status page streams", ("event",)
+)
+status_stream_snapshots_total = Counter(
+    "status_stream_snapshots_total", "Status page snapshots built for event streams"
+)
+
+# ========== Health checks ==========
+health_checks_scheduled = Gauge("health_checks_scheduled", "Health checks scheduled by this process")
+health_checks_scheduled.set(value=0)
+health_check_probes_total = Counter(
+    "health_check_probes_total",
+    "Health check probes by kind and result (ok, fail)",
+    ("kind", "result"),
+)
+health_check_probe_duration_seconds = Histogram(
+    "health_check_probe_duration_seconds", "Duration of health check probes", ("kind",)
+)
+health_check_lag_seconds = Histogram(
+    "health_check_lag_seconds",
+    "Delay between a probe's scheduled time and its start, grows when concurrency is saturated",
+)
+health_check_transitions_total = Counter(
+    "health_check_transitions_total",
+    "Health checks crossing a threshold, by new state (healthy, failing)",
+    ("state",),
+)
+probe_samples_written_total = Counter(
+    "probe_samples_written_total", "Probe samples appended to sample buckets"
+)
+probe_downsample_duration_seconds = Histogram(
+    "probe_downsample_duration_seconds",
+    "Duration of downsampling probe measurements, by target resolution",
+    ("resolution",),
+)
+
+# ========== Alert ingestion ==========
+ingest_alerts_total = Counter(
+    "ingest_alerts_total",
+    "Ingested alerts by outcome (accepted, duplicate, coalesced, refused, unmatched, dropped)",
+    ("result",),
+)
+ingest_pending_alerts = Gauge("ingest_pending_alerts", "Ingested alerts waiting to be written")
+ingest_pending_alerts.set(value=0)
+ingest_flush_duration_seconds = Histogram(
+    "ingest_flush_duration_seconds", "Duration of writing the ingested alerts of one flush"
+)
+
+# ========== WebSockets ==========
+websocket_connections = Gauge("websocket_connections", "Open websocket connections")
+websocket_connections.set(value=0)
+websocket_broadcast_duration_seconds = Histogram(
+    "websocket_broadcast_duration_seconds",
+    "Time to fan a broadcast out to every websocket connection",
+)
+websocket_messages_sent_total = Counter(
+    "websocket_messages_sent_total", "Websocket messages delivered"
+)
+websocket_messages_dropped_total = Counter(
+    "websocket_messages_dropped_total",
+    "Websocket messages that could not be delivered",
+)
+
+# ========== JSON-lines writers ==========
+jsonl_records_dropped_total = Counter(
+    "jsonl_records_dropped_total",
+    "Records dropped because the file writer fell behind, by writer (spans, traffic)",
+    ("writer",),
+)
+
+
+# Command listener timing every MongoDB command sent by the client
+# Started and finished events of a command arrive on the same thread, so the
+# pending map only needs the GIL for its single-key operations
+# Motor runs commands on its executor threads; the lock serializes the updates of the
+# two metrics below, which only this listener writes
+class MongoCommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        self._pending: Dict[Tuple, str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        self._pending[(event.connection_id, event.request_id)] = (
+            target if isinstance(target, str) else event.database_name
+        )
+
+    def _finish(self, event, failed: bool) -> None:
+        collection = self._pending.pop((event.connection_id, event.request_id), "")
+        with self._lock:
+            mongo_command_duration_seconds.observe(
+                event.duration_micros / 1_000_000, collection, event.command_name
+            )
+            if failed:
+                mongo_command_failures_total.inc(collection, event.command_name)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, failed=True)
+
+
+# Time a block of code into a histogram
+class timed:
+    def __init__(self, histogram: Histogram, *labels: str):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
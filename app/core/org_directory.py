@@ -0,0 +1,149 @@
+# Import necessary modules
+# OrderedDict for the size-bounded LRU of organizations
+# cachetools for the short-lived negative cache
+# Custom organization model
+# Logger for logging
+
+from collections import OrderedDict
+from typing import Dict, Optional, Union
+
+from bson import ObjectId
+from cachetools import TTLCache
+
+from app.core.config import get_settings
+from app.core.logger import logger
+from app.models.org_model import Organization
+
+# Maximum number of organizations kept in memory
+ORG_DIRECTORY_MAX_SIZE = get_settings().org_directory_max_size
+# Seconds an unknown domain or slug is remembered as missing
+ORG_DIRECTORY_NEGATIVE_TTL = get_settings().org_directory_negative_ttl
+
+
+# In-memory directory resolving organizations by ID, domain and slug
+# Organizations are kept in a size-bounded LRU; lookups for unknown domains and
+# slugs are remembered for a short time so they cannot force repeated DB hits
+class OrgDirectory:
+    def __init__(self, max_size: int, negative_ttl: int):
+        self.max_size = max_size
+        self._orgs: "OrderedDict[str, Organization]" = OrderedDict()
+        self._by_domain: Dict[str, str] = {}
+        self._by_slug: Dict[str, str] = {}
+        self._missing: TTLCache = TTLCache(maxsize=max_size, ttl=negative_ttl)
+
+    def __len__(self) -> int:
+        return len(self._orgs)
+
+    # Add or replace an organization in the directory
+    def add(self, org: Organization) -> None:
+        if org.id is None:
+            return
+        key = str(org.id)
+        self.discard(key)
+        self._orgs[key] = org
+        self._by_domain[org.domain] = key
+        self._by_slug[org.org_slug] = key
+        self._missing.pop(("domain", org.domain), None)
+        self._missing.pop(("slug", org.org_slug), None)
+        # Evict the least recently used organizations beyond the size limit
+        while len(self._orgs) > self.max_size:
+            _, evicted = self._orgs.popitem(last=False)
+            self._forget_keys(evicted)
+
+    # Remove an organization from the directory, e.g. after it was updated
+    def discard(self, org_id: Union[str, ObjectId]) -> None:
+        org = self._orgs.pop(str(org_id), None)
+        if org:
+            self._forget_keys(org)
+
+    # Drop every cached organization and negative result
+    def clear(self) -> None:
+        self._orgs.clear()
+        self._by_domain.clear()
+        self._by_slug.clear()
+        self._missing.clear()
+
+    def _forget_keys(self, org: Organization) -> None:
+        if self._by_domain.get(org.domain) == str(org.id):
+            del self._by_domain[org.domain]
+        if self._by_slug.get(org.org_slug) == str(org.id):
+            del self._by_slug[org.org_slug]
+
+    def _hit(self, key: Optional[str]) -> Optional[Organization]:
+        if key is None:
+            return None
+        org = self._orgs.get(key)
+        if org is not None:
+            self._orgs.move_to_end(key)
+        return org
+
+    # Resolve a lookup from memory, falling back to the database on a miss
+    async def _resolve(
+        self, kind: str, value: str, field: str, index: Dict[str, str]
+    ) -> Optional[Organization]:
+        org = self._hit(index.get(value))
+        if org is not None:
+            return org
+        if (kind, value) in self._missing:
+            return None
+        org = await Organization.find_one({field: value})
+        if org is None:
+            self._missing[(kind, value)] = True
+            return None
+        self.add(org)
+        return org
+
+    # Find an organization by its domain
+    async def get_by_domain(self, domain: str) -> Optional[Organization]:
+        return await self._resolve("domain", domain, "domain", self._by_domain)
+
+    # Find an organization by its slug
+    async def get_by_slug(self, org_slug: str) -> Optional[Organization]:
+        return await self._resolve("slug", org_slug, "org_slug", self._by_slug)
+
+    # Find an organization by its ID
+    async def get_by_id(self, org_id: Union[str, ObjectId]) -> Optional[Organization]:
+        key = str(org_id)
+        org = self._hit(key)
+        if org is not None:
+            return org
+        if ("id", key) in self._missing:
+            return None
+        org = await Organization.find_by_id(org_id)
+        if org is None:
+            self._missing[("id", key)] = True
+            return None
+        self.add(org)
+        return org
+
+    # ID of an organization already in memory, without touching the database
+    def cached_id(self, domain: Optional[str] = None, org_slug: Optional[str] = None) -> Optional[str]:
+        if domain is not None:
+            return self._by_domain.get(domain)
+        if org_slug is not None:
+            return self._by_slug.get(org_slug)
+        return None
+
+    # Load the most recently created organizations into memory
+    async def warm(self) -> int:
+        cursor = (
+            Organization.collection()
+            .find({})
+            .sort("created_at", -1)
+            .limit(self.max_size)
+        )
+        # Insert oldest first so the newest organizations are the last to be evicted
+        orgs = [Organization(**doc) async for doc in cursor]
+        for org in reversed(orgs):
+            self.add(org)
+        logger.info(f"Org directory warmed with {len(orgs)} organizations")
+        return len(orgs)
+
+    # Expose cache sizes for monitoring
+    def stats(self) -> Dict[str, int]:
+        return {"orgs": len(self._orgs), "missing": len(self._missing)}
+
+
+# Shared org directory for the worker
+org_directory = OrgDirectory(ORG_DIRECTORY_MAX_SIZE, ORG_DIRECTORY_NEGATIVE_TTL)
+
@@ -0,0 +1,381 @@
+# Import necessary modules
+# pymongo's UpdateOne for appending samples to buckets in one bulk write
+# Custom models for sample buckets, rollups and downsampling runs
+# Circuit breaker and deadlines bounding the writes and aggregations
+# Metrics for written samples and downsampling time
+#
+# Probe measurements are stored with the bucket pattern: the samples of a service in
+# one hour are appended to a fixed-size array in one document, so a day of 60-second
+# probes is 24 small documents instead of 1440. A background task downsamples them into
+# 1-minute, 1-hour and 1-day rollups, each level read from the one below, and graphs
+# read the coarsest level that still gives enough points for their range: 90 days are
+# 90 daily rollups, or at most 2160 hourly ones when more points are asked for.
+# Downsampling uses $dateTrunc and $merge into the collection being read, which need
+# MongoDB 5.0 or later.
+
+import asyncio
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.core.circuit_breaker import guarded
+from app.core.config import get_settings
+from app.core.deadlines import max_time_options
+from app.core.logger import logger
+from app.core.metrics import probe_downsample_duration_seconds, probe_samples_written_total
+from app.core.tracing import span
+from app.models.probe_metrics_model import (
+    ProbeDownsampleRun,
+    ProbeRollup,
+    ProbeSampleBucket,
+    Resolution,
+)
+
+# Days raw samples are kept, 0 keeps them
+PROBE_SAMPLES_RETENTION_DAYS = get_settings().probe_samples_retention_days
+# Days the rollups of each resolution are kept, 0 keeps them
+PROBE_RETENTION_DAYS = {
+    Resolution.MINUTE: get_settings().probe_minute_retention_days,
+    Resolution.HOUR: get_settings().probe_hour_retention_days,
+    Resolution.DAY: get_settings().probe_day_retention_days,
+}
+# Seconds between downsampling runs, 0 disables them
+PROBE_DOWNSAMPLE_INTERVAL = get_settings().probe_downsample_interval
+
+# Samples one bucket holds at most, an hour of probes every 5 seconds
+SAMPLES_PER_BUCKET = 720
+# Ranges up to this long are answered with raw samples
+RAW_RANGE = timedelta(hours=1)
+# Time before the previous run that every downsampling run recomputes; covers samples
+# written late by the scheduler's flush and rollups finished after the level above ran
+DOWNSAMPLE_LAG = timedelta(minutes=5)
+# Points a metrics query returns at most unless asked otherwise
+DEFAULT_MAX_POINTS = 500
+
+# Length and $dateTrunc unit of each resolution, from the finest
+LEVELS = [
+    (Resolution.MINUTE, timedelta(minutes=1), "minute"),
+    (Resolution.HOUR, timedelta(hours=1), "hour"),
+    (Resolution.DAY, timedelta(days=1), "day"),
+]
+
+
+# Probe result waiting to be written
+@dataclass
+class Sample:
+    service_id: ObjectId
+    at: datetime
+    latency_ms: float
+    ok: bool
+
+
+# Start of the period of the given length a time falls in; periods start at midnight
+def truncate(at: datetime, length: timedelta) -> datetime:
+    day = at.replace(hour=0, minute=0, second=0, microsecond=0)
+    return day + ((at - day) // length) * length
+
+
+def _expires_at(start: datetime, retention_days: int) -> Optional[datetime]:
+    return start + timedelta(days=retention_days) if retention_days else None
+
+
+# Oldest time data kept for retention_days still covers
+def _kept_since(retention_days: int, now: datetime) -> datetime:
+    return now - timedelta(days=retention_days) if retention_days else datetime.min
+
+
+# Append samples to the buckets of their service and hour in one bulk write
+# A bucket only takes samples while they fit, otherwise the upsert opens a new bucket;
+# the totals are kept up to date so rollups and queries need not read the samples
+async def write_samples(samples: List[Sample]) -> None:
+    groups: Dict[Tuple[ObjectId, datetime], List[Sample]] = defaultdict(list)
+    for sample in samples:
+        groups[(sample.service_id, truncate(sample.at, RAW_RANGE))].append(sample)
+    now = datetime.utcnow()
+    operations = []
+    for (service_id, hour), group in groups.items():
+        for offset in range(0, len(group), SAMPLES_PER_BUCKET):
+            chunk = group[offset : offset + SAMPLES_PER_BUCKET]
+            latencies = [sample.latency_ms for sample in chunk if sample.ok]
+            update: Dict[str, Any] = {
+                "$push": {
+                    "samples": {
+                        "$each": [
+                            {"at": s.at, "latency_ms": s.latency_ms, "ok": s.ok} for s in chunk
+                        ]
+                    }
+                },
+                "$inc": {
+                    "count": len(chunk),
+                    "ok_count": len(latencies),
+                    "latency_sum": sum(latencies),
+                },
+                "$max": {"last_at": max(sample.at for sample in chunk)},
+                "$set": {"updated_at": now},
+                "$setOnInsert": {
+                    "created_at": now,
+                    "expires_at": _expires_at(hour, PROBE_SAMPLES_RETENTION_DAYS),
+                },
+            }
+            if latencies:
+                update["$min"] = {"latency_min": min(latencies)}
+                update["$max"]["latency_max"] = max(latencies)
+            operations.append(
+                UpdateOne(
+                    {
+                        "service_id": service_id,
+                        "hour": hour,
+                        "count": {"$lte": SAMPLES_PER_BUCKET - len(chunk)},
+                    },
+                    update,
+                    upsert=True,
+                )
+            )
+    if not operations:
+        return
+    collection = ProbeSampleBucket.collection()
+    with span("db.bulk_write", collection=collection.name) as current:
+        await guarded(collection.bulk_write, operations, ordered=False)
+        current.set_attribute("count", len(operations))
+    probe_samples_written_total.inc(amount=len(samples))
+
+
+# Group stage summing finer periods into periods of the given $dateTrunc unit
+def _rollup_group(unit: str) -> Dict[str, Any]:
+    return {
+        "$group": {
+            "_id": {
+                "service_id": "$service_id",
+                "at": {"$dateTrunc": {"date": "$at", "unit": unit}},
+            },
+            "count": {"$sum": "$count"},
+            "ok_count": {"$sum": "$ok_count"},
+            "latency_sum": {"$sum": "$latency_sum"},
+            "latency_min": {"$min": "$latency_min"},
+            "latency_max": {"$max": "$latency_max"},
+        }
+    }
+
+
+# Stages writing grouped periods as rollups, replacing the periods computed before
+def _merge_stages(resolution: Resolution, now: datetime) -> List[Dict[str, Any]]:
+    fields: Dict[str, Any] = {
+        "_id": 0,
+        "service_id": "$_id.service_id",
+        "resolution": {"$literal": resolution.value},
+        "at": "$_id.at",
+        "count": 1,
+        "ok_count": 1,
+        "latency_sum": 1,
+        "latency_min": 1,
+        "latency_max": 1,
+        "created_at": {"$literal": now},
+        "updated_at": {"$literal": now},
+    }
+    retention_days = PROBE_RETENTION_DAYS[resolution]
+    if retention_days:
+        fields["expires_at"] = {
+            "$dateAdd": {"startDate": "$_id.at", "unit": "day", "amount": retention_days}
+        }
+    return [
+        {"$project": fields},
+        {
+            "$merge": {
+                "into": ProbeRollup.collection().name,
+                "on": ["service_id", "resolution", "at"],
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }
+        },
+    ]
+
+
+# Build the pipeline computing the rollups of one resolution for periods from since on
+# 1-minute rollups read the raw samples of recently written buckets, coarser ones the
+# rollups of the resolution below
+def build_downsample_pipeline(
+    resolution: Resolution, since: datetime, now: datetime
+) -> List[Dict[str, Any]]:
+    if resolution == Resolution.MINUTE:
+        source = [
+            {"$match": {"last_at": {"$gte": since}}},
+            {
+                "$project": {
+                    "service_id": 1,
+                    "samples": {
+                        "$filter": {
+                            "input": "$samples",
+                            "cond": {"$gte": ["$$this.at", since]},
+                        }
+                    },
+                }
+            },
+            {"$unwind": "$samples"},
+            {
+                "$project": {
+                    "service_id": 1,
+                    "at": "$samples.at",
+                    "count": {"$literal": 1},
+                    "ok_count": {"$cond": ["$samples.ok", 1, 0]},
+                    "latency_sum": {"$cond": ["$samples.ok", "$samples.latency_ms", 0]},
+                    # Null for failed probes, $min and $max skip them
+                    "latency_min": {"$cond": ["$samples.ok", "$samples.latency_ms", None]},
+                    "latency_max": {"$cond": ["$samples.ok", "$samples.latency_ms", None]},
+                }
+            },
+        ]
+    else:
+        finer = LEVELS[[level[0] for level in LEVELS].index(resolution) - 1][0]
+        source = [{"$match": {"resolution": finer.value, "at": {"$gte": since}}}]
+    unit = next(unit for level, _, unit in LEVELS if level == resolution)
+    return [*source, _rollup_group(unit), *_merge_stages(resolution, now)]
+
+
+# Get the time each resolution was last downsampled up to
+async def _completed_runs() -> Dict[Resolution, datetime]:
+    runs = await ProbeDownsampleRun.find_all({}, limit=0)
+    return {run.resolution: run.completed_at for run in runs}
+
+
+# Record that a resolution was downsampled up to now
+async def _complete_run(resolution: Resolution, now: datetime) -> None:
+    await guarded(
+        ProbeDownsampleRun.collection().update_one,
+        {"resolution": resolution.value},
+        {
+            "$set": {"completed_at": now, "updated_at": now},
+            "$setOnInsert": {"created_at": now},
+        },
+        upsert=True,
+    )
+
+
+# Recompute the rollups of every resolution for the periods that may have changed
+# since its last completed run, or the last few minutes on the first run
+# Each level is computed after the one it reads, so a run carries new samples up to
+# the daily rollups; periods are replaced whole, which makes reruns harmless
+async def downsample(now: Optional[datetime] = None) -> None:
+    now = now or datetime.utcnow()
+    completed = await _completed_runs()
+    for resolution, length, _ in LEVELS:
+        since = truncate(min(now, completed.get(resolution, now)) - DOWNSAMPLE_LAG, length)
+        pipeline = build_downsample_pipeline(resolution, since, now)
+        collection = (
+            ProbeSampleBucket.collection()
+            if resolution == Resolution.MINUTE
+            else ProbeRollup.collection()
+        )
+        start = time.perf_counter()
+        with span("db.aggregate", collection=collection.name, resolution=resolution.value):
+            cursor = collection.aggregate(pipeline, **max_time_options())
+            await guarded(cursor.to_list, length=None)
+        probe_downsample_duration_seconds.observe(time.perf_counter() - start, resolution.value)
+        await _complete_run(resolution, now)
+
+
+# Downsample every PROBE_DOWNSAMPLE_INTERVAL seconds until cancelled
+async def downsample_periodically() -> None:
+    while True:
+        await asyncio.sleep(PROBE_DOWNSAMPLE_INTERVAL)
+        try:
+            await downsample()
+        except Exception as e:
+            logger.error(f"Failed to downsample probe metrics: {e}")
+
+
+# Pick the resolution a range is read at: raw samples for short ranges, otherwise the
+# finest rollups giving at most max_points points that are still kept for the range
+def pick_resolution(
+    start: datetime, end: datetime, max_points: int, now: Optional[datetime] = None
+) -> Optional[Resolution]:
+    now = now or datetime.utcnow()
+    if end - start <= RAW_RANGE and start >= _kept_since(PROBE_SAMPLES_RETENTION_DAYS, now):
+        return None
+    for resolution, length, _ in LEVELS:
+        if (end - start) / length <= max_points and start >= _kept_since(
+            PROBE_RETENTION_DAYS[resolution], now
+        ):
+            return resolution
+    return Resolution.DAY
+
+
+def _point(
+    at: datetime,
+    count: int,
+    ok_count: int,
+    latency_sum: float,
+    latency_min: Optional[float],
+    latency_max: Optional[float],
+) -> Dict[str, Any]:
+    return {
+        "at": at,
+        "count": count,
+        "availability": round(ok_count / count, 6) if count else None,
+        "latency_avg": round(latency_sum / ok_count, 3) if ok_count else None,
+        "latency_min": latency_min,
+        "latency_max": latency_max,
+    }
+
+
+# Read the measurements of a service between start and end
+# Returns the resolution read ("raw" for single samples) and one point per sample or
+# period with its probe count, share of passing probes and latency of passing probes
+async def get_service_metrics(
+    service_id: ObjectId,
+    start: datetime,
+    end: datetime,
+    max_points: int = DEFAULT_MAX_POINTS,
+) -> Dict[str, Any]:
+    resolution = pick_resolution(start, end, max_points)
+    points: List[Dict[str, Any]] = []
+    if resolution is None:
+        cursor = ProbeSampleBucket.find_cursor(
+            {"service_id": service_id, "hour": {"$gte": truncate(start, RAW_RANGE), "$lt": end}},
+            sort=[("hour", 1)],
+            secondary_ok=True,
+        )
+        async for bucket in cursor:
+            for sample in bucket["samples"]:
+                if start <= sample["at"] < end:
+                    latency = sample["latency_ms"] if sample["ok"] else None
+                    points.append(
+                        _point(
+                            sample["at"], 1, int(sample["ok"]), latency or 0.0, latency, latency
+                        )
+                    )
+        # Buckets of one hour overlap when the first one filled up
+        points.sort(key=lambda point: point["at"])
+    else:
+        length = next(length for level, length, _ in LEVELS if level == resolution)
+        cursor = ProbeRollup.find_cursor(
+            {
+                "service_id": service_id,
+                "resolution": resolution.value,
+                "at": {"$gte": truncate(start, length), "$lt": end},
+            },
+            sort=[("at", 1)],
+            secondary_ok=True,
+        )
+        async for rollup in cursor:
+            points.append(
+                _point(
+                    rollup["at"],
+                    rollup["count"],
+                    rollup["ok_count"],
+                    rollup["latency_sum"],
+                    rollup.get("latency_min"),
+                    rollup.get("latency_max"),
+                )
+            )
+    return {
+        "service_id": str(service_id),
+        "start": start,
+        "end": end,
+        "resolution": resolution.value if resolution else "raw",
+        "points": points,
+    }
@@ -0,0 +1,185 @@
+# Import necessary modules
+# sys and threading for sampling the stack of the event loop thread
+# tracemalloc for memory snapshots
+# Logger for logging
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.core.config import get_settings
+from app.core.logger import logger
+
+# Secret enabling per-request profiling, profiling is disabled when unset
+PROFILE_TOKEN = get_settings().profile_token
+# Directory the collected profiles are written to
+PROFILE_DIR = get_settings().profile_dir
+# Seconds between two stack samples
+PROFILE_INTERVAL = get_settings().profile_interval
+# Number of memory snapshots kept for diffing
+MAX_MEMORY_SNAPSHOTS = 10
+
+
+# Statistical profiler sampling the stack of one thread from a background thread
+# Stacks are aggregated in the folded format understood by flamegraph.pl and speedscope
+class StackSampler:
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    # Write the profile in the folded stack format, one "stack count" per line
+    def write(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as profile_file:
+            for stack, count in self.stacks.most_common():
+                profile_file.write(f"{stack} {count}\n")
+
+
+# Build the file name of a request profile
+def profile_path(method: str, path: str) -> str:
+    timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    route = path.strip("/").replace("/", "_") or "root"
+    return os.path.join(PROFILE_DIR, f"{timestamp}-{method.lower()}-{route}.folded")
+
+
+# List the stored request profiles, newest first
+def list_profiles() -> List[Dict[str, Any]]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        path = os.path.join(PROFILE_DIR, name)
+        profiles.append({"name": name, "path": path, "size": os.path.getsize(path)})
+    return profiles
+
+
+# Memory snapshots taken through the admin endpoints, oldest first
+_memory_snapshots: List[Dict[str, Any]] = []
+_next_snapshot_id = 1
+
+
+# Start tracing allocations, only costs anything once called
+def start_memory_tracing(frames: int = 10) -> bool:
+    if tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(frames)
+    logger.info(f"tracemalloc started with {frames} frames")
+    return True
+
+
+# Stop tracing allocations and drop the stored snapshots
+def stop_memory_tracing() -> None:
+    tracemalloc.stop()
+    _memory_snapshots.clear()
+
+
+# Snapshot filters hiding the allocations made by tracemalloc itself
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+]
+
+
+# Format tracemalloc statistics for a JSON response
+def _format_stats(stats: List[Any], limit: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "location": str(stat.traceback[0]) if stat.traceback else "?",
+            "size": stat.size,
+            "count": stat.count,
+            **(
+                {"size_diff": stat.size_diff, "count_diff": stat.count_diff}
+                if hasattr(stat, "size_diff")
+                else {}
+            ),
+        }
+        for stat in stats[:limit]
+    ]
+
+
+# Take a memory snapshot and keep it for later diffs
+def take_memory_snapshot(label: Optional[str] = None) -> Dict[str, Any]:
+    global _next_snapshot_id
+    snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+    entry = {
+        "id": _next_snapshot_id,
+        "label": label,
+        "taken_at": datetime.utcnow(),
+        "snapshot": snapshot,
+    }
+    _next_snapshot_id += 1
+    _memory_snapshots.append(entry)
+    del _memory_snapshots[:-MAX_MEMORY_SNAPSHOTS]
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "id": entry["id"],
+        "label": label,
+        "taken_at": entry["taken_at"],
+        "traced_bytes": current,
+        "peak_bytes": peak,
+    }
+
+
+# List the stored memory snapshots
+def list_memory_snapshots() -> List[Dict[str, Any]]:
+    return [
+        {key: value for key, value in entry.items() if key != "snapshot"}
+        for entry in _memory_snapshots
+    ]
+
+
+def _find_snapshot(snapshot_id: int) -> Optional[tracemalloc.Snapshot]:
+    for entry in _memory_snapshots:
+        if entry["id"] == snapshot_id:
+            return entry["snapshot"]
+    return None
+
+
+# Compare two stored snapshots grouped by source line or full traceback
+# Returns None if either snapshot is unknown
+def diff_memory_snapshots(
+    base_id: int, target_id: int, key_type: str = "lineno", limit: int = 25
+) -> Optional[Dict[str, Any]]:
+    base = _find_snapshot(base_id)
+    target = _find_snapshot(target_id)
+    if base is None or target is None:
+        return None
+    start = time.perf_counter()
+    stats = target.compare_to(base, key_type)
+    return {
+        "base_id": base_id,
+        "target_id": target_id,
+        "size_diff": sum(stat.size_diff for stat in stats),
+        "top": _format_stats(stats, limit),
+        "compare_seconds": round(time.perf_counter() - start, 3),
+    }
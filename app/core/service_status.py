@@ -0,0 +1,73 @@
+# Import necessary modules
+# Custom models for services and audit log entries
+# Websocket manager, static status pages and status streams told about the changes
+
+from datetime import datetime
+from typing import Any, Dict, List
+
+from app.core.logger import logger
+from app.core.status_page import schedule_status_export
+from app.core.status_stream import publish_status_events
+from app.models.log_model import ChangeType, EntityType, LogEntry
+from app.models.service_model import Service, ServiceStatus
+from app.websocket_manager import broadcast_message
+
+
+# Set the status of services of one organization, like a user editing them would
+# The services are written with one bulk write and logged with one insert; connected
+# clients, the static status page and status page viewers are told about the changes.
+# Services already in their new status are skipped. Returns the services that changed
+async def apply_service_statuses(
+    org_id: Any,
+    services: List[Service],
+    statuses: Dict[Any, ServiceStatus],
+    created_by: Any,
+) -> List[Service]:
+    updated = [service for service in services if service.status != statuses[service.id]]
+    if not updated:
+        return updated
+
+    # Apply every status change in one bulk write
+    now = datetime.utcnow()
+    for service in updated:
+        service.status = statuses[service.id]
+        service.updated_at = now
+    await Service.bulk_update(
+        [(service.id, {"status": service.status, "updated_at": now}) for service in updated]
+    )
+
+    # Log the updates in one insert
+    log_errors = await LogEntry.insert_many(
+        [
+            LogEntry(
+                entity_id=service.id,
+                entity_type=EntityType.SERVICE,
+                change_type=ChangeType.UPDATE,
+                changes={
+                    "name": service.name,
+                    "description": service.description,
+                    "status": service.status,
+                },
+                org_id=service.org_id,
+                created_by=created_by,
+            )
+            for service in updated
+        ]
+    )
+    if log_errors:
+        logger.error(f"Failed to log {len(log_errors)} batched service updates")
+
+    # Broadcast all updates to connected clients in one message
+    await broadcast_message(
+        {
+            "type": "service_batch",
+            "data": "[" + ",".join(service.model_dump_json() for service in updated) + "]",
+        }
+    )
+
+    # Refresh the static status page of the organization and push the changes to its viewers
+    schedule_status_export(org_id)
+    publish_status_events(
+        org_id, [("service", "update", service.model_dump_json()) for service in updated]
+    )
+    return updated
@@ -0,0 +1,223 @@
+# Import necessary modules
+# asyncio for scheduling background exports
+# gzip, json, os, re and tempfile for rendering and atomic file writes
+# html for escaping user-provided values in the static page
+# FastAPI's JSON encoder so exported payloads match the API responses
+# Custom models for organizations, services and incidents
+# Logger for logging
+
+import asyncio
+import gzip
+import html
+import json
+import os
+import re
+import tempfile
+from typing import Any, Dict, Optional, Set, Union
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import get_settings
+from app.core.logger import logger
+from app.core.org_directory import org_directory
+from app.models.incident_model import ALERT_FIELDS, Incident, IncidentStatus
+from app.models.org_model import Organization
+from app.models.service_model import Service
+
+# Brotli is optional, exports fall back to gzip only when it is not installed
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the deployment
+    brotli = None
+
+# Directory the static status pages are written to, exporting is disabled when unset
+STATUS_EXPORT_DIR = get_settings().status_export_dir
+
+# Only slugs made of these characters are used as directory names
+SAFE_SLUG = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]*$")
+
+# Exports currently running per organization, and organizations changed meanwhile
+_pending_exports: Dict[str, asyncio.Task] = {}
+_dirty_orgs: Set[str] = set()
+
+
+# Build the public status payload for an organization
+# This is the same data returned by /status/get-org-status, without the alert fields
+# of incidents
+# secondary_ok lets a secondary serve it; exports run right after writes and read
+# from the primary so they never publish an older state
+async def build_status_payload(org: Organization, secondary_ok: bool = False) -> Dict[str, Any]:
+    # Find all services for the organization
+    org_services = await Service.find_all({"org_id": org.id}, secondary_ok=secondary_ok)
+
+    # Find all incidents for the organization
+    incidents = await Incident.find_all({"org_id": org.id}, secondary_ok=secondary_ok)
+
+    return {
+        "org": org,
+        "org_services": org_services,
+        "incidents": [jsonable_encoder(incident, exclude=ALERT_FIELDS) for incident in incidents],
+    }
+
+
+# Render a minimal static HTML page for the status payload
+def render_status_html(payload: Dict[str, Any]) -> str:
+    org = payload["org"]
+    services = "".join(
+        f"<li><span>{html.escape(service['name'])}</span>"
+        f"<strong class=\"{html.escape(service['status'])}\">"
+        f"{html.escape(service['status'].replace('_', ' '))}</strong></li>"
+        for service in payload["org_services"]
+    )
+    active_incidents = [
+        incident
+        for incident in payload["incidents"]
+        if incident["status"] != IncidentStatus.RESOLVED.value
+    ]
+    incidents = "".join(
+        f"<li><strong>{html.escape(incident['title'])}</strong> "
+        f"<em>{html.escape(incident['status'])}</em>"
+        f"<p>{html.escape(incident['description'])}</p></li>"
+        for incident in active_incidents
+    )
+    return (
+        "<!DOCTYPE html>\n"
+        '<html lang="en"><head><meta charset="utf-8">'
+        '<meta name="viewport" content="width=device-width, initial-scale=1">'
+        f"<title>{html.escape(org['name'])} Status</title>"
+        "<style>body{font-family:sans-serif;max-width:40rem;margin:2rem auto}"
+        "li{display:flex;justify-content:space-between;padding:.25rem 0}"
+        ".operational{color:#1a7f37}.degraded_performance,.maintenance{color:#9a6700}"
+        ".outage{color:#cf222e}.unknown{color:#57606a}</style></head><body>"
+        f"<h1>{html.escape(org['name'])}</h1>"
+        f"<h2>Services</h2><ul>{services or '<li>No services</li>'}</ul>"
+        f"<h2>Active incidents</h2><ul>{incidents or '<li>No active incidents</li>'}</ul>"
+        "</body></html>\n"
+    )
+
+
+# Write a file atomically by writing to a temporary file in the same directory
+# and renaming it over the destination, so readers never see partial content
+def _atomic_write(path: str, content: bytes) -> None:
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+# Compress and write all static files for one organization
+# Runs in a worker thread because compression is CPU bound
+def _write_status_files(org_dir: str, payload: Dict[str, Any]) -> None:
+    os.makedirs(org_dir, exist_ok=True)
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    page = render_status_html(payload).encode("utf-8")
+
+    files = {"status.json": body, "index.html": page}
+    for name, content in list(files.items()):
+        files[f"{name}.gz"] = gzip.compress(content, compresslevel=9, mtime=0)
+        if brotli is not None:
+            files[f"{name}.br"] = brotli.compress(content)
+
+    # Write the compressed variants first so a server with gzip_static or
+    # brotli_static never pairs a new plain file with an old compressed one
+    for name in sorted(files, key=lambda name: not name.endswith((".gz", ".br"))):
+        _atomic_write(os.path.join(org_dir, name), files[name])
+
+
+# Export the status page of an organization to the export directory
+# Returns the directory the files were written to, or None if exporting is disabled
+async def export_org_status(
+    org: Organization, export_dir: Optional[str] = None
+) -> Optional[str]:
+    export_dir = export_dir or STATUS_EXPORT_DIR
+    if not export_dir:
+        return None
+    if not SAFE_SLUG.match(org.org_slug):
+        logger.warning(f"Skipping status export for unsafe org slug: {org.org_slug}")
+        return None
+
+    payload = jsonable_encoder(await build_status_payload(org))
+    org_dir = os.path.join(export_dir, org.org_slug)
+    await asyncio.to_thread(_write_status_files, org_dir, payload)
+    return org_dir
+
+
+# Export the status page of an organization looked up by its ID
+async def export_org_status_by_id(
+    org_id: Union[str, ObjectId], export_dir: Optional[str] = None
+) -> Optional[str]:
+    org = await org_directory.get_by_id(org_id)
+    if not org:
+        return None
+    return await export_org_status(org, export_dir)
+
+
+# Export the status pages of every organization
+# Returns the number of organizations exported
+async def export_all_org_statuses(
+    export_dir: Optional[str] = None, concurrency: int = 8
+) -> int:
+    export_dir = export_dir or STATUS_EXPORT_DIR
+    if not export_dir:
+        return 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def export_one(doc: Dict[str, Any]) -> bool:
+        async with semaphore:
+            try:
+                return await export_org_status(Organization(**doc), export_dir) is not None
+            except Exception as e:
+                logger.error(f"Status export failed for org {doc.get('_id')}: {e}")
+                return False
+
+    tasks = [
+        asyncio.create_task(export_one(doc))
+        async for doc in Organization.collection().find({})
+    ]
+    results = await asyncio.gather(*tasks)
+    return sum(results)
+
+
+# Keep exporting an organization until no further change arrived during the export
+async def _export_until_clean(key: str) -> None:
+    try:
+        while True:
+            _dirty_orgs.discard(key)
+            try:
+                await export_org_status_by_id(key)
+            except Exception as e:
+                logger.error(f"Status export failed for org {key}: {e}")
+            if key not in _dirty_orgs:
+                break
+    finally:
+        _pending_exports.pop(key, None)
+
+
+# Schedule a background export after a service or incident change
+# Changes arriving while an export is running are coalesced into one more export
+def schedule_status_export(org_id: Union[str, ObjectId]) -> None:
+    if not STATUS_EXPORT_DIR:
+        return
+    key = str(org_id)
+    if key in _pending_exports:
+        _dirty_orgs.add(key)
+        return
+    _pending_exports[key] = asyncio.create_task(_export_until_clean(key))
+
+
+# Bulk export mode: python -m app.core.status_page [output_dir]
+if __name__ == "__main__":
+    import sys
+
+    output_dir = sys.argv[1] if len(sys.argv) > 1 else STATUS_EXPORT_DIR
+    if not output_dir:
+        sys.exit("Usage: python -m app.core.status_page <output_dir>")
+    count = asyncio.run(export_all_org_statuses(output_dir))
+    print(f"Exported {count} organization status pages to {output_dir}")
@@ -0,0 +1,340 @@
+# Import necessary modules
+# asyncio for the shared wakeup futures and the heartbeat task
+# collections.deque for the bounded replay buffers
+# Worker bus forwarding events to the other workers of the host
+# Starlette types for the streaming response
+# Typed settings for buffer size, heartbeat and resync intervals
+# Metrics for viewers and events
+
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from starlette.responses import JSONResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from app.core.config import get_settings
+from app.core.logger import logger
+from app.core.metrics import (
+    status_stream_events_total,
+    status_stream_snapshots_total,
+    status_stream_viewers,
+)
+from app.core.worker_bus import WorkerBus
+
+# Path of the streams; they stay open, so they hold no admission or bulkhead slot
+STREAM_PATH = "/status/stream"
+
+# Events kept per organization for Last-Event-ID resumes
+STATUS_STREAM_BUFFER = get_settings().status_stream_buffer
+# Seconds between keep-alive comments, so proxies do not close idle streams
+STATUS_STREAM_HEARTBEAT = get_settings().status_stream_heartbeat
+# Seconds between checks of the snapshot for changes made on other hosts, 0 disables
+STATUS_STREAM_RESYNC = get_settings().status_stream_resync
+# Streams a worker holds open at most
+STATUS_STREAM_MAX_VIEWERS = get_settings().status_stream_max_viewers
+
+# Milliseconds clients wait before reconnecting, sent with the retry field
+RETRY_MS = 5000
+# Comment sent when nothing happened for STATUS_STREAM_HEARTBEAT seconds
+KEEP_ALIVE = b": \n\n"
+# Response headers keeping proxies and CDNs from buffering or caching the stream
+STREAM_HEADERS = [
+    (b"content-type", b"text/event-stream; charset=utf-8"),
+    (b"cache-control", b"no-cache, no-transform"),
+    (b"x-accel-buffering", b"no"),
+]
+# Seconds a snapshot is reused for viewers connecting at the same time
+SNAPSHOT_TTL = 2.0
+
+# Event IDs are "<milliseconds>-<pid>-<sequence>", assigned by the worker handling the
+# write and forwarded unchanged, so a client can resume on any worker of the host
+EventKey = Tuple[int, int, int]
+_sequence = itertools.count(1)
+
+# Builds the public status payload of the channel's organization, JSON-compatible
+SnapshotBuilder = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+def _new_key() -> EventKey:
+    return (int(time.time() * 1000), os.getpid(), next(_sequence))
+
+
+def _format_key(key: EventKey) -> str:
+    return "-".join(str(part) for part in key)
+
+
+# Parse a Last-Event-ID header, None when it is missing or malformed
+def parse_event_id(value: Optional[str]) -> Optional[EventKey]:
+    try:
+        ms, pid, sequence = (int(part) for part in (value or "").split("-"))
+    except ValueError:
+        return None
+    return ms, pid, sequence
+
+
+# Encode one server-sent event
+def _frame(key: EventKey, event: str, data: str) -> bytes:
+    return f"id: {_format_key(key)}\nevent: {event}\ndata: {data}\n\n".encode()
+
+
+# Events of one organization, shared by every viewer of its status page in the worker
+# Events are encoded once into a bounded buffer; viewers only keep their position in
+# it. A single future is resolved and replaced on every change and heartbeat, so any
+# number of idle viewers wait on it without a queue or timer each.
+class StatusChannel:
+    def __init__(self, org_id: str, build_snapshot: SnapshotBuilder):
+        self.org_id = org_id
+        self.build_snapshot = build_snapshot
+        self.viewers = 0
+        # Sequence number of the last event, positions of viewers are sequence numbers
+        self.sequence = 0
+        # Events of this channel: sequence, key and encoded frame
+        self.events: Deque[Tuple[int, EventKey, bytes]] = deque(maxlen=STATUS_STREAM_BUFFER)
+        # Keys before this are not known to the buffer: the channel was created later
+        # or the events were evicted; resuming from them needs a snapshot
+        self.known_since: EventKey = _new_key()
+        self.changed: asyncio.Future = asyncio.get_running_loop().create_future()
+        # Last snapshot: payload, position and monotonic time it was built at
+        self._snapshot: Optional[Tuple[str, int, float]] = None
+        self._snapshot_task: Optional[asyncio.Task] = None
+        self.resynced_at = time.monotonic()
+
+    # Wake every viewer, with new events or for a heartbeat
+    def wake(self) -> None:
+        changed, self.changed = self.changed, asyncio.get_running_loop().create_future()
+        changed.set_result(None)
+
+    # Add events to the buffer, evicting the oldest ones beyond its size
+    def append(self, events: Iterable[Tuple[EventKey, str, str]]) -> None:
+        for key, event, data in events:
+            if len(self.events) == self.events.maxlen:
+                self.known_since = max(self.known_since, self.events[0][1])
+            self.sequence += 1
+            self.events.append((self.sequence, key, _frame(key, event, data)))
+            status_stream_events_total.inc(event)
+        self.wake()
+
+    # Get the frames after a position, None when some were evicted meanwhile
+    def frames_after(self, position: int) -> Optional[List[bytes]]:
+        if position >= self.sequence:
+            return []
+        if not self.events or self.events[0][0] > position + 1:
+            return None
+        return [frame for sequence, _, frame in self.events if sequence > position]
+
+    # Find the position of a client resuming after an event ID
+    # None when events after it may be missing from the buffer
+    def position_after(self, key: EventKey) -> Optional[int]:
+        if key < self.known_since:
+            return None
+        position = self.events[0][0] - 1 if self.events else self.sequence
+        for sequence, event_key, _ in self.events:
+            if event_key == key:
+                return sequence
+            # Events of other workers may arrive slightly out of order
+            if event_key < key:
+                position = sequence
+        return position
+
+    # Get the snapshot event and the position it was taken at
+    # Viewers connecting within SNAPSHOT_TTL share one snapshot, and concurrent
+    # viewers share one build; events after its position are replayed on top of it
+    async def snapshot(self) -> Tuple[bytes, int]:
+        if (
+            self._snapshot is None
+            or time.monotonic() - self._snapshot[2] >= SNAPSHOT_TTL
+            # Events after it were evicted, so it cannot be brought up to date
+            or self.frames_after(self._snapshot[1]) is None
+        ):
+            if self._snapshot_task is None:
+                self._snapshot_task = asyncio.ensure_future(self._build())
+                self._snapshot_task.add_done_callback(self._snapshot_done)
+            # Shielded, so a viewer leaving does not cancel the build of the others
+            self._snapshot = await asyncio.shield(self._snapshot_task)
+        payload, position, _ = self._snapshot
+        # Resuming with the snapshot's ID replays the events after its position
+        key = next((key for sequence, key, _ in self.events if sequence == position), None)
+        return _frame(key or self.known_since, "snapshot", payload), position
+
+    async def _build(self) -> Tuple[str, int, float]:
+        position = self.sequence
+        payload = json.dumps(await self.build_snapshot(), separators=(",", ":"))
+        status_stream_snapshots_total.inc()
+        return payload, position, time.monotonic()
+
+    def _snapshot_done(self, task: asyncio.Task) -> None:
+        self._snapshot_task = None
+
+    # Send every viewer a new snapshot when the status page changed without events,
+    # e.g. by a write on another host
+    async def resync(self) -> None:
+        self.resynced_at = time.monotonic()
+        previous = self._snapshot[0] if self._snapshot is not None else None
+        self._snapshot = None
+        try:
+            await self.snapshot()
+        except Exception as e:
+            logger.warning(f"Failed to resync status stream of {self.org_id}: {e}")
+            return
+        if previous is not None and self._snapshot[0] != previous:
+            self.append([(_new_key(), "snapshot", self._snapshot[0])])
+
+
+# Channels of the organizations with viewers in this worker, by organization ID
+channels: Dict[str, StatusChannel] = {}
+
+
+# Get the channel of an organization for a new viewer
+# Returns None when the worker already holds STATUS_STREAM_MAX_VIEWERS streams
+def join(org_id: str, build_snapshot: SnapshotBuilder) -> Optional[StatusChannel]:
+    if sum(channel.viewers for channel in channels.values()) >= STATUS_STREAM_MAX_VIEWERS:
+        return None
+    channel = channels.get(org_id)
+    if channel is None:
+        channel = channels[org_id] = StatusChannel(org_id, build_snapshot)
+    channel.viewers += 1
+    status_stream_viewers.inc()
+    return channel
+
+
+# Release a viewer's place; the channel and its buffer go with the last viewer
+def leave(channel: StatusChannel) -> None:
+    channel.viewers -= 1
+    status_stream_viewers.dec()
+    if channel.viewers == 0 and channels.get(channel.org_id) is channel:
+        del channels[channel.org_id]
+
+
+# Wait until the client of a response disconnects
+async def _disconnected(receive: Receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+# Server-sent events response streaming an organization's status page
+# A client resuming with Last-Event-ID gets the events it missed when the buffer still
+# holds them and a new snapshot otherwise. Each viewer only holds its position in the
+# shared buffer; frames are joined into one write per wakeup.
+class StatusStreamResponse(Response):
+    media_type = "text/event-stream"
+
+    def __init__(self, org_id: str, build_snapshot: SnapshotBuilder, last_event_id: Optional[str]):
+        super().__init__()
+        self.org_id = org_id
+        self.build_snapshot = build_snapshot
+        self.resume_key = parse_event_id(last_event_id)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        channel = join(self.org_id, self.build_snapshot)
+        if channel is None:
+            response = JSONResponse(
+                {"detail": "Too many status page viewers"},
+                status_code=503,
+                headers={"Retry-After": str(RETRY_MS // 1000)},
+            )
+            await response(scope, receive, send)
+            return
+        disconnected = asyncio.ensure_future(_disconnected(receive))
+        try:
+            position = channel.position_after(self.resume_key) if self.resume_key else None
+            chunks = [f"retry: {RETRY_MS}\n\n".encode()]
+            if position is None:
+                # Errors before the response starts are answered by the error handlers
+                frame, position = await channel.snapshot()
+                chunks.append(frame)
+            await send({"type": "http.response.start", "status": 200, "headers": STREAM_HEADERS})
+            while True:
+                frames = channel.frames_after(position)
+                if frames is None:
+                    # The viewer fell behind the buffer, start over from a snapshot
+                    frame, position = await channel.snapshot()
+                    chunks.append(frame)
+                    continue
+                chunks.extend(frames)
+                position = channel.sequence
+                await send(
+                    {"type": "http.response.body", "body": b"".join(chunks) or KEEP_ALIVE, "more_body": True}
+                )
+                chunks = []
+                await asyncio.wait({channel.changed, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done():
+                    return
+        except OSError:
+            # The client went away while writing
+            return
+        finally:
+            disconnected.cancel()
+            leave(channel)
+
+
+# Publish service or incident changes to the status stream of their organization
+# Each event is (event name, action, model JSON), e.g. ("service", "update", json)
+def publish_status_events(org_id: Any, events: List[Tuple[str, str, str]]) -> None:
+    if not events:
+        return
+    org_id = str(org_id)
+    keyed = [
+        (_new_key(), event, f'{{"action":"{action}","data":{data}}}')
+        for event, action, data in events
+    ]
+    _deliver(org_id, keyed)
+    message = {"org": org_id, "events": [[list(key), event, data] for key, event, data in keyed]}
+    if not stream_bus.publish(message):
+        # Too large for one datagram, other workers send a fresh snapshot instead
+        stream_bus.publish({"org": org_id, "resync": True})
+
+
+def _deliver(org_id: str, events: List[Tuple[EventKey, str, str]]) -> None:
+    channel = channels.get(org_id)
+    if channel is not None:
+        channel.append(events)
+
+
+# Deliver events published by another worker of the host
+def _receive(message: Dict[str, Any]) -> None:
+    channel = channels.get(message["org"])
+    if channel is None:
+        return
+    if message.get("resync"):
+        asyncio.ensure_future(channel.resync())
+        return
+    _deliver(message["org"], [(tuple(key), event, data) for key, event, data in message["events"]])
+
+
+# Wake every channel periodically, so viewers send keep-alive comments, and
+# resync channels whose organization may have changed on another host
+async def heartbeat() -> None:
+    while True:
+        await asyncio.sleep(STATUS_STREAM_HEARTBEAT)
+        now = time.monotonic()
+        for channel in list(channels.values()):
+            if STATUS_STREAM_RESYNC and now - channel.resynced_at >= STATUS_STREAM_RESYNC:
+                asyncio.ensure_future(channel.resync())
+            channel.wake()
+
+
+# Event bus between the workers of the host, disabled without STATUS_STREAM_SOCKET_DIR
+stream_bus = WorkerBus("status stream", get_settings().status_stream_socket_dir, _receive)
+_heartbeat_task: Optional[asyncio.Task] = None
+
+
+# Start the bus and the heartbeat, from the app's lifespan
+def start_status_stream() -> None:
+    global _heartbeat_task
+    stream_bus.start()
+    if _heartbeat_task is None:
+        _heartbeat_task = asyncio.ensure_future(heartbeat())
+
+
+# Stop the bus and the heartbeat
+def stop_status_stream() -> None:
+    global _heartbeat_task
+    stream_bus.stop()
+    if _heartbeat_task is not None:
+        _heartbeat_task.cancel()
+        _heartbeat_task = None
@@ -0,0 +1,256 @@
+# Import necessary modules
+# contextvars for tracking the current span across awaits
+# random and secrets for sampling and ID generation
+# hmac for comparing the trace token in constant time
+# JSON-lines writer for writing spans off the event loop
+# Logger for logging
+
+import hmac
+import random
+import re
+import secrets
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from app.core.config import get_settings
+from app.core.jsonl_writer import JsonLinesWriter
+from app.core.logger import logger
+
+# Fraction of requests traced when the caller did not decide, 0 disables sampling
+TRACE_SAMPLE_RATE = get_settings().trace_sample_rate
+# File the JSON-lines exporter appends spans to
+TRACE_FILE = get_settings().trace_file
+# Secret callers send in X-Trace-Token to force or follow their own sampling decision
+TRACE_TOKEN = get_settings().trace_token
+# Maximum number of spans recorded per trace, further spans are dropped
+MAX_SPANS_PER_TRACE = 1000
+
+# W3C trace context header: version-trace_id-parent_id-flags
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+TRACE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# Span currently active in this task, None when the request is not traced
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+# Base class for span exporters
+# Exporters receive every finished trace as a list of spans and must not block
+class SpanExporter:
+    def export(self, spans: List["Span"]) -> None:
+        raise NotImplementedError("Span exporters must implement export.")
+
+    def shutdown(self) -> None:
+        pass
+
+
+# Exporter appending one JSON object per span to a local file
+class JsonLinesFileExporter(SpanExporter):
+    def __init__(self, path: str):
+        self.path = path
+        self._writer = JsonLinesWriter("spans", path, lambda span: span.to_dict())
+
+    def export(self, spans: List["Span"]) -> None:
+        self._writer.write(spans)
+
+    def shutdown(self) -> None:
+        self._writer.close()
+
+
+# Spans collected for one traced request
+class Trace:
+    __slots__ = ("trace_id", "spans", "dropped", "finished")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List[Span] = []
+        self.dropped = 0
+        # Set once the root span ended, background tasks started by the request
+        # inherit its context but no longer record spans
+        self.finished = False
+
+
+# A timed operation within a trace
+class Span:
+    __slots__ = (
+        "trace",
+        "span_id",
+        "parent_id",
+        "name",
+        "attributes",
+        "status",
+        "is_root",
+        "start_time",
+        "duration",
+        "_start",
+        "_token",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace: Trace,
+        parent_id: Optional[str],
+        attributes: Dict[str, Any],
+        is_root: bool = False,
+    ):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.status = "ok"
+        self.is_root = is_root
+        self.start_time = 0.0
+        self.duration = 0.0
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def __enter__(self) -> "Span":
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.duration = time.perf_counter() - self._start
+        if exc_type is not None:
+            self.status = "error"
+            self.attributes["error"] = repr(exc)
+        _current_span.reset(self._token)
+        if self.trace.finished:
+            return False
+        if len(self.trace.spans) < MAX_SPANS_PER_TRACE:
+            self.trace.spans.append(self)
+        else:
+            self.trace.dropped += 1
+        # The root span finishes last, hand the whole trace to the exporter
+        if self.is_root:
+            self.trace.finished = True
+            if self.trace.dropped:
+                self.attributes["dropped_spans"] = self.trace.dropped
+            _export(self.trace.spans)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+# Span used when the current request is not traced, every operation is a no-op
+class _NoopSpan:
+    __slots__ = ()
+
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+# Exporter receiving finished traces, tracing is disabled while it is None
+_exporter: Optional[SpanExporter] = None
+
+
+# Install the exporter receiving finished traces, or None to disable tracing
+def set_exporter(exporter: Optional[SpanExporter]) -> None:
+    global _exporter
+    if _exporter is not None:
+        _exporter.shutdown()
+    _exporter = exporter
+
+
+def _export(spans: List[Span]) -> None:
+    if _exporter is None:
+        return
+    try:
+        _exporter.export(spans)
+    except Exception as e:
+        logger.error(f"Span export failed: {e}")
+
+
+# Whether traces are recorded at all
+def tracing_enabled() -> bool:
+    return _exporter is not None
+
+
+# Start a child span of the current span
+# Returns a no-op span when the current request is not traced, so instrumented
+# code costs one context variable lookup for untraced requests
+def span(name: str, **attributes: Any):
+    parent = _current_span.get()
+    if parent is None or parent.trace.finished:
+        return NOOP_SPAN
+    return Span(name, parent.trace, parent.span_id, attributes)
+
+
+# Get the span active in the current task
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+# Start the root span of a request
+# For trusted callers, a valid trace_id (32 hex characters, e.g. from X-Trace-Id)
+# forces tracing with that ID and an incoming W3C traceparent header's sampling
+# decision is followed. Other requests are sampled at TRACE_SAMPLE_RATE, keeping the
+# IDs of their traceparent. Returns a no-op span when not sampled
+def start_trace(
+    name: str,
+    traceparent: Optional[str] = None,
+    trace_id: Optional[str] = None,
+    trusted: bool = False,
+    **attributes: Any,
+):
+    if _exporter is None:
+        return NOOP_SPAN
+    match = TRACEPARENT.match(traceparent) if traceparent else None
+    sampled = TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE
+    if trusted and trace_id and TRACE_ID.match(trace_id):
+        parent_id = match.group(2) if match else None
+        sampled = True
+    elif match:
+        trace_id, parent_id, flags = match.groups()
+        if trusted:
+            sampled = int(flags, 16) & 1 == 1
+    else:
+        trace_id, parent_id = secrets.token_hex(16), None
+    if not sampled:
+        return NOOP_SPAN
+    return Span(name, Trace(trace_id), parent_id, attributes, is_root=True)
+
+
+# Whether a request's X-Trace-Token matches TRACE_TOKEN
+def trusted_token(token: bytes) -> bool:
+    return bool(TRACE_TOKEN) and hmac.compare_digest(token, TRACE_TOKEN.encode())  # type: ignore
+
+
+# Format the traceparent header propagating a span to downstream services
+def format_traceparent(span: Span) -> str:
+    return f"00-{span.trace_id}-{span.span_id}-01"
+
+
+# Install the JSON-lines exporter when TRACE_FILE is set, called at startup
+def configure_tracing() -> None:
+    if TRACE_FILE and _exporter is None:
+        set_exporter(JsonLinesFileExporter(TRACE_FILE))
@@ -0,0 +1,77 @@
+# Import necessary modules
+# hmac and hashlib for pseudonymizing identifiers
+# JSON-lines writer for writing records off the event loop
+# Logger for logging
+
+import hashlib
+import hmac
+import random
+import re
+from typing import Any, Dict, Optional
+
+from app.core.config import get_settings
+from app.core.jsonl_writer import JsonLinesWriter
+from app.core.logger import logger
+
+# File the recorded request shapes are appended to, recording is disabled when unset
+TRAFFIC_RECORD_PATH = get_settings().traffic_record_path
+# Fraction of requests recorded
+TRAFFIC_RECORD_SAMPLE_RATE = get_settings().traffic_record_sample_rate
+# Key for pseudonymizing identifiers, a random key keeps them stable for one process only
+TRAFFIC_RECORD_KEY = get_settings().traffic_record_key
+
+# Query parameters identifying a tenant or an entity, always pseudonymized
+IDENTIFIER_PARAMS = ("org_slug", "domain", "email")
+# Other values kept verbatim in recorded query strings: small numbers, booleans and
+# lowercase keywords such as limits, enum filters and export formats
+PLAIN_VALUE = re.compile(r"^(\d{1,6}|true|false|[a-z_]{1,32})$")
+
+
+# Replace an identifier by a keyed hash, so equal values stay equal across records
+def pseudonymize(value: Any) -> str:
+    digest = hmac.new(TRAFFIC_RECORD_KEY.encode(), str(value).encode(), hashlib.sha256)
+    return "h:" + digest.hexdigest()[:16]
+
+
+# Keep harmless query values, pseudonymize identifiers and everything else
+def sanitize(name: str, value: str) -> str:
+    if name.endswith("_id") or name in IDENTIFIER_PARAMS:
+        return pseudonymize(value)
+    return value if PLAIN_VALUE.match(value) else pseudonymize(value)
+
+
+# Recorder appending one JSON object per sampled request to a local file
+class TrafficRecorder:
+    def __init__(self, path: str, sample_rate: float = 1.0):
+        self.path = path
+        self.sample_rate = sample_rate
+        self._writer = JsonLinesWriter("traffic", path)
+        logger.info(f"Recording traffic to {path}")
+
+    def sampled(self) -> bool:
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        self._writer.write([entry])
+
+    def shutdown(self) -> None:
+        self._writer.close()
+
+
+# Recorder used by the middleware, None while recording is disabled
+traffic_recorder: Optional[TrafficRecorder] = None
+
+
+# Start recording when TRAFFIC_RECORD_PATH is set, called at startup
+def start_traffic_recording() -> None:
+    global traffic_recorder
+    if TRAFFIC_RECORD_PATH and traffic_recorder is None:
+        traffic_recorder = TrafficRecorder(TRAFFIC_RECORD_PATH, TRAFFIC_RECORD_SAMPLE_RATE)
+
+
+# Stop recording and flush the pending records
+def stop_traffic_recording() -> None:
+    global traffic_recorder
+    if traffic_recorder is not None:
+        traffic_recorder.shutdown()
+        traffic_recorder = None
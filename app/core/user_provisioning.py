@@ -0,0 +1,265 @@
+# Import necessary modules
+# asyncio for running the blocking Firebase calls in worker threads
+# csv and json for parsing uploaded batches
+# Pydantic for validating every row like the single-user endpoint does
+# Firebase auth module, replaceable by stubs for local testing
+# Custom user models
+
+import asyncio
+import csv
+import io
+import json
+import uuid
+from typing import Any, Dict, List, Optional
+
+from pydantic import EmailStr, TypeAdapter, ValidationError
+
+from app.core.firebase_admin import get_auth
+from app.core.logger import logger
+from app.models.base import PyObjectId
+from app.models.user_model import OrgMembership, User, UserRole
+from app.schemas.user_schema import UserCreate
+
+# Maximum number of rows accepted in one batch
+MAX_BULK_USERS = 10000
+# Firebase limits: users per import_users or delete_users call, identifiers per get_users call
+FIREBASE_IMPORT_BATCH = 1000
+FIREBASE_LOOKUP_BATCH = 100
+# Users with a password created at once, each through its own create_user call
+PASSWORD_USER_CONCURRENCY = 8
+
+# Validates emails the way the User model does
+_email_adapter = TypeAdapter(EmailStr)
+
+
+# Raised when an uploaded batch cannot be parsed at all
+class BatchFormatError(ValueError):
+    pass
+
+
+# Parse an uploaded batch into raw rows
+# CSV needs a header row with at least email and full_name; JSON is a list of objects
+# or an object with a "users" list
+def parse_batch(body: bytes, content_type: str) -> List[Dict[str, Any]]:
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise BatchFormatError("Batch must be UTF-8 encoded")
+    if "csv" in content_type:
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames or not {"email", "full_name"} <= set(reader.fieldnames):
+            raise BatchFormatError("CSV header must include email and full_name")
+        # Empty cells mean the optional column is not set
+        rows = [{k: v for k, v in row.items() if k and v} for row in reader]
+    else:
+        try:
+            data = json.loads(text)
+        except ValueError:
+            raise BatchFormatError("Batch must be valid JSON or CSV")
+        rows = data.get("users") if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            raise BatchFormatError("JSON batch must be a list of users")
+    if len(rows) > MAX_BULK_USERS:
+        raise BatchFormatError(f"A batch may contain at most {MAX_BULK_USERS} users")
+    return rows
+
+
+def _chunks(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[start : start + size] for start in range(0, len(items), size)]
+
+
+# Find the Firebase accounts that already exist for the given emails
+# Returns the uid per email; runs in a worker thread
+def _find_firebase_accounts(emails: List[str]) -> Dict[str, str]:
+    auth = get_auth()
+    accounts: Dict[str, str] = {}
+    for chunk in _chunks(emails, FIREBASE_LOOKUP_BATCH):
+        result = auth.get_users([auth.EmailIdentifier(email) for email in chunk])
+        for record in result.users:
+            # Firebase stores emails in lower case
+            accounts[record.email.lower()] = record.uid
+    return accounts
+
+
+# Import passwordless accounts in batches, returning the error per row index
+# import_users skips Firebase's uniqueness checks, so callers must exclude emails
+# that already have an account; runs in a worker thread
+def _import_firebase_accounts(rows: List[Dict[str, Any]]) -> Dict[int, str]:
+    auth = get_auth()
+    errors: Dict[int, str] = {}
+    for offset in range(0, len(rows), FIREBASE_IMPORT_BATCH):
+        chunk = rows[offset : offset + FIREBASE_IMPORT_BATCH]
+        records = [
+            auth.ImportUserRecord(
+                uid=row["uid"],
+                email=row["user"].email,
+                display_name=row["user"].full_name,
+                photo_url=row["user"].photo_url,
+            )
+            for row in chunk
+        ]
+        try:
+            result = auth.import_users(records)
+        except Exception as e:
+            for index in range(len(chunk)):
+                errors[offset + index] = f"Failed to create user in Firebase: {e}"
+            continue
+        for error in result.errors:
+            errors[offset + error.index] = f"Failed to create user in Firebase: {error.reason}"
+    return errors
+
+
+# Create accounts with a password one by one, since import_users needs passwords
+# already hashed; bounded so a large batch does not occupy every worker thread
+async def _create_password_accounts(rows: List[Dict[str, Any]]) -> None:
+    auth = get_auth()
+    semaphore = asyncio.Semaphore(PASSWORD_USER_CONCURRENCY)
+
+    async def create(row: Dict[str, Any]) -> None:
+        user_data: UserCreate = row["user"]
+        async with semaphore:
+            try:
+                record = await asyncio.to_thread(
+                    auth.create_user,
+                    email=user_data.email,
+                    password=user_data.password,
+                    display_name=user_data.full_name,
+                    photo_url=user_data.photo_url,
+                )
+                row["uid"] = record.uid
+            except Exception as e:
+                row["error"] = f"Failed to create user in Firebase: {e}"
+
+    await asyncio.gather(*(create(row) for row in rows))
+
+
+# Delete accounts created by this batch whose user could not be saved
+def _delete_firebase_accounts(uids: List[str]) -> None:
+    auth = get_auth()
+    for chunk in _chunks(uids, FIREBASE_IMPORT_BATCH):
+        try:
+            auth.delete_users(chunk)
+        except Exception as e:
+            logger.error(f"Failed to delete {len(chunk)} Firebase accounts: {e}")
+
+
+# Provision a batch of users as members of an organization
+# Rows are validated, deduplicated within the batch and against existing users with a
+# single query, given Firebase accounts (reusing existing ones, importing passwordless
+# ones in batches) and saved with one insert_many.
+# Returns a summary and one result per row with its status:
+# created, linked (Firebase account existed), exists, duplicate, invalid or failed
+async def provision_users(
+    raw_rows: List[Dict[str, Any]],
+    org_id: str,
+    org_slug: str,
+    created_by: Optional[PyObjectId],
+) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = []
+    rows: List[Dict[str, Any]] = []
+    seen = set()
+    for index, raw in enumerate(raw_rows):
+        result: Dict[str, Any] = {"row": index, "email": None, "status": "invalid"}
+        results.append(result)
+        if not isinstance(raw, dict):
+            result["error"] = "Row must be an object"
+            continue
+        try:
+            user_data = UserCreate(**raw)
+            _email_adapter.validate_python(user_data.email)
+        except ValidationError as e:
+            result["error"] = str(e)
+            continue
+        result["email"] = user_data.email
+        if user_data.email in seen:
+            result["status"] = "duplicate"
+            continue
+        seen.add(user_data.email)
+        rows.append({"result": result, "user": user_data, "uid": None, "error": None})
+
+    if not rows:
+        return _summarize(results)
+
+    # Skip users that already exist, in one query
+    emails = [row["user"].email for row in rows]
+    existing = set(await User.find_values("email", {"email": {"$in": emails}}))
+    for row in rows:
+        if row["user"].email in existing:
+            row["result"]["status"] = "exists"
+    rows = [row for row in rows if row["user"].email not in existing]
+
+    # Reuse Firebase accounts that exist without a user in the database
+    accounts = await asyncio.to_thread(
+        _find_firebase_accounts, [row["user"].email for row in rows]
+    )
+    linked = set()
+    new_rows, password_rows = [], []
+    for row in rows:
+        uid = accounts.get(row["user"].email)
+        if uid is not None:
+            row["uid"] = uid
+            linked.add(uid)
+        elif row["user"].password:
+            password_rows.append(row)
+        else:
+            row["uid"] = uuid.uuid4().hex
+            new_rows.append(row)
+
+    if new_rows:
+        errors = await asyncio.to_thread(_import_firebase_accounts, new_rows)
+        for index, error in errors.items():
+            new_rows[index]["uid"] = None
+            new_rows[index]["error"] = error
+    if password_rows:
+        await _create_password_accounts(password_rows)
+
+    # Save every user with a Firebase account in one round trip
+    ready = [row for row in rows if row["uid"] is not None]
+    users = [
+        User(
+            email=row["user"].email,
+            full_name=row["user"].full_name,
+            photo_url=row["user"].photo_url,
+            created_by=created_by,
+            org_memberships=[
+                OrgMembership(
+                    org_id=PyObjectId(org_id), org_slug=org_slug, role=UserRole.MEMBER
+                )
+            ],
+        )
+        for row in ready
+    ]
+    # When the insert fails as a whole, some users may have been saved; their Firebase
+    # accounts are kept, a retry links the accounts of the users that were not
+    try:
+        insert_errors = await User.insert_many(users)
+        outcome_known = True
+    except Exception as e:
+        insert_errors = {index: str(e) for index in range(len(users))}
+        outcome_known = False
+    orphaned = []
+    for index, (row, user) in enumerate(zip(ready, users)):
+        if index in insert_errors:
+            row["error"] = f"Failed to save user: {insert_errors[index]}"
+            if outcome_known and row["uid"] not in linked:
+                orphaned.append(row["uid"])
+        else:
+            row["result"]["status"] = "linked" if row["uid"] in linked else "created"
+            row["result"]["user_id"] = str(user.id)
+    if orphaned:
+        await asyncio.to_thread(_delete_firebase_accounts, orphaned)
+
+    for row in rows:
+        if row["error"]:
+            row["result"]["status"] = "failed"
+            row["result"]["error"] = row["error"]
+
+    return _summarize(results)
+
+
+# Count the row results by status
+def _summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary: Dict[str, int] = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return {"total": len(results), "summary": summary, "results": results}
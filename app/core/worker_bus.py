@@ -0,0 +1,92 @@
+# Import necessary modules
+# asyncio for reading the socket from the event loop
+# json for the messages
+# socket for unix datagram sockets between the workers of a host
+
+import asyncio
+import json
+import os
+import socket
+from typing import Any, Callable, Dict, Optional
+
+from app.core.logger import logger
+
+# Largest datagram sent, well below the default socket buffer size
+MAX_DATAGRAM = 64 * 1024
+
+
+# Message bus between the workers of a host over unix datagram sockets
+# Every worker binds <directory>/<pid>.sock and sends its messages to every other
+# socket of the directory; received messages are passed to the handler. Sockets of
+# workers that died are removed by the first sender that finds nobody listening.
+# A datagram a busy worker cannot take is dropped, so users of the bus must tolerate
+# lost messages, e.g. by expiring what the message would have refreshed.
+class WorkerBus:
+    def __init__(
+        self, name: str, directory: Optional[str], handler: Callable[[Dict[str, Any]], None]
+    ):
+        self.name = name
+        self.directory = directory
+        self.handler = handler
+        self.path: Optional[str] = None
+        self._socket: Optional[socket.socket] = None
+
+    # Bind this worker's socket and start receiving messages
+    # Called after the fork, from the app's lifespan
+    def start(self) -> None:
+        if self.directory is None or self._socket is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f"{os.getpid()}.sock")
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(self.path)
+        self._socket.setblocking(False)
+        asyncio.get_running_loop().add_reader(self._socket.fileno(), self._receive)
+
+    # Stop receiving and remove this worker's socket
+    def stop(self) -> None:
+        if self._socket is None:
+            return
+        asyncio.get_running_loop().remove_reader(self._socket.fileno())
+        self._socket.close()
+        self._socket = None
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    # Send a message to the other workers
+    # Returns False when the message is too large for one datagram
+    def publish(self, message: Dict[str, Any]) -> bool:
+        if self._socket is None:
+            return True
+        datagram = json.dumps(message, separators=(",", ":")).encode()
+        if len(datagram) > MAX_DATAGRAM:
+            return False
+        for entry in os.scandir(self.directory):
+            if entry.path == self.path or not entry.name.endswith(".sock"):
+                continue
+            try:
+                self._socket.sendto(datagram, entry.path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Nobody listens anymore, the worker is gone
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+            except BlockingIOError:
+                logger.warning(f"Dropped {self.name} message for {entry.name}")
+        return True
+
+    def _receive(self) -> None:
+        while True:
+            try:
+                datagram = self._socket.recv(MAX_DATAGRAM)
+            except (BlockingIOError, OSError):
+                return
+            try:
+                self.handler(json.loads(datagram))
+            except (ValueError, KeyError, TypeError) as e:
+                logger.error(f"Invalid {self.name} message: {e}")
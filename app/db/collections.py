@@ -1,19 +1,106 @@
 # Import necessary modules
 # Motor for asynchronous MongoDB operations
-# dotenv for loading environment variables
-# os for accessing environment variables
+# PyMongo read preferences for routing reads to secondaries
+# Typed settings for the connection string and database name
+# Command listener recording MongoDB metrics
 
-from motor.motor_asyncio import AsyncIOMotorClient
-from dotenv import load_dotenv
-import os
+from typing import Any, Dict, Optional
 
-# Load environment variables from a .env file
-load_dotenv()
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.read_preferences import SecondaryPreferred
 
-# Get the MongoDB URL from environment variables or use a default
-MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
-client = AsyncIOMotorClient(MONGO_URL)
+from app.core.config import Settings, get_settings
+from app.core.metrics import MongoCommandMetrics
 
-# Get the MongoDB database name from environment variables or use a default
-MONGO_DB = os.getenv("MONGO_DB", "mydatabase")
-db = client[MONGO_DB]
+# Client and database of this process, created on first use
+# The client is created by the app's lifespan, after gunicorn forked the worker,
+# so workers never share connection pools or monitor threads with their parent
+_client: Optional[AsyncIOMotorClient] = None
+_database: Optional[AsyncIOMotorDatabase] = None
+
+
+# Read preference for reads that tolerate bounded staleness, None when they should
+# stay on the primary like every other read
+_secondary_read_preference: Optional[SecondaryPreferred] = None
+
+
+# Build the MongoDB client options from the settings
+# Options left unset keep the driver defaults
+def client_options(settings: Settings) -> Dict[str, Any]:
+    options: Dict[str, Any] = {
+        "maxPoolSize": settings.mongo_max_pool_size,
+        "minPoolSize": settings.mongo_min_pool_size,
+        "serverSelectionTimeoutMS": settings.mongo_server_selection_timeout_ms,
+    }
+    if settings.mongo_max_idle_time_ms is not None:
+        options["maxIdleTimeMS"] = settings.mongo_max_idle_time_ms
+    if settings.mongo_socket_timeout_ms is not None:
+        # Bounds executor threads blocked on a stalled server, including writes
+        options["socketTimeoutMS"] = settings.mongo_socket_timeout_ms
+    if settings.mongo_compressors:
+        # The server picks the first compressor of the list it also supports;
+        # zstd needs the zstandard package and snappy python-snappy
+        options["compressors"] = settings.mongo_compressors
+    if settings.mongo_zlib_compression_level is not None:
+        options["zlibCompressionLevel"] = settings.mongo_zlib_compression_level
+    return options
+
+
+# Create the MongoDB client if needed and return the database
+def connect() -> AsyncIOMotorDatabase:
+    global _client, _database, _secondary_read_preference
+    if _database is None:
+        settings = get_settings()
+        _client = AsyncIOMotorClient(
+            settings.mongo_url,
+            event_listeners=[MongoCommandMetrics()],
+            **client_options(settings),
+        )
+        _database = _client[settings.mongo_db]
+        if settings.mongo_secondary_reads:
+            # Falls back to the primary when no secondary is within the staleness bound
+            _secondary_read_preference = SecondaryPreferred(
+                max_staleness=settings.mongo_max_staleness_seconds
+            )
+    return _database
+
+
+# Get the read preference for staleness-tolerant reads, None to read from the primary
+def secondary_read_preference() -> Optional[SecondaryPreferred]:
+    connect()
+    return _secondary_read_preference
+
+
+# Get the MongoDB client, creating it if needed
+def get_client() -> AsyncIOMotorClient:
+    connect()
+    return _client
+
+
+# Close the MongoDB client, the next use creates a new one
+def close() -> None:
+    global _client, _database
+    if _client is not None:
+        _client.close()
+    _client = None
+    _database = None
+
+
+# Use an existing database handle instead of connecting, e.g. a local stand-in
+def use_database(database: AsyncIOMotorDatabase) -> None:
+    global _client, _database
+    _client = database.client
+    _database = database
+
+
+# Database handle resolving to the database of the current client
+# Models keep a reference to it at import time, long before the client exists
+class LazyDatabase:
+    def __getitem__(self, name: str):
+        return connect()[name]
+
+    def __getattr__(self, name: str):
+        return getattr(connect(), name)
+
+
+db = LazyDatabase()
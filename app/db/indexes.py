@@ -0,0 +1,37 @@
+# Import necessary modules
+# Custom models declaring their indexes
+# Logger for logging
+
+from app.core.logger import logger
+from app.models.api_key_model import ApiKey
+from app.models.health_check_model import HealthCheck
+from app.models.incident_model import Incident
+from app.models.log_model import LogEntry
+from app.models.org_model import Organization
+from app.models.probe_metrics_model import ProbeDownsampleRun, ProbeRollup, ProbeSampleBucket
+from app.models.service_model import Service
+from app.models.status_log_model import StatusLog
+from app.models.team_model import Team
+from app.models.user_model import User
+
+# Models whose declared indexes are created at startup
+INDEXED_MODELS = [
+    Organization, User, Team, Service, Incident, LogEntry, StatusLog, HealthCheck,
+    ProbeSampleBucket, ProbeRollup, ProbeDownsampleRun, ApiKey,
+]
+
+
+# Create the declared indexes of every model
+# create_indexes is a no-op for indexes that already exist with the same spec; a model
+# whose indexes cannot be created is logged and does not stop the others
+async def ensure_indexes() -> None:
+    for model in INDEXED_MODELS:
+        indexes = model.indexes()
+        if not indexes:
+            continue
+        try:
+            names = await model.collection().create_indexes(indexes)
+        except Exception as e:
+            logger.error(f"Failed to ensure indexes on {model.collection().name}: {e}")
+            continue
+        logger.info(f"Ensured indexes on {model.collection().name}: {', '.join(names)}")
@@ -0,0 +1,170 @@
+"""Migration converting IDs stored as strings to ObjectIds
+
+Usage:
+  python -m app.db.migrate_object_ids --dry-run
+  python -m app.db.migrate_object_ids --collections users,incidents --batch-size 1000
+
+Older code stored some IDs as strings, e.g. current_org.org_id of users. A field
+holding both strings and ObjectIds breaks equality matches and the indexes serving
+them, as the two types never compare equal. For every model, this scans the documents
+with a string at one of the model's ID paths (DocumentModel.id_paths) and rewrites
+them in place with bulk writes, reporting progress per batch.
+
+The migration is resumable: converted documents no longer match the scan, so an
+interrupted run is continued by running it again. Each update only applies if the
+converted fields still hold the values read, so concurrent writes are never
+overwritten; such documents are picked up by the next run. Documents whose _id is a
+string are copied to an ObjectId _id and the original removed.
+At the end, the string values left (residue), e.g. strings that are no valid ID,
+are reported per path and the exit code is 1 if any remain.
+"""
+
+import argparse
+import asyncio
+import sys
+from typing import Any, Dict, List, Optional, Type
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.db import collections
+from app.db.indexes import INDEXED_MODELS
+from app.models.base import DocumentModel, normalize_ids
+
+# Sample IDs listed per path in the residue report
+RESIDUE_SAMPLES = 5
+
+
+# Filter matching the documents of a model with a string at one of its ID paths
+def string_id_filter(model: Type[DocumentModel]) -> Dict[str, Any]:
+    return {"$or": [{path: {"$type": "string"}} for path in sorted(model.id_paths())]}
+
+
+# Convert the documents of one model, returning the counts of the run
+async def migrate_model(
+    model: Type[DocumentModel], batch_size: int, dry_run: bool
+) -> Dict[str, int]:
+    collection = model.collection()
+    paths = model.id_paths()
+    query = string_id_filter(model)
+    counts = {"scanned": 0, "converted": 0, "skipped": 0, "conflicts": 0}
+    total = await collection.count_documents(query)
+    print(f"{collection.name}: {total} documents with string IDs")
+    if total == 0 or dry_run:
+        return counts
+
+    operations: List[UpdateOne] = []
+
+    async def flush() -> None:
+        if not operations:
+            return
+        try:
+            result = await collection.bulk_write(operations, ordered=False)
+            matched = result.matched_count
+        except BulkWriteError as e:
+            matched = e.details.get("nMatched", 0)
+        counts["converted"] += matched
+        # Changed since they were read, the next run converts them
+        counts["skipped"] += len(operations) - matched
+        operations.clear()
+        print(
+            f"{collection.name}: {counts['scanned']}/{total} scanned, "
+            f"{counts['converted']} converted"
+        )
+
+    async for document in collection.find(query, batch_size=batch_size).sort("_id", 1):
+        counts["scanned"] += 1
+        converted = normalize_ids(document, paths)
+        if converted["_id"] != document["_id"]:
+            # _id cannot be updated, copy the document under the ObjectId instead
+            try:
+                await collection.insert_one(converted)
+            except DuplicateKeyError:
+                counts["conflicts"] += 1
+                continue
+            await collection.delete_one({"_id": document["_id"]})
+            counts["converted"] += 1
+            continue
+        changes = {
+            key: value for key, value in converted.items() if value != document[key]
+        }
+        if not changes:
+            # Only strings that are no valid ID, reported as residue
+            continue
+        operations.append(
+            UpdateOne(
+                {"_id": document["_id"], **{key: document[key] for key in changes}},
+                {"$set": changes},
+            )
+        )
+        if len(operations) >= batch_size:
+            await flush()
+    await flush()
+    return counts
+
+
+# Count the string values left at every ID path of a model
+async def report_residue(model: Type[DocumentModel]) -> int:
+    collection = model.collection()
+    residue = 0
+    for path in sorted(model.id_paths()):
+        query = {path: {"$type": "string"}}
+        count = await collection.count_documents(query)
+        if not count:
+            continue
+        residue += count
+        samples = await collection.find(query, {"_id": 1}).limit(RESIDUE_SAMPLES).to_list(
+            length=RESIDUE_SAMPLES
+        )
+        print(
+            f"  {collection.name}.{path}: {count} documents, e.g. "
+            + ", ".join(str(sample["_id"]) for sample in samples)
+        )
+    return residue
+
+
+async def main(args: argparse.Namespace) -> int:
+    models = [
+        model
+        for model in INDEXED_MODELS
+        if not args.collections or model.collection().name in args.collections
+    ]
+    try:
+        for model in models:
+            counts = await migrate_model(model, args.batch_size, args.dry_run)
+            if not args.dry_run and counts["scanned"]:
+                print(
+                    f"{model.collection().name}: converted {counts['converted']}, "
+                    f"skipped {counts['skipped']} changed concurrently, "
+                    f"{counts['conflicts']} _id conflicts"
+                )
+        print("Residue:")
+        residue = 0
+        for model in models:
+            residue += await report_residue(model)
+        if not residue:
+            print("  none")
+        return 1 if residue else 0
+    finally:
+        collections.close()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--collections",
+        type=lambda value: [name for name in value.split(",") if name],
+        default=None,
+        help="Comma-separated collections to migrate, default all",
+    )
+    parser.add_argument("--batch-size", type=int, default=500, help="Updates per bulk write")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Only count the documents to convert"
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
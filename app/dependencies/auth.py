@@ -1,9 +1,12 @@
 # Import necessary modules
 # FastAPI components for handling requests and exceptions
+# API key lookup for machine clients
 # Typing for type hints
 
 from fastapi import Request, HTTPException, Depends
 from typing import List
+from app.core.api_keys import find_api_key
+from app.models.api_key_model import ApiKey
 
 
 # Function to get the current user from the request state
@@ -15,12 +18,28 @@ def get_current_user(request: Request):
     return user
 
 
+# Function to get the API key a machine client authenticated with
+# The key is taken from the X-API-Key header or an Authorization: Bearer header, so
+# webhook senders that only support one of them work.
+# Raises an HTTPException if no valid key was presented
+async def get_api_key(request: Request) -> ApiKey:
+    key = request.headers.get("X-API-Key")
+    if not key:
+        auth_header = request.headers.get("Authorization", "")
+        if auth_header.startswith("Bearer "):
+            key = auth_header[len("Bearer ") :]
+    api_key = await find_api_key(key.strip()) if key else None
+    if not api_key:
+        raise HTTPException(status_code=401, detail="Unauthorized: Missing or invalid API key")
+    return api_key
+
+
 # Function to create a role checker dependency
 # Accepts a list of allowed roles
 # Returns a checker function that verifies the user's role
 def require_roles(allowed_roles: List[str]):
     def checker(user=Depends(get_current_user)):
-        if user["role"] not in allowed_roles:
+        if user.role not in allowed_roles:
             raise HTTPException(status_code=403, detail="Forbidden: Insufficient role")
         return user
 
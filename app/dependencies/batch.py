@@ -0,0 +1,27 @@
+# Import necessary modules
+# FastAPI components for query parameters and exceptions
+# ObjectId for validating the requested IDs
+
+from typing import List
+
+from bson import ObjectId
+from fastapi import HTTPException, Query
+
+# Maximum number of IDs or changes accepted by one batch request
+MAX_BATCH_SIZE = 500
+
+
+# Function to read the IDs of a batch request
+# Accepts repeated or comma-separated ids query parameters
+# Raises an HTTPException if an ID is invalid or the batch is too large
+def batch_ids(ids: List[str] = Query(..., description="IDs, repeated or comma-separated")) -> List[ObjectId]:
+    values = [value.strip() for param in ids for value in param.split(",") if value.strip()]
+    if len(values) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_BATCH_SIZE} IDs per request"
+        )
+    invalid = [value for value in values if not ObjectId.is_valid(value)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid IDs: {', '.join(invalid[:10])}")
+    # Drop duplicates, keeping the order of the request
+    return list(dict.fromkeys(ObjectId(value) for value in values))
@@ -6,10 +6,28 @@
 # CORS middleware for handling cross-origin requests
 # Logger for logging
 # Firebase authentication middleware
-# Firebase admin setup
+# Firebase admin setup, run by the lifespan
 # WebSocket manager for handling active connections
+# Metrics middleware and Prometheus text rendering
+# Profiling middleware for opt-in per-request profiles
+# Tracing middleware for sampled request traces
+# Traffic recorder middleware for capturing request shapes
+# Deadline middleware and circuit breaker errors for a degraded database
+# Admission middleware shedding load before any other work
+# Bulkhead middleware scheduling requests fairly between organizations
+# Loader middleware giving every request its own batching loaders
+# Org directory warmed at startup
+# Index creation at startup
+# Tracing and traffic recording writers started in the worker
+# Entity cache invalidations received from the other workers
+# Status stream events exchanged with the other workers
+# Health check scheduler run in processes with HEALTH_CHECKS
+# Alert ingestion pipeline flushed in the background
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, WebSocket
+from starlette.websockets import WebSocketDisconnect, WebSocketState
+from app.db import collections
 from app.db.collections import db
 from app.routes.org_routes import router as org_router
 from app.routes.user_routes import router as user_router
@@ -18,16 +36,82 @@ from app.routes.service_routes import router as service_router
 from app.routes.incident_routes import router as incident_router
 from app.routes.status_routes import router as status_router
 from app.routes.log_routes import router as log_router
-from fastapi.responses import JSONResponse
+from app.routes.admin_routes import router as admin_router
+from app.routes.health_check_routes import router as health_check_router
+from app.routes.api_key_routes import router as api_key_router
+from app.routes.ingest_routes import router as ingest_router
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.logger import logger
 from app.middleware.firebase_auth import FirebaseAuthMiddleware
-import app.core.firebase_admin
-from app.websocket_manager import active_connections
+from app.core.firebase_admin import init_firebase
+from app.websocket_manager import connect, disconnect
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.profiling import ProfilingMiddleware
+from app.middleware.tracing import TracingMiddleware
+from app.middleware.traffic_recorder import TrafficRecorderMiddleware
+from app.middleware.deadlines import DeadlineMiddleware
+from app.middleware.admission import AdmissionMiddleware
+from app.middleware.bulkheads import BulkheadMiddleware
+from app.middleware.loaders import LoaderMiddleware
+from app.core.circuit_breaker import DatabaseUnavailable, unavailable_response
+from app.core.deadlines import DeadlineExceeded
+from app.core.metrics import render_metrics
+from app.core.org_directory import org_directory
+from app.core.entity_cache import invalidation_bus
+from app.core.status_stream import start_status_stream, stop_status_stream
+from app.core.health_checks import start_health_checks, stop_health_checks
+from app.core.alert_ingest import start_alert_ingest, stop_alert_ingest
+from app.db.indexes import ensure_indexes
+from app.core.tracing import configure_tracing, set_exporter
+from app.core.traffic import start_traffic_recording, stop_traffic_recording
+
+
+# Create and release the resources of a worker
+# Everything holding connections or threads is created here rather than at import,
+# so it exists once per worker process and is created after gunicorn forks
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_firebase()
+    collections.connect()
+    configure_tracing()
+    start_traffic_recording()
+    invalidation_bus.start()
+    start_status_stream()
+    # Create the indexes declared by the models
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        logger.error(f"Failed to ensure indexes: {e}")
+    # Warm the org directory so public org lookups are served from memory
+    try:
+        await org_directory.warm()
+    except Exception as e:
+        logger.error(f"Failed to warm org directory: {e}")
+    # Probe the registered health checks when HEALTH_CHECKS is set
+    start_health_checks()
+    start_alert_ingest()
+    yield
+    await stop_health_checks()
+    # Write the alerts still queued
+    await stop_alert_ingest()
+    stop_traffic_recording()
+    invalidation_bus.stop()
+    stop_status_stream()
+    set_exporter(None)
+    collections.close()
+
 
 # Create a FastAPI application instance
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# Add loader middleware first, the loaders it scopes are only used by the routes
+app.add_middleware(LoaderMiddleware)
+
+# Add bulkhead middleware next so it runs inside authentication and knows the user's org
+# It only acts when BULKHEADS is set
+app.add_middleware(BulkheadMiddleware)
 
 # Add Firebase authentication middleware
 app.add_middleware(FirebaseAuthMiddleware)
@@ -40,6 +124,10 @@ app.include_router(service_router)  # Service routes
 app.include_router(incident_router)  # Incident routes
 app.include_router(status_router)  # Status routes
 app.include_router(log_router)  # Log routes
+app.include_router(admin_router)  # Admin routes
+app.include_router(health_check_router)  # Health check routes
+app.include_router(api_key_router)  # API key routes
+app.include_router(ingest_router)  # Alert ingestion routes, authenticated by API key
 
 # Add CORS middleware if needed
 app.add_middleware(
@@ -50,6 +138,25 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+# Add deadline middleware around authentication so the user lookup has a deadline too
+app.add_middleware(DeadlineMiddleware)
+
+# Add tracing middleware so every stage below it records into the request's trace
+app.add_middleware(TracingMiddleware)
+
+# Add metrics middleware around the other middleware so it times the whole request
+app.add_middleware(MetricsMiddleware)
+
+# Add traffic recorder middleware, it only acts when TRAFFIC_RECORD_PATH is set
+app.add_middleware(TrafficRecorderMiddleware)
+
+# Add profiling middleware, it only acts on requests carrying the profiling token
+app.add_middleware(ProfilingMiddleware)
+
+# Add admission middleware last so it is outermost and shed requests cost almost nothing
+# It only acts when ADMISSION_CONTROL is set
+app.add_middleware(AdmissionMiddleware)
+
 
 # Root endpoint to check API status
 @app.get("/")
@@ -58,6 +165,21 @@ async def root():
     return {"message": "API is running", "db_status": status}
 
 
+# Metrics endpoint in Prometheus text format
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(
+        render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+# Answer requests the database could not serve in time with 503 or 504
+@app.exception_handler(DatabaseUnavailable)
+@app.exception_handler(DeadlineExceeded)
+async def database_unavailable_handler(request, exc):
+    return unavailable_response(exc)
+
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -72,15 +194,18 @@ async def global_exception_handler(request, exc):
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()  # Accept the WebSocket connection
-    active_connections.append(websocket)  # Add to active connections
+    connect(websocket)  # Add to active connections
     try:
         while True:
             data = await websocket.receive_text()  # Receive data from the client
             # Process the received data and send a response
             await websocket.send_text(f"Message text was: {data}")
+    except WebSocketDisconnect:
+        pass  # The client closed the connection
     except Exception as e:
         logger.error(f"WebSocket error: {e}")  # Log WebSocket errors
     finally:
-        active_connections.remove(websocket)  # Remove from active connections
-        active_connections.remove(websocket)
-        await websocket.close()
+        disconnect(websocket)  # Remove from active connections
+        # Close the connection unless the client already closed it
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close()
@@ -0,0 +1,151 @@
+# Import necessary modules
+# json and math for the rejection body and its Retry-After header
+# Admission controller, priority classes and public paths
+
+import json
+import math
+import time
+from typing import Optional
+from urllib.parse import parse_qs
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.admission import (
+    ADMISSION_CONTROL,
+    OPERATOR_READ,
+    OPERATOR_WRITE,
+    PUBLIC,
+    admission,
+)
+from app.core.config import get_settings
+from app.core.status_stream import STREAM_PATH
+from app.middleware.firebase_auth import PUBLIC_PATH_PREFIXES
+
+# Paths never limited, so monitoring keeps working under overload
+EXEMPT_PATH_PREFIXES = ("/metrics",)
+
+# Query parameters naming the organization of a public request
+ORG_QUERY_PARAMS = ("org_slug", "domain")
+
+# Number of proxies whose X-Forwarded-For entries are trusted
+TRUSTED_PROXIES = get_settings().admission_trusted_proxies
+
+# Methods that only read
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+# Whether a request carries a Bearer token or an API key
+def _has_credentials(scope: Scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"x-api-key" or (
+            name == b"authorization" and value[:7].lower() == b"bearer "
+        ):
+            return True
+    return False
+
+
+# Priority class of a request
+# Requests without credentials are public. Tokens are not verified yet at this point,
+# so requests with one are still rate limited per client IP
+def classify(scope: Scope) -> int:
+    if scope["path"].startswith(PUBLIC_PATH_PREFIXES) or not _has_credentials(scope):
+        return PUBLIC
+    if scope["method"] in READ_METHODS:
+        return OPERATOR_READ
+    return OPERATOR_WRITE
+
+
+# IP address of the client, taken from X-Forwarded-For when behind trusted proxies
+def client_ip(scope: Scope) -> Optional[str]:
+    if TRUSTED_PROXIES:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                addresses = [a.strip() for a in value.decode("latin-1").split(",")]
+                # The last proxy appended the address it saw, anything before it
+                # came from the client and may be forged
+                if len(addresses) >= TRUSTED_PROXIES:
+                    return addresses[-TRUSTED_PROXIES]
+                return addresses[0]
+    client = scope.get("client")
+    return client[0] if client else None
+
+
+# Organization a public request is about, e.g. the slug of a status page
+def org_key(scope: Scope) -> Optional[str]:
+    query_string = scope.get("query_string", b"")
+    if not query_string:
+        return None
+    query = parse_qs(query_string.decode("latin-1"))
+    for name in ORG_QUERY_PARAMS:
+        if query.get(name):
+            return f"{name}:{query[name][0]}"
+    return None
+
+
+async def _reject(send: Send, status_code: int, retry_after: float, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+# Pure ASGI middleware admitting or shedding requests before any other work
+# Public requests are rate limited per client IP and organization, requests with
+# credentials per client IP (429). Every request but status streams needs a slot
+# below its class's share of the adaptive concurrency limit (503).
+# Without ADMISSION_CONTROL the middleware only forwards the request
+class AdmissionMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            not ADMISSION_CONTROL
+            or scope["type"] != "http"
+            or scope["path"].startswith(EXEMPT_PATH_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        priority = classify(scope)
+        if priority == PUBLIC:
+            wait = admission.rate_limit(client_ip(scope), org_key(scope))
+        else:
+            wait = admission.rate_limit_credentials(client_ip(scope), priority)
+        if wait:
+            await _reject(send, 429, wait, "Too many requests")
+            return
+        if scope["path"].startswith(STREAM_PATH):
+            # Streams stay open for as long as the page is, they would pin a slot each
+            # and their latency says nothing about load; only connecting is limited
+            await self.app(scope, receive, send)
+            return
+        if not admission.try_acquire(priority):
+            await _reject(send, 503, 1, "Server overloaded")
+            return
+
+        start = time.perf_counter()
+        latency: Optional[float] = None
+
+        # Latency up to the response start, so streaming exports do not count as slow
+        async def send_wrapper(message: Message):
+            nonlocal latency
+            if message["type"] == "http.response.start":
+                latency = time.perf_counter() - start
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if latency is None:
+                latency = time.perf_counter() - start
+            admission.release(priority, latency)
@@ -0,0 +1,56 @@
+# Import necessary modules
+# Tenant resolution shared with the traffic recorder
+# Fair scheduler and the organization of the current request
+# Deadline errors answered with 504
+
+from urllib.parse import parse_qsl
+
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.bulkheads import BULKHEADS, TenantQueueFull, current_tenant, scheduler
+from app.core.circuit_breaker import unavailable_response
+from app.core.deadlines import DeadlineExceeded
+from app.core.status_stream import STREAM_PATH
+from app.middleware.traffic_recorder import resolve_tenant
+
+# Scheduling key of requests made for no particular organization
+UNKNOWN_TENANT = "-"
+
+
+# Pure ASGI middleware running every request inside its organization's bulkhead
+# It sits inside the authentication middleware, so the user's current organization is
+# known; public requests use the organization named in the query string.
+# Without BULKHEADS the middleware only forwards the request
+class BulkheadMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # Status streams would hold their organization's slots while open
+        if not BULKHEADS or scope["type"] != "http" or scope["path"].startswith(STREAM_PATH):
+            await self.app(scope, receive, send)
+            return
+
+        query = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+        tenant = resolve_tenant(scope, query) or UNKNOWN_TENANT
+        try:
+            await scheduler.acquire(tenant)
+        except TenantQueueFull:
+            response = JSONResponse(
+                {"detail": "Too many requests for this organization"},
+                status_code=429,
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+        except DeadlineExceeded as e:
+            await unavailable_response(e)(scope, receive, send)
+            return
+
+        token = current_tenant.set(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_tenant.reset(token)
+            scheduler.release(tenant)
@@ -0,0 +1,24 @@
+# Import necessary modules
+# Route matching shared with the metrics middleware
+# Per-route database time budgets
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.deadlines import deadline, route_budget
+from app.middleware.metrics import resolve_route
+
+
+# Pure ASGI middleware giving every HTTP request a deadline for its database work
+# The budget comes from the matched route template, falling back to REQUEST_BUDGET_MS.
+# It must sit outside the authentication middleware so the user lookup is bounded too
+class DeadlineMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with deadline(route_budget(resolve_route(scope))):
+            await self.app(scope, receive, send)
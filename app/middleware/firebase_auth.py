@@ -1,32 +1,54 @@
 # Import necessary modules
 # FastAPI components for handling requests and exceptions
 # Starlette middleware and responses for HTTP handling
-# Firebase Admin SDK for token verification
+# Firebase Admin SDK for token verification, loaded on first use
 # Custom user model
+# Metrics for timing token verification and user lookup
+# Circuit breaker and deadline errors, answered with 503 or 504 instead of 401
 
+import time
 from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
-from firebase_admin import auth as firebase_auth
-from firebase_admin._auth_utils import InvalidIdTokenError
+from starlette.types import Receive, Scope, Send
+from app.core.firebase_admin import get_auth
 from app.models.user_model import User
 from fastapi import HTTPException
+from app.core.metrics import auth_duration_seconds
+from app.core.tracing import span
+from app.core.circuit_breaker import DatabaseUnavailable, unavailable_response
+from app.core.deadlines import DeadlineExceeded
+
+# Paths that skip authentication
+# Requests whose URL path starts with one of these prefixes bypass the middleware
+PUBLIC_PATH_PREFIXES = (
+    "/org/get-org-by-domain",  # Public org lookup by domain
+    "/user/sync-user-to-db",  # Called right after Firebase sign-up
+    "/status/get-org-status",  # Public status page
+    "/status/stream",  # Public status page events
+    "/metrics",  # Prometheus scrapes, restrict access at the proxy
+)
+
+# Paths authenticated by an organization's API key in the route instead
+API_KEY_PATH_PREFIXES = ("/ingest/",)
 
 
 # Define a middleware class for Firebase authentication
 class FirebaseAuthMiddleware(BaseHTTPMiddleware):
+    # Public and API key requests go straight to the app, so long-lived streams and
+    # high-volume webhooks are not relayed through the middleware's extra task and
+    # memory stream
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and scope["path"].startswith(
+            PUBLIC_PATH_PREFIXES + API_KEY_PATH_PREFIXES
+        ):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
     async def dispatch(self, request: Request, call_next):
-        # Skip authentication for the get-org-by-domain endpoint
-        # If the request URL path starts with '/org/get-org-by-domain', bypass authentication
-        if request.url.path.startswith("/org/get-org-by-domain"):
-            return await call_next(request)
-        # Skip authentication for the sync-user-to-db endpoint
-        # If the request URL path starts with '/user/sync-user-to-db', bypass authentication
-        if request.url.path.startswith("/user/sync-user-to-db"):
-            return await call_next(request)
-        # Skip authentication for the get-org-status endpoint
-        # If the request URL path starts with '/status/get-org-status', bypass authentication
-        if request.url.path.startswith("/status/get-org-status"):
+        # Skip authentication for public endpoints
+        if request.url.path.startswith(PUBLIC_PATH_PREFIXES):
             return await call_next(request)
         # Get the Authorization header from the request
         auth_header = request.headers.get("Authorization")
@@ -38,19 +60,29 @@ class FirebaseAuthMiddleware(BaseHTTPMiddleware):
 
         # Extract the token from the Authorization header
         token = auth_header.split(" ")[1]
+        firebase_auth = get_auth()
         try:
             # Verify the token using Firebase Admin SDK
-            decoded_token = firebase_auth.verify_id_token(token)
+            start = time.perf_counter()
+            with span("auth.verify"):
+                decoded_token = firebase_auth.verify_id_token(token)
+            verified = time.perf_counter()
+            auth_duration_seconds.observe(verified - start, "verify")
             # Retrieve the user's email from the decoded token
             email = decoded_token["email"]
             # Find the user in the database by email
-            user = await User.collection().find_one({"email": email})
+            with span("auth.user_lookup"):
+                user = await User.find_one({"email": email})
+            auth_duration_seconds.observe(time.perf_counter() - verified, "user_lookup")
             # Raise an HTTPException if the user is not found
             if not user:
                 raise HTTPException(status_code=401, detail="User not found")
             # Set the user in the request state for downstream use
-            request.state.user = User(**user)
-        except (InvalidIdTokenError, KeyError):
+            request.state.user = user
+        except (DatabaseUnavailable, DeadlineExceeded) as e:
+            # The user lookup could not reach the database in time
+            return unavailable_response(e)
+        except (firebase_auth.InvalidIdTokenError, KeyError):
             # Handle invalid or expired tokens
             # Return an unauthorized response
             return JSONResponse(
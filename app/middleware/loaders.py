@@ -0,0 +1,21 @@
+# Import necessary modules
+# Loader scope giving every request its own batching loaders
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.models.loader import loader_scope
+
+
+# Pure ASGI middleware giving every HTTP request its own model loaders
+# Documents loaded through Model.loader() are memoized until the response is sent
+class LoaderMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with loader_scope():
+            await self.app(scope, receive, send)
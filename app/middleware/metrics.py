@@ -0,0 +1,66 @@
+# Import necessary modules
+# Starlette routing to resolve the route template of a request
+# Metrics recorded for every HTTP request
+
+import time
+from typing import Any, Dict, Tuple
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import (
+    http_request_duration_seconds,
+    http_requests_in_flight,
+    http_requests_total,
+)
+
+
+# Find the route matching a request and its path parameters
+# Returns the route template, e.g. /incident/{incident_id}, or "unmatched"
+def match_route(scope: Scope) -> Tuple[str, Dict[str, Any]]:
+    app = scope.get("app")
+    router = getattr(app, "router", None)
+    for route in getattr(router, "routes", []):
+        match, child_scope = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched"), child_scope.get("path_params", {})
+    return "unmatched", {}
+
+
+# Find the route template matching a request
+# Using the template instead of the raw path keeps label cardinality bounded
+def resolve_route(scope: Scope) -> str:
+    return match_route(scope)[0]
+
+
+# Pure ASGI middleware recording per-route latency, in-flight requests and status codes
+# It avoids BaseHTTPMiddleware so recording adds no extra task per request
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = resolve_route(scope)
+        status_code = "500"
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = str(message["status"])
+            await send(message)
+
+        http_requests_in_flight.inc(method, route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration_seconds.observe(
+                time.perf_counter() - start, method, route
+            )
+            http_requests_in_flight.dec(method, route)
+            http_requests_total.inc(method, route, status_code)
@@ -0,0 +1,73 @@
+# Import necessary modules
+# hmac for comparing the profiling token in constant time
+# Statistical sampler and profile storage
+
+import asyncio
+import hmac
+import threading
+from urllib.parse import parse_qs
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.logger import logger
+from app.core.profiling import PROFILE_TOKEN, StackSampler, profile_path
+
+# Header or query parameter carrying the profiling token
+PROFILE_HEADER = b"x-profile-token"
+PROFILE_QUERY_PARAM = "__profile"
+# Paths taking the token for access rather than for profiling
+UNPROFILED_PATH_PREFIXES = ("/admin/",)
+
+
+# Pure ASGI middleware profiling single requests on demand
+# A request is profiled when it carries PROFILE_TOKEN in the X-Profile-Token header
+# or the __profile query parameter; without PROFILE_TOKEN the middleware only
+# forwards the request. Admin endpoints are never profiled, they take the token as
+# their credential
+# The sampler records the whole event loop thread, so requests running
+# concurrently with the profiled one show up in its profile as well
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._lock = asyncio.Lock()
+
+    def _requested(self, scope: Scope) -> bool:
+        token = dict(scope["headers"]).get(PROFILE_HEADER, b"")
+        if not token and PROFILE_QUERY_PARAM.encode() in scope.get("query_string", b""):
+            query = parse_qs(scope["query_string"].decode("latin-1"))
+            token = query.get(PROFILE_QUERY_PARAM, [""])[0].encode()
+        # Compare bytes, compare_digest rejects non-ASCII strings with a TypeError
+        return bool(token) and hmac.compare_digest(token, (PROFILE_TOKEN or "").encode())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            not PROFILE_TOKEN
+            or scope["type"] != "http"
+            or scope["path"].startswith(UNPROFILED_PATH_PREFIXES)
+            or not self._requested(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+        # Profile one request at a time, others run normally
+        if self._lock.locked():
+            await self.app(scope, receive, send)
+            return
+
+        async with self._lock:
+            path = profile_path(scope["method"], scope["path"])
+
+            async def send_wrapper(message: Message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-profile-path", path.encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            sampler = StackSampler(threading.get_ident())
+            sampler.start()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                sampler.stop()
+                await asyncio.to_thread(sampler.write, path)
+                logger.info(f"Wrote profile with {sampler.samples} samples to {path}")
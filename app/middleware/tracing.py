@@ -0,0 +1,57 @@
+# Import necessary modules
+# Tracing helpers for starting the root span of a request
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.tracing import (
+    NOOP_SPAN,
+    format_traceparent,
+    start_trace,
+    tracing_enabled,
+    trusted_token,
+)
+
+
+# Pure ASGI middleware starting a trace for sampled requests
+# The trace ID is taken from a W3C traceparent header when present, and returned in
+# the X-Trace-Id and traceparent response headers. Only callers sending TRACE_TOKEN in
+# X-Trace-Token may force tracing with X-Trace-Id or the traceparent sampled flag
+class TracingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not tracing_enabled():
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        root = start_trace(
+            "http.request",
+            traceparent=headers.get(b"traceparent", b"").decode("latin-1") or None,
+            trace_id=headers.get(b"x-trace-id", b"").decode("latin-1").lower() or None,
+            trusted=trusted_token(headers.get(b"x-trace-token", b"")),
+            method=scope["method"],
+            path=scope["path"],
+        )
+        if root is NOOP_SPAN:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("status_code", message["status"])
+                response_headers = list(message.get("headers", []))
+                response_headers.append((b"x-trace-id", root.trace_id.encode()))
+                response_headers.append(
+                    (b"traceparent", format_traceparent(root).encode())
+                )
+                message = {**message, "headers": response_headers}
+            await send(message)
+
+        with root:
+            await self.app(scope, receive, send_wrapper)
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            if route is not None:
+                root.set_attribute("route", getattr(route, "path", None))
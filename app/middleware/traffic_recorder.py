@@ -0,0 +1,99 @@
+# Import necessary modules
+# Route matching shared with the metrics middleware
+# Traffic recorder writing sanitized request shapes
+
+import time
+from typing import Optional
+from urllib.parse import parse_qsl
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import traffic
+from app.core.logger import logger
+from app.core.org_directory import org_directory
+from app.core.traffic import TrafficRecorder, pseudonymize, sanitize
+from app.middleware.metrics import match_route
+
+
+# Find the organization a request is made for
+# Authenticated requests use the user's current organization, public requests the
+# organization named in the query string; the ID is pseudonymized by the caller
+def resolve_tenant(scope: Scope, query: dict) -> Optional[str]:
+    user = scope.get("state", {}).get("user")
+    current_org = getattr(user, "current_org", None)
+    if getattr(current_org, "org_id", None) is not None:
+        return str(current_org.org_id)
+    if "org_id" in query:
+        return query["org_id"]
+    return org_directory.cached_id(domain=query.get("domain"), org_slug=query.get("org_slug"))
+
+
+# Pure ASGI middleware recording the shape of every sampled request
+# Records hold the route template, parameter names with pseudonymized identifiers,
+# body size, pseudonymized tenant, status and timing, never bodies or headers
+# Without TRAFFIC_RECORD_PATH the middleware only forwards the request
+class TrafficRecorderMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        recorder = traffic.traffic_recorder
+        if recorder is None or scope["type"] != "http" or not recorder.sampled():
+            await self.app(scope, receive, send)
+            return
+
+        body_bytes = 0
+        status_code = 500
+
+        async def receive_wrapper() -> Message:
+            nonlocal body_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                body_bytes += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            try:
+                self._record(recorder, scope, started_at, duration, body_bytes, status_code)
+            except Exception as e:
+                # Recording must never fail the request
+                logger.warning(f"Failed to record request: {e}")
+
+    def _record(
+        self,
+        recorder: TrafficRecorder,
+        scope: Scope,
+        started_at: float,
+        duration: float,
+        body_bytes: int,
+        status_code: int,
+    ) -> None:
+        route, path_params = match_route(scope)
+        query = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+        tenant = resolve_tenant(scope, query)
+        recorder.record(
+            {
+                "t": round(started_at, 6),
+                "method": scope["method"],
+                "route": route,
+                "path_params": {
+                    name: pseudonymize(value) for name, value in path_params.items()
+                },
+                "query": {name: sanitize(name, value) for name, value in query.items()},
+                "body_bytes": body_bytes,
+                "tenant": pseudonymize(tenant) if tenant else None,
+                "status": status_code,
+                "duration_ms": round(duration * 1000, 3),
+            }
+        )
@@ -0,0 +1,30 @@
+from typing import List
+from pymongo import ASCENDING, IndexModel
+from app.models.base import DocumentModel, PyObjectId
+from app.db.collections import db
+
+
+# ========== ApiKey ==========
+# Model for a key machines authenticate with instead of a Firebase ID token
+# Only a hash of the key is stored; the key itself is shown once, on creation
+# Keys are not cached, so a revoked key is refused by every worker right away
+class ApiKey(DocumentModel):
+    org_id: PyObjectId  # ID of the organization the key acts for
+    name: str  # Name given by the creator, e.g. the sending system
+    prefix: str  # First characters of the key, to tell keys apart
+    key_hash: str  # SHA-256 of the key, hex encoded
+    created_by_username: str  # Username of the creator
+
+    # Define the MongoDB collection for API keys
+    @classmethod
+    def collection(cls):
+        return db["api_keys"]
+
+    # Define the indexes for looking keys up by hash on every request and listing the
+    # keys of an organization
+    @classmethod
+    def indexes(cls) -> List[IndexModel]:
+        return [
+            IndexModel([("key_hash", ASCENDING)], name="key_hash", unique=True),
+            IndexModel([("org_id", ASCENDING)], name="org"),
+        ]
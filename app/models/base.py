@@ -1,10 +1,18 @@
 # Import necessary modules for type hints, data validation, MongoDB operations and datetime handling
-from typing import Optional, List, TypeVar, Type, Union, Dict, Any
+from typing import Optional, List, Tuple, TypeVar, Type, Union, Dict, Any, FrozenSet
+from typing import get_args
 from pydantic import BaseModel, Field
 from bson import ObjectId
-from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import IndexModel, UpdateOne
+from pymongo.errors import BulkWriteError
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorCursor
 from datetime import datetime
-from app.db.collections import db
+from app.db.collections import db, secondary_read_preference
+from app.core.tracing import span
+from app.core.circuit_breaker import guarded, mongo_breaker
+from app.core.deadlines import max_time_ms
+from app.core.entity_cache import CachePolicy, EntityCache, entity_cache_for
+from app.models.loader import BatchLoader, existing_loader, loader_for
 
 # Define a type variable for the document model to support type hints in class methods
 ModelType = TypeVar("ModelType", bound="DocumentModel")
@@ -30,6 +38,78 @@ class PyObjectId(ObjectId):
         schema.update(type="string")
 
 
+# Convert an ID given as a string to an ObjectId
+# ObjectIds and values that are not valid IDs are returned unchanged
+def to_object_id(value: Any) -> Any:
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return value
+
+
+# Check whether two IDs are equal, whether given as ObjectIds or strings
+def same_id(a: Any, b: Any) -> bool:
+    return a is not None and to_object_id(a) == to_object_id(b)
+
+
+# Dotted paths of the ObjectId fields of each model, filled on first use
+_id_paths: Dict[type, FrozenSet[str]] = {}
+
+
+# Find the dotted paths of the ObjectId fields of a model, including the fields of
+# embedded models and lists of them, e.g. org_memberships.org_id
+def _collect_id_paths(model: Type[BaseModel], prefix: str = "") -> FrozenSet[str]:
+    paths = set()
+    for name, field in model.model_fields.items():
+        path = prefix + (field.alias or name)
+        pending = [field.annotation]
+        while pending:
+            annotation = pending.pop()
+            if isinstance(annotation, type) and issubclass(annotation, ObjectId):
+                paths.add(path)
+            elif isinstance(annotation, type) and issubclass(annotation, BaseModel):
+                paths |= _collect_id_paths(annotation, path + ".")
+            else:
+                # Optional, Union and List wrap the types to look at
+                pending.extend(get_args(annotation))
+    return frozenset(paths)
+
+
+# Strip positional operators and array indexes from an update or query path
+def _field_path(path: str) -> str:
+    return ".".join(
+        part for part in path.split(".") if not part.startswith("$") and not part.isdigit()
+    )
+
+
+# Convert the string IDs of a filter, update or document to ObjectIds
+# Only values at ID paths are converted, so string fields that happen to look like an
+# ID stay strings; operators ($in, $ne, $set, $and, ...) keep the path they apply to
+def normalize_ids(value: Any, paths: FrozenSet[str], path: str = "") -> Any:
+    if isinstance(value, dict):
+        return {
+            key: normalize_ids(
+                item,
+                paths,
+                path if key.startswith("$") else _field_path(f"{path}.{key}" if path else key),
+            )
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [normalize_ids(item, paths, path) for item in value]
+    if path in paths:
+        return to_object_id(value)
+    return value
+
+
+# Convert embedded models, also in lists, to documents the way save() does
+def _to_document(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(by_alias=True, exclude_none=True)
+    if isinstance(value, list):
+        return [_to_document(item) for item in value]
+    return value
+
+
 # Base model for all database documents with common fields and functionality
 class DocumentModel(BaseModel):
     # Common fields for all documents
@@ -56,17 +136,114 @@ class DocumentModel(BaseModel):
         """Override this in child classes to return the MongoDB collection"""
         raise NotImplementedError("Subclasses must define their MongoDB collection.")
 
+    @classmethod
+    # Get the collection for reads
+    # Reads that tolerate bounded staleness (secondary_ok) go to a secondary when
+    # secondary reads are enabled; writes and read-after-write paths use collection()
+    def read_collection(cls, secondary_ok: bool = False) -> AsyncIOMotorCollection:
+        collection = cls.collection()
+        read_preference = secondary_read_preference() if secondary_ok else None
+        if read_preference is None:
+            return collection
+        return collection.with_options(read_preference=read_preference)
+
+    @classmethod
+    def indexes(cls) -> List[IndexModel]:
+        """Override this in child classes to declare the indexes of the collection"""
+        return []
+
+    @classmethod
+    def cache_policy(cls) -> Optional[CachePolicy]:
+        """Override this in child classes to cache documents read by ID or unique key"""
+        return None
+
+    @classmethod
+    # Get the model's entity cache, None when the model is not cached
+    def entity_cache(cls) -> Optional[EntityCache]:
+        return entity_cache_for(cls.__name__, cls.cache_policy())
+
+    @classmethod
+    # Get the model's batching loader for the current request
+    # Loads of IDs requested together are fetched with one $in query
+    def loader(cls: Type[ModelType]) -> BatchLoader[ModelType]:
+        return loader_for(cls)
+
+    @classmethod
+    # Drop documents from the entity cache of every worker of the host and from the
+    # current request's loader
+    # Model writes call this themselves; inserts need not, as misses are not cached
+    def invalidate_cache(cls, ids: List[Any]) -> None:
+        cache = cls.entity_cache()
+        if cache is not None:
+            cache.invalidate(ids)
+        loader = existing_loader(cls)
+        if loader is not None:
+            loader.forget(ids)
+
+    @classmethod
+    # Get the dotted paths of the model's ObjectId fields
+    def id_paths(cls) -> FrozenSet[str]:
+        paths = _id_paths.get(cls)
+        if paths is None:
+            paths = _id_paths[cls] = _collect_id_paths(cls)
+        return paths
+
+    @classmethod
+    # Convert the string IDs of a filter to ObjectIds
+    # Mixed types in one field would make equality matches and indexes miss documents
+    def typed_filter(cls, filter: Dict[str, Any]) -> Dict[str, Any]:
+        return normalize_ids(filter, cls.id_paths())
+
+    @classmethod
+    # Prepare field values for writing: embedded models become documents and
+    # string IDs become ObjectIds, so IDs are always stored as ObjectIds
+    def typed_values(cls, values: Dict[str, Any]) -> Dict[str, Any]:
+        documents = {key: _to_document(value) for key, value in values.items()}
+        return normalize_ids(documents, cls.id_paths())
+
+    # Every operation below runs through the MongoDB circuit breaker and is bounded by
+    # the request deadline; reads also pass the time left as maxTimeMS so the server
+    # abandons them too. Writes have no maxTimeMS and are bounded on the client only.
+    # Filters and written values go through typed_filter() and typed_values(), so IDs
+    # given as strings are queried and stored as ObjectIds
+
     # CREATE / INSERT
     # Save a new document to the database
     async def save(self: ModelType) -> ModelType:
         # Convert model to dictionary using MongoDB field names
         data = self.dict(by_alias=True, exclude_none=True)
         # Insert document into the database
-        result = await self.collection().insert_one(data)
+        with span("db.save", collection=self.collection().name):
+            result = await guarded(self.collection().insert_one, data)
         # Update model with the generated MongoDB ID
         self.id = result.inserted_id
         return self
 
+    # CREATE / INSERT MANY
+    @classmethod
+    # Insert many new documents in one round trip
+    # Unordered, so one failing document does not stop the others; successfully
+    # inserted models get their ID. Returns the errors of the failed ones by index
+    async def insert_many(cls, models: List[ModelType]) -> Dict[int, str]:
+        if not models:
+            return {}
+        documents = [model.dict(by_alias=True, exclude_none=True) for model in models]
+        errors: Dict[int, str] = {}
+        with span("db.insert_many", collection=cls.collection().name) as current:
+            try:
+                await guarded(cls.collection().insert_many, documents, ordered=False)
+            except BulkWriteError as e:
+                errors = {
+                    error["index"]: error.get("errmsg", "Write error")
+                    for error in e.details.get("writeErrors", [])
+                }
+            current.set_attribute("count", len(documents))
+        # The driver assigns the _id of every document before sending it
+        for index, (model, document) in enumerate(zip(models, documents)):
+            if index not in errors:
+                model.id = document["_id"]
+        return errors
+
     # READ / GET BY ID
     @classmethod
     # Find a document by its MongoDB ID
@@ -76,39 +253,192 @@ class DocumentModel(BaseModel):
         # Convert string ID to ObjectId if necessary
         if isinstance(_id, str):
             _id = ObjectId(_id)
-        # Find document in the database
-        doc = await cls.collection().find_one({"_id": _id})
+        # Find document in the cache or the database
+        doc = await cls._find_one_document({"_id": _id}, "db.find_by_id")
         # Return model instance if found, None otherwise
         return cls(**doc) if doc else None
 
+    # READ / GET MANY BY ID
+    @classmethod
+    # Find the documents with the given IDs in one query
+    # Missing IDs are skipped; the results follow the order of the IDs
+    async def find_by_ids(
+        cls: Type[ModelType],
+        ids: List[Union[str, ObjectId]],
+        filter: Dict[str, Any] = {},
+    ) -> List[ModelType]:
+        object_ids = [ObjectId(_id) if isinstance(_id, str) else _id for _id in ids]
+        by_id = await cls.find_documents_by_ids(object_ids, filter)
+        return [cls(**by_id[_id]) for _id in dict.fromkeys(object_ids) if _id in by_id]
+
+    @classmethod
+    # Find the raw documents with the given ObjectIds in one query, by ID
+    # Without a filter, documents in the entity cache are not queried again
+    async def find_documents_by_ids(
+        cls, ids: List[ObjectId], filter: Dict[str, Any] = {}
+    ) -> Dict[ObjectId, Dict[str, Any]]:
+        by_id: Dict[ObjectId, Dict[str, Any]] = {}
+        cache = None if filter else cls.entity_cache()
+        if cache is not None:
+            for _id in ids:
+                doc = cache.get(("_id", _id))
+                if doc is not None:
+                    by_id[_id] = doc
+            version = cache.version
+        missing = [_id for _id in dict.fromkeys(ids) if _id not in by_id]
+        if not missing:
+            return by_id
+        with span("db.find_by_ids", collection=cls.collection().name) as current:
+            cursor = cls.collection().find(
+                {**cls.typed_filter(filter), "_id": {"$in": missing}},
+                max_time_ms=max_time_ms(),
+            )
+            documents = await guarded(cursor.to_list, length=None)
+            current.set_attribute("count", len(documents))
+        for doc in documents:
+            by_id[doc["_id"]] = doc
+            if cache is not None:
+                cache.fill(doc, version)
+        return by_id
+
+    # READ / FIELD VALUES
+    @classmethod
+    # Get the values of one field of the documents matching the filter
+    # Only that field is fetched, so an index on it can cover the query
+    async def find_values(cls, field: str, filter: Dict[str, Any] = {}) -> List[Any]:
+        with span("db.find_values", collection=cls.collection().name):
+            projection = {field: 1} if field == "_id" else {field: 1, "_id": 0}
+            cursor = cls.collection().find(
+                cls.typed_filter(filter), projection, max_time_ms=max_time_ms()
+            )
+            documents = await guarded(cursor.to_list, length=None)
+        return [document[field] for document in documents if field in document]
+
     # READ / GET ALL (optional filters)
     @classmethod
     # Find all documents matching the filter criteria
     async def find_all(
-        cls: Type[ModelType], filter: Dict[str, Any] = {}, limit: int = 100
+        cls: Type[ModelType],
+        filter: Dict[str, Any] = {},
+        limit: int = 100,
+        secondary_ok: bool = False,
     ) -> List[ModelType]:
-        # Get cursor for filtered documents, sorted by creation date
-        cursor = cls.collection().find(filter).sort("created_at", -1).limit(limit)
-        # Convert documents to model instances
-        return [cls(**doc) async for doc in cursor]
+        collection = cls.read_collection(secondary_ok)
+        with span("db.find_all", collection=collection.name) as current:
+            # Get cursor for filtered documents, sorted by creation date
+            cursor = (
+                collection.find(cls.typed_filter(filter), max_time_ms=max_time_ms())
+                .sort("created_at", -1)
+                .limit(limit)
+            )
+            # Convert documents to model instances
+            results = await guarded(cursor.to_list, length=None)
+            results = [cls(**doc) for doc in results]
+            current.set_attribute("count", len(results))
+        return results
+
+    # READ / STREAM (optional filters)
+    @classmethod
+    # Get a cursor over the raw documents matching the filter criteria
+    # Used to stream large result sets without building a list in memory
+    def find_cursor(
+        cls,
+        filter: Dict[str, Any] = {},
+        sort: Optional[List[Tuple[str, int]]] = None,
+        batch_size: int = 1000,
+        hint: Optional[str] = None,
+        secondary_ok: bool = False,
+    ) -> AsyncIOMotorCursor:
+        # Streaming reads are not guarded per batch, fail before starting one instead
+        mongo_breaker.check()
+        cursor = cls.read_collection(secondary_ok).find(
+            cls.typed_filter(filter), batch_size=batch_size, max_time_ms=max_time_ms()
+        )
+        # Force a specific index when the caller knows which one serves the query
+        if hint:
+            cursor = cursor.hint(hint)
+        # Sort by creation date unless another order is requested
+        return cursor.sort(sort or [("created_at", -1)])
 
     # UPDATE (partial)
     # Update document fields in the database
+    # Embedded models can be passed as they are; they stay models on the instance
     async def update(self: ModelType, updates: Dict[str, Any]) -> ModelType:
         # Add last update timestamp
         updates["updated_at"] = datetime.utcnow()
         # Update document in database
-        await self.collection().update_one({"_id": self.id}, {"$set": updates})
+        with span("db.update", collection=self.collection().name):
+            try:
+                await guarded(
+                    self.collection().update_one,
+                    {"_id": self.id},
+                    {"$set": self.typed_values(updates)},
+                )
+            finally:
+                # Also when the write failed, it may still have been applied
+                self.invalidate_cache([self.id])
         # Update model instance with new values
         for key, value in updates.items():
             setattr(self, key, value)
         return self
 
+    # UPDATE BY ID (partial)
+    @classmethod
+    # Set fields of a document without loading it first
+    # Unlike update(), this does not touch updated_at
+    async def update_by_id(
+        cls, _id: Union[str, ObjectId], updates: Dict[str, Any]
+    ) -> bool:
+        # Convert string ID to ObjectId if necessary
+        if isinstance(_id, str):
+            _id = ObjectId(_id)
+        # Update document in database
+        with span("db.update_by_id", collection=cls.collection().name):
+            try:
+                result = await guarded(
+                    cls.collection().update_one, {"_id": _id}, {"$set": cls.typed_values(updates)}
+                )
+            finally:
+                cls.invalidate_cache([_id])
+        # Return True if a document matched
+        return result.matched_count == 1
+
+    # UPDATE MANY BY ID (partial)
+    @classmethod
+    # Set fields of many documents in one bulk write, each with its own changes
+    # Like update(), this also sets updated_at unless the changes include it
+    # Returns the number of matched documents
+    async def bulk_update(
+        cls, updates: List[Tuple[Union[str, ObjectId], Dict[str, Any]]]
+    ) -> int:
+        if not updates:
+            return 0
+        now = datetime.utcnow()
+        ids = [ObjectId(_id) if isinstance(_id, str) else _id for _id, _ in updates]
+        operations = [
+            UpdateOne(
+                {"_id": _id},
+                {"$set": {"updated_at": now, **cls.typed_values(changes)}},
+            )
+            for _id, (_, changes) in zip(ids, updates)
+        ]
+        with span("db.bulk_update", collection=cls.collection().name) as current:
+            try:
+                result = await guarded(cls.collection().bulk_write, operations, ordered=False)
+            finally:
+                cls.invalidate_cache(ids)
+            current.set_attribute("count", len(operations))
+        return result.matched_count
+
     # DELETE
     # Delete document from the database
     async def delete(self: ModelType) -> bool:  # type: ignore
         # Delete document by ID
-        result = await self.collection().delete_one({"_id": self.id})
+        with span("db.delete", collection=self.collection().name):
+            try:
+                result = await guarded(self.collection().delete_one, {"_id": self.id})
+            finally:
+                self.invalidate_cache([self.id])
         # Return True if document was deleted
         return result.deleted_count == 1
 
@@ -118,7 +448,28 @@ class DocumentModel(BaseModel):
     async def find_one(
         cls: Type[ModelType], filter: Dict[str, Any]
     ) -> Optional[ModelType]:
-        # Find document in database
-        doc = await cls.collection().find_one(filter)
+        # Find document in the cache or the database
+        doc = await cls._find_one_document(cls.typed_filter(filter), "db.find_one")
         # Return model instance if found, None otherwise
         return cls(**doc) if doc else None
+
+    @classmethod
+    # Find a raw document, through the entity cache when the model has one and the
+    # filter is a single ID or unique key equality
+    async def _find_one_document(
+        cls, filter: Dict[str, Any], operation: str
+    ) -> Optional[Dict[str, Any]]:
+        cache = cls.entity_cache()
+        key = cache.key_of(filter) if cache is not None else None
+        if key is not None:
+            doc = cache.get(key)
+            if doc is not None:
+                return doc
+            version = cache.version
+        with span(operation, collection=cls.collection().name):
+            doc = await guarded(
+                cls.collection().find_one, filter, max_time_ms=max_time_ms()
+            )
+        if key is not None and doc:
+            cache.fill(doc, version)
+        return doc
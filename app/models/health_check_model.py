@@ -0,0 +1,49 @@
+from typing import List, Optional
+from datetime import datetime
+from pymongo import ASCENDING, IndexModel
+from app.models.base import DocumentModel, PyObjectId
+from app.db.collections import db
+from enum import Enum
+from app.models.service_model import ServiceStatus
+
+
+# Define the kinds of synthetic checks
+class CheckKind(str, Enum):
+    HTTP = "http"  # GET a URL, healthy below status 400 or on expected_status
+    TCP = "tcp"  # Open a connection to host:port
+    DNS = "dns"  # Resolve a hostname's A or AAAA records
+
+
+# ========== HealthCheck ==========
+# Model for a synthetic check probing one endpoint of a service
+# The scheduler sets the service to failure_status after failure_threshold failed
+# probes in a row, and back to operational after success_threshold passing ones
+class HealthCheck(DocumentModel):
+    service_id: PyObjectId  # ID of the service the check drives
+    org_id: PyObjectId  # ID of the organization
+    kind: CheckKind  # Kind of probe
+    target: str  # URL for http, host:port for tcp, hostname for dns
+    interval: float = 60.0  # Seconds between probes
+    timeout: float = 10.0  # Seconds a probe may take
+    expected_status: Optional[int] = None  # HTTP status required instead of < 400
+    failure_threshold: int = 3  # Failed probes in a row before the service goes down
+    success_threshold: int = 2  # Passing probes in a row before it recovers
+    failure_status: ServiceStatus = ServiceStatus.OUTAGE  # Status set on failure
+    enabled: bool = True  # Whether the check is scheduled
+    # Written by the scheduler when the check turns healthy or failing
+    healthy: Optional[bool] = None  # None until the threshold is first reached
+    last_error: Optional[str] = None  # Error of the last failing probe
+    state_changed_at: Optional[datetime] = None
+
+    # Define the MongoDB collection for health checks
+    @classmethod
+    def collection(cls):
+        return db["health_checks"]
+
+    # Define the indexes for listing the checks of a service or organization
+    @classmethod
+    def indexes(cls) -> List[IndexModel]:
+        return [
+            IndexModel([("org_id", ASCENDING), ("service_id", ASCENDING)], name="org_service"),
+            IndexModel([("service_id", ASCENDING)], name="service"),
+        ]
@@ -1,7 +1,9 @@
 from typing import Optional, List
 from datetime import datetime
 from pydantic import Field
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from app.models.base import DocumentModel, PyObjectId
+from app.core.entity_cache import CachePolicy
 from app.db.collections import db
 from enum import Enum
 from app.models.service_model import ServiceStatus
@@ -37,6 +39,11 @@ class AffectedService(DocumentModel):
     created_by: Optional[PyObjectId] = None  # ID of the creator
 
 
+# Fields of alert ingestion, left out of the public status page, its static export
+# and its stream
+ALERT_FIELDS = {"alert_key", "alert_fingerprints"}
+
+
 # Model for an incident
 class Incident(DocumentModel):
     title: str  # Title of the incident
@@ -49,8 +56,34 @@ class Incident(DocumentModel):
     resolved_at: Optional[datetime] = None  # Resolution time
     updates: Optional[List[IncidentUpdate]] = []  # List of updates
     created_by_username: str  # Username of the creator
+    # Incidents opened by alert ingestion, see app.core.alert_ingest
+    alert_key: Optional[str] = None  # ID of the alerting service, cleared on resolution
+    alert_fingerprints: List[str] = []  # Fingerprints of the alerts still firing
 
     # Define the MongoDB collection for incidents
     @classmethod
     def collection(cls):
         return db["incidents"]
+
+    # Cache incidents by ID; they carry their update timeline, so fewer fit in memory
+    @classmethod
+    def cache_policy(cls) -> CachePolicy:
+        return CachePolicy(ttl=30.0, max_bytes=32 * 1024 * 1024)
+
+    # Define the indexes for listing and analysing incidents of an organization, and
+    # for finding the open alert incident of a service; unique so concurrent alerts
+    # cannot open two
+    @classmethod
+    def indexes(cls) -> List[IndexModel]:
+        return [
+            IndexModel(
+                [("org_id", ASCENDING), ("started_at", DESCENDING)],
+                name="org_started_at",
+            ),
+            IndexModel(
+                [("alert_key", ASCENDING)],
+                name="open_alert",
+                unique=True,
+                partialFilterExpression={"alert_key": {"$type": "string"}},
+            ),
+        ]
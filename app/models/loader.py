@@ -0,0 +1,122 @@
+# Import necessary modules
+# asyncio for the futures of pending loads and the dispatch callback
+# contextvars for the loaders of the current request
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Dict, Generic, Iterable, Iterator, List, Optional, Set, TypeVar
+
+from bson import ObjectId
+
+if TYPE_CHECKING:
+    from app.models.base import DocumentModel
+
+ModelType = TypeVar("ModelType", bound="DocumentModel")
+
+# Largest $in list sent in one query
+MAX_LOAD_BATCH = 1000
+
+# Loaders of the current request by model, None outside a loader scope
+_loaders: ContextVar[Optional[Dict[type, "BatchLoader"]]] = ContextVar("loaders", default=None)
+
+
+# Loader batching the find_by_id calls of one model
+# IDs requested in the same event loop iteration, e.g. by tasks started with
+# asyncio.gather or by a list comprehension of load() calls gathered together, are
+# fetched with one $in query at the end of the iteration. Results are memoized for the
+# loader's lifetime, the current request, and every load builds a new model, so
+# callers never share instances. Writes through the model drop memoized documents.
+class BatchLoader(Generic[ModelType]):
+    def __init__(self, model: type):
+        self.model = model
+        # Memoized documents (None when missing) and loads in flight, by ID
+        self._documents: Dict[ObjectId, asyncio.Future] = {}
+        self._pending: List[ObjectId] = []
+        # Queries in flight, referenced until they finish
+        self._tasks: Set[asyncio.Task] = set()
+
+    # Load a document by ID, None if it does not exist
+    async def load(self, _id: Any) -> Optional[ModelType]:
+        if isinstance(_id, str):
+            _id = ObjectId(_id)
+        future = self._documents.get(_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._documents[_id] = loop.create_future()
+            if not self._pending:
+                loop.call_soon(self._dispatch)
+            self._pending.append(_id)
+        # Shielded, so a cancelled caller does not cancel the load of the others
+        document = await asyncio.shield(future)
+        return self.model(**document) if document else None
+
+    # Load many documents by ID with one query, skipping missing ones
+    # The results follow the order of the IDs
+    async def load_many(self, ids: Iterable[Any]) -> List[ModelType]:
+        models = await asyncio.gather(*(self.load(_id) for _id in dict.fromkeys(ids)))
+        return [model for model in models if model is not None]
+
+    # Forget memoized documents, e.g. after they were written
+    def forget(self, ids: Iterable[Any]) -> None:
+        # Loads in flight still complete for their callers, later loads query again
+        for _id in ids:
+            self._documents.pop(_id, None)
+
+    def _dispatch(self) -> None:
+        ids, self._pending = self._pending, []
+        for start in range(0, len(ids), MAX_LOAD_BATCH):
+            task = asyncio.ensure_future(self._fetch(ids[start : start + MAX_LOAD_BATCH]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, ids: List[ObjectId]) -> None:
+        futures = [self._documents[_id] for _id in ids]
+        try:
+            documents = await self.model.find_documents_by_ids(ids)
+        except BaseException as e:
+            # Failed loads are not memoized, a later load tries again
+            for _id, future in zip(ids, futures):
+                if self._documents.get(_id) is future:
+                    del self._documents[_id]
+                if future.done():
+                    continue
+                if isinstance(e, Exception):
+                    future.set_exception(e)
+                else:
+                    future.cancel()
+            if not isinstance(e, Exception):
+                raise
+            return
+        for _id, future in zip(ids, futures):
+            if not future.done():
+                future.set_result(documents.get(_id))
+
+
+# Get the loader of a model for the current request
+# Outside a loader scope every call returns a new loader, which still batches the
+# loads made through it but memoizes nothing beyond it
+def loader_for(model: type) -> BatchLoader:
+    loaders = _loaders.get()
+    if loaders is None:
+        return BatchLoader(model)
+    loader = loaders.get(model)
+    if loader is None:
+        loader = loaders[model] = BatchLoader(model)
+    return loader
+
+
+# Get the loader of a model only if the current request already has one
+def existing_loader(model: type) -> Optional[BatchLoader]:
+    loaders = _loaders.get()
+    return loaders.get(model) if loaders is not None else None
+
+
+# Run a block with its own loaders, e.g. one request
+@contextmanager
+def loader_scope() -> Iterator[None]:
+    token = _loaders.set({})
+    try:
+        yield
+    finally:
+        _loaders.reset(token)
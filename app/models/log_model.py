@@ -1,4 +1,5 @@
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from app.models.base import PyObjectId, DocumentModel
 from app.db.collections import db
 from datetime import datetime
@@ -21,6 +22,18 @@ class ChangeType(str, Enum):
     # Add other change types as needed
 
 
+# Names of the log entry indexes, one per supported audit query shape
+# Every index starts with org_id and ends with created_at so time ranges and
+# newest-first sorting are served from the index
+class LogIndex(str, Enum):
+    ORG = "org_created_at"
+    ENTITY_TYPE = "org_entity_type_created_at"
+    ENTITY_TYPE_CHANGE = "org_entity_type_change_type_created_at"
+    CHANGE_TYPE = "org_change_type_created_at"
+    ENTITY = "org_entity_id_created_at"
+    CREATED_BY = "org_created_by_created_at"
+
+
 # Model for a log entry
 class LogEntry(DocumentModel):
     entity_id: PyObjectId  # ID of the entity being logged
@@ -33,3 +46,21 @@ class LogEntry(DocumentModel):
     @classmethod
     def collection(cls):
         return db["log_entries"]
+
+    # Define the indexes backing the audit log queries
+    @classmethod
+    def indexes(cls) -> List[IndexModel]:
+        def index(name: LogIndex, *fields: str) -> IndexModel:
+            keys = [("org_id", ASCENDING)]
+            keys += [(field, ASCENDING) for field in fields]
+            keys.append(("created_at", DESCENDING))
+            return IndexModel(keys, name=name.value)
+
+        return [
+            index(LogIndex.ORG),
+            index(LogIndex.ENTITY_TYPE, "entity_type"),
+            index(LogIndex.ENTITY_TYPE_CHANGE, "entity_type", "change_type"),
+            index(LogIndex.CHANGE_TYPE, "change_type"),
+            index(LogIndex.ENTITY, "entity_id"),
+            index(LogIndex.CREATED_BY, "created_by"),
+        ]
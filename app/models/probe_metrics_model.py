@@ -0,0 +1,109 @@
+from typing import List, Optional
+from datetime import datetime
+from pydantic import BaseModel
+from pymongo import ASCENDING, IndexModel
+from app.models.base import DocumentModel, PyObjectId
+from app.db.collections import db
+from enum import Enum
+
+
+# Define the resolutions probe measurements are aggregated at
+class Resolution(str, Enum):
+    MINUTE = "1m"
+    HOUR = "1h"
+    DAY = "1d"
+
+
+# One probe result of a service, embedded in a sample bucket
+class ProbeSample(BaseModel):
+    at: datetime  # Time the probe finished
+    latency_ms: float  # Duration of the probe
+    ok: bool  # Whether the probe passed
+
+
+# ========== ProbeSampleBucket ==========
+# Model for the probe results of one service within one hour
+# A bucket holds up to SAMPLES_PER_BUCKET samples, more samples in the same hour open
+# another bucket. The totals let a bucket be summarized without reading its samples;
+# latency totals only count passing probes, failed ones mostly measure the timeout
+class ProbeSampleBucket(DocumentModel):
+    service_id: PyObjectId  # ID of the service
+    hour: datetime  # Start of the hour the samples fall in
+    count: int = 0  # Samples in the bucket
+    ok_count: int = 0  # Passing samples
+    latency_sum: float = 0.0  # Latency of the passing samples, summed
+    latency_min: Optional[float] = None
+    latency_max: Optional[float] = None
+    last_at: Optional[datetime] = None  # Time of the newest sample
+    samples: List[ProbeSample] = []
+    expires_at: Optional[datetime] = None  # Removed by the TTL index after this time
+    created_by: Optional[PyObjectId] = None  # Written by the scheduler, not a user
+
+    # Define the MongoDB collection for sample buckets
+    @classmethod
+    def collection(cls):
+        return db["probe_samples"]
+
+    # Define the indexes for appending to and reading the buckets of a service,
+    # finding recently written buckets to downsample, and expiring old ones
+    @classmethod
+    def indexes(cls) -> List[IndexModel]:
+        return [
+            IndexModel([("service_id", ASCENDING), ("hour", ASCENDING)], name="service_hour"),
+            IndexModel([("last_at", ASCENDING)], name="last_at"),
+            IndexModel([("expires_at", ASCENDING)], name="expires_at", expireAfterSeconds=0),
+        ]
+
+
+# ========== ProbeRollup ==========
+# Model for the probe results of one service aggregated over one minute, hour or day
+class ProbeRollup(DocumentModel):
+    service_id: PyObjectId  # ID of the service
+    resolution: Resolution  # Length of the period
+    at: datetime  # Start of the period
+    count: int  # Samples in the period
+    ok_count: int  # Passing samples
+    latency_sum: float  # Latency of the passing samples, summed
+    latency_min: Optional[float] = None
+    latency_max: Optional[float] = None
+    expires_at: Optional[datetime] = None  # Removed by the TTL index after this time
+    created_by: Optional[PyObjectId] = None  # Written by the downsampler, not a user
+
+    # Define the MongoDB collection for rollups
+    @classmethod
+    def collection(cls):
+        return db["probe_rollups"]
+
+    # Define the indexes for reading a service's periods, merging downsampled periods
+    # (unique, $merge needs it), rolling up recent periods and expiring old ones
+    @classmethod
+    def indexes(cls) -> List[IndexModel]:
+        return [
+            IndexModel(
+                [("service_id", ASCENDING), ("resolution", ASCENDING), ("at", ASCENDING)],
+                name="service_resolution_at",
+                unique=True,
+            ),
+            IndexModel([("resolution", ASCENDING), ("at", ASCENDING)], name="resolution_at"),
+            IndexModel([("expires_at", ASCENDING)], name="expires_at", expireAfterSeconds=0),
+        ]
+
+
+# ========== ProbeDownsampleRun ==========
+# Model for the last completed downsampling run of one resolution
+# The next run recomputes the periods from this one on, so missed or late runs leave
+# no gaps in the rollups
+class ProbeDownsampleRun(DocumentModel):
+    resolution: Resolution  # Resolution the run computed
+    completed_at: datetime  # Time the run computed the rollups up to
+    created_by: Optional[PyObjectId] = None  # Written by the downsampler, not a user
+
+    # Define the MongoDB collection for downsampling runs
+    @classmethod
+    def collection(cls):
+        return db["probe_downsample_runs"]
+
+    # Define the index keeping one run per resolution
+    @classmethod
+    def indexes(cls) -> List[IndexModel]:
+        return [IndexModel([("resolution", ASCENDING)], name="resolution", unique=True)]
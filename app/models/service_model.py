@@ -6,6 +6,7 @@
 
 from typing import Optional
 from app.models.base import PyObjectId, DocumentModel
+from app.core.entity_cache import CachePolicy
 from app.db.collections import db
 from enum import Enum
 
@@ -31,3 +32,8 @@ class Service(DocumentModel):
     @classmethod
     def collection(cls):
         return db["services"]
+
+    # Cache services by ID for the routes fetching and authorizing one service
+    @classmethod
+    def cache_policy(cls) -> CachePolicy:
+        return CachePolicy(ttl=30.0)
@@ -1,5 +1,6 @@
 from typing import List, Optional
 from app.models.base import PyObjectId, DocumentModel
+from app.core.entity_cache import CachePolicy
 from app.db.collections import db
 from app.models.user_model import UserRole
 
@@ -23,3 +24,8 @@ class Team(DocumentModel):
     @classmethod
     def collection(cls):
         return db["teams"]
+
+    # Cache teams by ID for the routes fetching one team
+    @classmethod
+    def cache_policy(cls) -> CachePolicy:
+        return CachePolicy(ttl=60.0)
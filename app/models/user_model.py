@@ -7,7 +7,9 @@
 
 from typing import List, Optional
 from pydantic import BaseModel, EmailStr
+from pymongo import ASCENDING, IndexModel
 from app.models.base import PyObjectId, DocumentModel
+from app.core.entity_cache import CachePolicy
 from app.db.collections import db
 from enum import Enum
 
@@ -42,3 +44,14 @@ class User(DocumentModel):
     @classmethod
     def collection(cls):
         return db["users"]
+
+    # Define the indexes for looking users up by email, e.g. on every authenticated request
+    # Unique, as the entity cache keys users by email
+    @classmethod
+    def indexes(cls) -> List[IndexModel]:
+        return [IndexModel([("email", ASCENDING)], name="email", unique=True)]
+
+    # Cache users by ID and email, the authentication middleware looks one up per request
+    @classmethod
+    def cache_policy(cls) -> CachePolicy:
+        return CachePolicy(ttl=60.0, unique_keys=("email",))
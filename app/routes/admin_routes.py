@@ -0,0 +1,104 @@
+# Import necessary modules and dependencies
+# FastAPI components for routing and exceptions
+# hmac for comparing the operator token in constant time
+# Profiling and memory snapshot helpers
+# Websocket manager for reporting retained connections
+# Entity caches and org directory for reporting cache use
+
+import asyncio
+import hmac
+import tracemalloc
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+
+from app.core import profiling
+from app.core.entity_cache import caches
+from app.core.org_directory import org_directory
+from app.websocket_manager import active_connections
+
+
+# Ensure the request carries PROFILE_TOKEN in the X-Profile-Token header
+# Operators hold the token rather than a role, so the endpoints are disabled without it
+# Raise an HTTPException otherwise
+def require_profile_token(x_profile_token: Optional[str] = Header(None)) -> None:
+    # Compare bytes, compare_digest rejects non-ASCII strings with a TypeError
+    if not profiling.PROFILE_TOKEN or not hmac.compare_digest(
+        (x_profile_token or "").encode("latin-1"), profiling.PROFILE_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Forbidden: Invalid profile token")
+
+
+# Create a router for admin endpoints, restricted to operators holding PROFILE_TOKEN
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    dependencies=[Depends(require_profile_token)],
+)
+
+
+# Endpoint to list the stored request profiles
+@router.get("/profiles")
+async def get_profiles():
+    return profiling.list_profiles()
+
+
+# Endpoint to start tracing memory allocations
+# Accepts the number of frames stored per allocation
+@router.post("/memory/start")
+async def start_memory_tracing(frames: int = Query(10, ge=1, le=50)):
+    started = profiling.start_memory_tracing(frames)
+    return {"tracing": True, "started": started}
+
+
+# Endpoint to stop tracing memory allocations and drop the snapshots
+@router.post("/memory/stop")
+async def stop_memory_tracing():
+    profiling.stop_memory_tracing()
+    return {"tracing": False}
+
+
+# Endpoint to take a memory snapshot
+# Returns the snapshot ID to diff against later
+@router.post("/memory/snapshot")
+async def take_memory_snapshot(label: Optional[str] = None):
+    if not tracemalloc.is_tracing():
+        raise HTTPException(
+            status_code=409, detail="Memory tracing is not running, start it first"
+        )
+    snapshot = await asyncio.to_thread(profiling.take_memory_snapshot, label)
+    snapshot["active_connections"] = len(active_connections)
+    return snapshot
+
+
+# Endpoint to list the stored memory snapshots
+@router.get("/memory/snapshots")
+async def list_memory_snapshots():
+    return profiling.list_memory_snapshots()
+
+
+# Endpoint to diff two memory snapshots
+# Returns the allocation sites whose memory grew the most
+@router.get("/memory/diff")
+async def diff_memory_snapshots(
+    base_id: int,
+    target_id: int,
+    key_type: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(25, ge=1, le=200),
+):
+    diff = await asyncio.to_thread(
+        profiling.diff_memory_snapshots, base_id, target_id, key_type, limit
+    )
+    if diff is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    diff["active_connections"] = len(active_connections)
+    return diff
+
+
+# Endpoint to report the hit ratio and memory use of this worker's caches
+@router.get("/caches")
+async def get_cache_stats():
+    return {
+        "entity_caches": {name: cache.stats() for name, cache in caches.items()},
+        "org_directory": org_directory.stats(),
+    }
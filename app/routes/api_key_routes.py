@@ -0,0 +1,84 @@
+# Import necessary modules and dependencies
+# FastAPI components for routing and exceptions
+# Custom models and schemas for API keys and users
+# Key generation and hashing
+# Authentication dependency
+# Typing for type hints
+
+from fastapi import APIRouter, HTTPException
+from app.core.api_keys import generate_api_key
+from app.models.api_key_model import ApiKey
+from app.models.base import same_id
+from app.models.user_model import User
+from app.routes.user_routes import require_admin_membership
+from app.schemas.api_key_schema import ApiKeyCreate
+from app.dependencies.auth import get_current_user
+from fastapi import Depends
+from typing import Any, Dict, List
+
+
+# Create a router for API key endpoints with a prefix and tags
+router = APIRouter(prefix="/api-key", tags=["API Keys"])
+
+# Fields of a key never returned, only its hash is stored
+HIDDEN_FIELDS = {"key_hash"}
+
+
+# Ensure the user is an admin member of their current organization
+# Raise an HTTPException otherwise
+def _require_org_admin(user: User) -> None:
+    if not user.current_org:
+        raise HTTPException(
+            status_code=403, detail="You are not authorized to manage API keys"
+        )
+    require_admin_membership(user, str(user.current_org.org_id))
+
+
+# Endpoint to create an API key for the user's current organization
+# Accepts key data and the current user as input
+# Returns the created key along with the key itself, which is not shown again
+@router.post("/create-api-key")
+async def create_api_key(
+    key_data: ApiKeyCreate, user: User = Depends(get_current_user)
+) -> Dict[str, Any]:
+    _require_org_admin(user)
+    key, prefix, key_hash = generate_api_key()
+    api_key = await ApiKey(
+        org_id=user.current_org.org_id,  # type: ignore
+        name=key_data.name,
+        prefix=prefix,
+        key_hash=key_hash,
+        created_by=user.id,  # type: ignore
+        created_by_username=user.full_name,
+    ).save()
+    return {**api_key.model_dump(exclude=HIDDEN_FIELDS), "key": key}
+
+
+# Endpoint to list the API keys of the user's current organization
+# Accepts the current user as input
+# Returns the keys without their hashes
+@router.get(
+    "/get-all-api-keys", response_model=List[ApiKey], response_model_exclude=HIDDEN_FIELDS
+)
+async def list_api_keys(user: User = Depends(get_current_user)):
+    _require_org_admin(user)
+    return await ApiKey.find_all({"org_id": user.current_org.org_id})  # type: ignore
+
+
+# Endpoint to revoke an API key
+# Accepts key ID and the current user as input
+# Returns the deleted key; requests presenting it are refused from then on
+@router.delete(
+    "/delete-api-key", response_model=ApiKey, response_model_exclude=HIDDEN_FIELDS
+)
+async def delete_api_key(api_key_id: str, user: User = Depends(get_current_user)):
+    _require_org_admin(user)
+    api_key = await ApiKey.find_by_id(api_key_id)
+    if not api_key:
+        raise HTTPException(status_code=404, detail="API key not found")
+    if not same_id(api_key.org_id, user.current_org.org_id):  # type: ignore
+        raise HTTPException(
+            status_code=403, detail="You are not authorized to delete this API key"
+        )
+    await api_key.delete()
+    return api_key
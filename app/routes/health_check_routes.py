@@ -0,0 +1,133 @@
+# Import necessary modules and dependencies
+# FastAPI components for routing and exceptions
+# Custom models and schemas for health checks, services and users
+# Authentication dependency
+# Probe measurement queries
+# Typing for type hints
+
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, HTTPException, Query
+from app.models.base import same_id
+from app.models.health_check_model import HealthCheck
+from app.models.service_model import Service
+from app.schemas.health_check_schema import HealthCheckCreate, HealthCheckUpdate
+from app.models.user_model import User
+from app.dependencies.auth import get_current_user
+from fastapi import Depends
+from app.core.probe_metrics import DEFAULT_MAX_POINTS, get_service_metrics
+from typing import List, Optional
+
+
+# Create a router for health check endpoints with a prefix and tags
+router = APIRouter(prefix="/health-check", tags=["Health Checks"])
+
+
+# Find a service of the user's current organization
+# Raise an HTTPException if it does not exist or belongs to another organization
+async def _authorized_service(service_id: str, user: User) -> Service:
+    service = await Service.find_by_id(service_id)
+    if not service:
+        raise HTTPException(status_code=404, detail="Service not found")
+    if not user.current_org or not same_id(service.org_id, user.current_org.org_id):
+        raise HTTPException(
+            status_code=403, detail="You are not authorized to manage checks of this service"
+        )
+    return service
+
+
+# Find a health check of the user's current organization
+# Raise an HTTPException if it does not exist or belongs to another organization
+async def _authorized_check(health_check_id: str, user: User) -> HealthCheck:
+    check = await HealthCheck.find_by_id(health_check_id)
+    if not check:
+        raise HTTPException(status_code=404, detail="Health check not found")
+    if not user.current_org or not same_id(check.org_id, user.current_org.org_id):
+        raise HTTPException(
+            status_code=403, detail="You are not authorized to manage this health check"
+        )
+    return check
+
+
+# Endpoint to register a synthetic check for a service
+# Accepts check data and the current user as input
+# Returns the created check; the scheduler picks it up on its next reload
+@router.post("/create-health-check", response_model=HealthCheck)
+async def create_health_check(
+    check_data: HealthCheckCreate, user: User = Depends(get_current_user)
+):
+    service = await _authorized_service(check_data.service_id, user)
+    check = HealthCheck(
+        **check_data.model_dump(exclude={"service_id"}),
+        service_id=service.id,  # type: ignore
+        org_id=service.org_id,
+        created_by=user.id,  # type: ignore
+    )
+    return await check.save()
+
+
+# Endpoint to change a health check
+# Accepts updated check data and the current user as input
+# Returns the updated check
+@router.post("/update-health-check", response_model=HealthCheck)
+async def update_health_check(
+    check_data: HealthCheckUpdate, user: User = Depends(get_current_user)
+):
+    check = await _authorized_check(check_data.health_check_id, user)
+    service = await _authorized_service(check_data.service_id, user)
+    updates = check_data.model_dump(exclude={"health_check_id", "service_id"})
+    updates["service_id"] = service.id
+    return await check.update(updates)
+
+
+# Endpoint to list the health checks of the user's organization
+# Accepts an optional service ID and the current user as input
+# Returns the checks with their last state
+@router.get("/get-all-health-checks", response_model=List[HealthCheck])
+async def list_health_checks(
+    service_id: Optional[str] = None, user: User = Depends(get_current_user)
+):
+    if not user.current_org:
+        raise HTTPException(
+            status_code=403, detail="You are not authorized to view these health checks"
+        )
+    filter = {"org_id": user.current_org.org_id}
+    if service_id:
+        filter["service_id"] = service_id
+    return await HealthCheck.find_all(filter)
+
+
+# Endpoint to read the probe measurements of a service, for latency and uptime graphs
+# Accepts the service ID, a time range (the last day by default), the most points
+# wanted and the current user as input
+# Returns points at the resolution that fits the range, see app.core.probe_metrics
+@router.get("/get-service-metrics")
+async def service_metrics(
+    service_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    max_points: int = Query(DEFAULT_MAX_POINTS, ge=1, le=5000),
+    user: User = Depends(get_current_user),
+):
+    service = await _authorized_service(service_id, user)
+    # Measurements are stored in naive UTC like every other timestamp
+    end = _naive_utc(end) if end else datetime.utcnow()
+    start = _naive_utc(start) if start else end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return await get_service_metrics(service.id, start, end, max_points)  # type: ignore
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# Endpoint to delete a health check
+# Accepts check ID and the current user as input
+# Returns the deleted check; the scheduler drops it on its next reload
+@router.delete("/delete-health-check", response_model=HealthCheck)
+async def delete_health_check(health_check_id: str, user: User = Depends(get_current_user)):
+    check = await _authorized_check(health_check_id, user)
+    await check.delete()
+    return check
@@ -4,22 +4,84 @@
 # Authentication dependency
 # Typing for type hints
 # Websocket manager for broadcasting messages
-from fastapi import APIRouter, HTTPException
-from app.models.base import PyObjectId
-from app.models.incident_model import AffectedService, Incident, IncidentUpdate
+# Status page stream for public viewers
+# Streaming export helpers
+# Batch ID parsing for the batch endpoint
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Query
+from app.models.base import PyObjectId, same_id
+from app.models.incident_model import (
+    ALERT_FIELDS,
+    AffectedService,
+    Incident,
+    IncidentSeverity,
+    IncidentStatus,
+    IncidentUpdate,
+)
 from app.models.service_model import Service
 from app.schemas.incident_schema import IncidentCreate, UpdateIncident
 from app.models.user_model import User
 from app.dependencies.auth import get_current_user
+from app.dependencies.batch import batch_ids
 from fastapi import Depends
-from typing import List
+from typing import Any, Dict, List, Optional
+from datetime import datetime
 from app.models.log_model import LogEntry, EntityType, ChangeType
 from app.websocket_manager import broadcast_message
+from app.core.status_page import schedule_status_export
+from app.core.status_stream import publish_status_events
+from app.core.export_stream import EXPORT_BATCH_SIZE, ExportFormat, export_response
+from app.core.incident_analytics import (
+    AnalyticsBucket,
+    get_incident_analytics,
+    invalidate_incident_analytics,
+)
 
 
 # Create a router for incident-related endpoints with a prefix and tags
 router = APIRouter(prefix="/incident", tags=["Incidents"])
 
+# Columns written by the incident export, in order
+INCIDENT_EXPORT_COLUMNS = [
+    "_id",
+    "title",
+    "description",
+    "status",
+    "severity",
+    "org_id",
+    "started_at",
+    "resolved_at",
+    "affected_services",
+    "created_at",
+    "created_by",
+    "created_by_username",
+]
+
+
+# Set the status of the services affected by an incident
+# The services are resolved with one query and written with one bulk write; services
+# of other organizations and services already in that status are skipped
+async def update_affected_services(incident: Incident) -> None:
+    statuses = {
+        affected_service.service_id: affected_service.status
+        for affected_service in incident.affected_services
+    }
+    services = await Service.loader().load_many(statuses)
+    changed = [
+        service
+        for service in services
+        if service.org_id == incident.org_id and service.status != statuses[service.id]
+    ]
+    await Service.bulk_update(
+        [(service.id, {"status": statuses[service.id].value}) for service in changed]
+    )
+    # Viewers of the status page see the services change along with the incident
+    for service in changed:
+        service.status = statuses[service.id]
+    publish_status_events(
+        incident.org_id, [("service", "update", service.model_dump_json()) for service in changed]
+    )
+
 
 # Endpoint to create a new incident
 # Accepts incident data and the current user as input
@@ -74,11 +136,7 @@ async def create_incident(
     incident = await incident.save()
 
     # Update the status of affected services in the database
-    for affected_service in incident.affected_services:
-        await Service.collection().update_one(
-            {"_id": affected_service.service_id},
-            {"$set": {"status": affected_service.status}},
-        )
+    await update_affected_services(incident)
 
     # Check if the incident ID is set after saving
     # Raise an HTTPException if not
@@ -113,6 +171,14 @@ async def create_incident(
     await broadcast_message(
         {"type": "incident", "data": incident.model_dump_json(), "action": "create"}
     )
+
+    # Refresh the static status page and analytics of the organization
+    # and push the change to the viewers of its status page
+    schedule_status_export(incident.org_id)
+    invalidate_incident_analytics(incident.org_id)
+    publish_status_events(
+        incident.org_id, [("incident", "create", incident.model_dump_json(exclude=ALERT_FIELDS))]
+    )
     return incident
 
 
@@ -131,7 +197,7 @@ async def update_incident(
         raise HTTPException(
             status_code=403, detail="You are not authorized to update this incident"
         )
-    if str(incident.org_id) != str(user.current_org.org_id):
+    if not same_id(incident.org_id, user.current_org.org_id):
         raise HTTPException(
             status_code=403, detail="You are not authorized to update this incident"
         )
@@ -183,11 +249,11 @@ async def update_incident(
             "description": incident.description,
             "status": incident.status,
             "severity": incident.severity,
-            "affected_services": [
-                service.model_dump() for service in incident.affected_services
-            ],
+            "affected_services": incident.affected_services,
             "resolved_at": incident.resolved_at,
-            "updates": [update.model_dump() for update in incident.updates],
+            "updates": incident.updates,
+            # A resolved alert incident no longer collects alerts, new ones open another
+            **({"alert_key": None} if incident.resolved_at else {}),
         }
     )
 
@@ -223,11 +289,7 @@ async def update_incident(
     await log_entry.save()
 
     # Update the status of affected services in the database
-    for affected_service in incident.affected_services:
-        await Service.collection().update_one(
-            {"_id": affected_service.service_id},
-            {"$set": {"status": affected_service.status.value}},
-        )
+    await update_affected_services(incident)
 
     # Broadcast the update of the incident to connected clients
     await broadcast_message(
@@ -237,6 +299,14 @@ async def update_incident(
             "action": "update",
         }
     )
+
+    # Refresh the static status page and analytics of the organization
+    # and push the change to the viewers of its status page
+    schedule_status_export(incident.org_id)
+    invalidate_incident_analytics(incident.org_id)
+    publish_status_events(
+        incident.org_id, [("incident", "update", incident.model_dump_json(exclude=ALERT_FIELDS))]
+    )
     return incident
 
 
@@ -245,15 +315,80 @@ async def update_incident(
 # Returns a list of incidents
 @router.get("/get-all-incidents", response_model=List[Incident])
 async def list_incidents(org_id: str, user: User = Depends(get_current_user)):
-    # Find all incidents for the given organization ID
+    # Find all incidents for the given organization ID, a secondary may serve the list
     incidents = await Incident.find_all(
         {
             "org_id": PyObjectId(org_id),
-        }
+        },
+        secondary_ok=True,
     )
     return incidents
 
 
+# Endpoint to export incidents of an organization as NDJSON or CSV
+# Accepts organization ID, optional time range and incident filters, and the current user as input
+# Streams the matching incidents, most recently started first, without an upper limit
+@router.get("/export-incidents")
+async def export_incidents(
+    org_id: str,
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    status: Optional[IncidentStatus] = None,
+    severity: Optional[IncidentSeverity] = None,
+    service_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user: User = Depends(get_current_user),
+):
+    if not user.current_org or not same_id(user.current_org.org_id, org_id):
+        raise HTTPException(
+            status_code=403,
+            detail="You are not authorized to export incidents for this organization",
+        )
+
+    # Build the filter from the provided parameters
+    filter: Dict[str, Any] = {"org_id": PyObjectId(org_id)}
+    if status:
+        filter["status"] = status.value
+    if severity:
+        filter["severity"] = severity.value
+    if service_id:
+        filter["affected_services.service_id"] = PyObjectId(service_id)
+    # Restrict to incidents started in the requested time range
+    if start or end:
+        filter["started_at"] = {}
+        if start:
+            filter["started_at"]["$gte"] = start
+        if end:
+            filter["started_at"]["$lt"] = end
+
+    cursor = Incident.find_cursor(
+        filter,
+        sort=[("started_at", -1)],
+        batch_size=EXPORT_BATCH_SIZE,
+        secondary_ok=True,
+    )
+    return export_response(cursor, export_format, INCIDENT_EXPORT_COLUMNS, "incidents")
+
+
+# Endpoint to get incident analytics for an organization
+# Accepts organization ID, an optional time window, the bucket size and the current user as input
+# Returns incident counts and MTTR per time bucket, severity, status and affected service
+@router.get("/get-incident-analytics")
+async def incident_analytics(
+    org_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    bucket: AnalyticsBucket = AnalyticsBucket.DAY,
+    user: User = Depends(get_current_user),
+):
+    if not user.current_org or not same_id(user.current_org.org_id, org_id):
+        raise HTTPException(
+            status_code=403,
+            detail="You are not authorized to view analytics for this organization",
+        )
+    return await get_incident_analytics(org_id, start, end, bucket)
+
+
 # Endpoint to delete an incident
 # Accepts incident ID and the current user as input
 # Returns the deleted incident
@@ -267,7 +402,7 @@ async def delete_incident(incident_id: str, user: User = Depends(get_current_use
         raise HTTPException(
             status_code=403, detail="You are not authorized to delete this incident"
         )
-    if str(incident.org_id) != str(user.current_org.org_id):
+    if not same_id(incident.org_id, user.current_org.org_id):
         raise HTTPException(
             status_code=403, detail="You are not authorized to delete this incident"
         )
@@ -301,9 +436,31 @@ async def delete_incident(incident_id: str, user: User = Depends(get_current_use
     await broadcast_message(
         {"type": "incident", "data": incident.model_dump_json(), "action": "delete"}
     )
+
+    # Refresh the static status page and analytics of the organization
+    # and push the change to the viewers of its status page
+    schedule_status_export(incident.org_id)
+    invalidate_incident_analytics(incident.org_id)
+    publish_status_events(
+        incident.org_id, [("incident", "delete", incident.model_dump_json(exclude=ALERT_FIELDS))]
+    )
     return incident
 
 
+# Endpoint to fetch many incidents by their IDs in one query
+# Accepts repeated or comma-separated IDs and the current user as input
+# Returns the incidents of the user's organization that were found, in request order
+@router.get("/get-incidents-by-ids", response_model=List[Incident])
+async def fetch_incidents_by_ids(
+    ids: List[ObjectId] = Depends(batch_ids), user: User = Depends(get_current_user)
+):
+    if not user.current_org:
+        raise HTTPException(
+            status_code=403, detail="You are not authorized to view these incidents"
+        )
+    return await Incident.find_by_ids(ids, {"org_id": user.current_org.org_id})
+
+
 # Endpoint to fetch a specific incident by its ID
 # Accepts incident ID as input
 # Returns the incident if found
@@ -0,0 +1,47 @@
+# Import necessary modules and dependencies
+# FastAPI components for routing, requests and exceptions
+# Alert parsing and the buffered ingestion pipeline
+# API key authentication dependency
+
+from json import JSONDecodeError
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse
+from app.core.alert_ingest import (
+    INGEST_MAX_BATCH,
+    IngestQueueFull,
+    alert_pipeline,
+    parse_alerts,
+)
+from app.models.api_key_model import ApiKey
+from app.dependencies.auth import get_api_key
+from fastapi import Depends
+
+
+# Create a router for ingestion endpoints with a prefix and tags
+# Authenticated with an organization's API key instead of a Firebase ID token
+router = APIRouter(prefix="/ingest", tags=["Ingestion"])
+
+
+# Endpoint for alert webhooks of external monitors (Alertmanager, Datadog)
+# Accepts a batch of alerts, each naming a service by its status_page_service or
+# service label or tag, and the API key as input
+# Returns 202 with the number of alerts accepted and dropped; the alerts are written
+# within a second, opening, escalating and resolving incidents of their services
+@router.post("/alerts", status_code=202)
+async def ingest_alerts(request: Request, api_key: ApiKey = Depends(get_api_key)):
+    try:
+        alerts = parse_alerts(await request.json())
+    except (JSONDecodeError, UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid alert payload: {e}")
+    if len(alerts) > INGEST_MAX_BATCH:
+        raise HTTPException(
+            status_code=413, detail=f"At most {INGEST_MAX_BATCH} alerts per request"
+        )
+    try:
+        return alert_pipeline.submit(api_key, alerts)
+    except IngestQueueFull:
+        return JSONResponse(
+            {"detail": "Too many alerts queued, retry later"},
+            status_code=503,
+            headers={"Retry-After": "1"},
+        )
@@ -3,36 +3,168 @@
 # Custom models for logs and users
 # Authentication dependency
 # Typing for type hints
+# Streaming export helpers
 
-from fastapi import APIRouter, HTTPException
-from app.models.log_model import LogEntry, PyObjectId
-from typing import List
+from fastapi import APIRouter, HTTPException, Query
+from app.models.log_model import LogEntry, LogIndex, PyObjectId, EntityType, ChangeType
+from app.models.base import same_id
+from typing import Any, Dict, FrozenSet, List, Optional
+from bson import ObjectId
+from datetime import datetime
 from app.models.user_model import User
 from app.dependencies.auth import get_current_user
 from fastapi import Depends
+from app.core.export_stream import EXPORT_BATCH_SIZE, ExportFormat, export_response
 
 
 # Create a router for log-related endpoints with a prefix and tags
 router = APIRouter(prefix="/log", tags=["Logs"])
 
+# Columns written by the log export, in order
+LOG_EXPORT_COLUMNS = [
+    "_id",
+    "created_at",
+    "created_by",
+    "org_id",
+    "entity_type",
+    "entity_id",
+    "change_type",
+    "changes",
+]
+
+# Supported audit query shapes, keyed by the equality filters used besides org_id
+# Each shape maps to the index that serves it; any other combination is rejected
+LOG_QUERY_SHAPES: Dict[FrozenSet[str], LogIndex] = {
+    frozenset(): LogIndex.ORG,
+    frozenset({"entity_type"}): LogIndex.ENTITY_TYPE,
+    frozenset({"entity_type", "change_type"}): LogIndex.ENTITY_TYPE_CHANGE,
+    frozenset({"change_type"}): LogIndex.CHANGE_TYPE,
+    frozenset({"entity_id"}): LogIndex.ENTITY,
+    frozenset({"entity_type", "entity_id"}): LogIndex.ENTITY,
+    frozenset({"created_by"}): LogIndex.CREATED_BY,
+}
+
+
+# Check that the user is viewing logs of their current organization
+# Raises an HTTPException if not
+def check_log_access(org_id: str, user: User):
+    if not user.current_org or not same_id(user.current_org.org_id, org_id):
+        raise HTTPException(
+            status_code=403,
+            detail="You are not authorized to view logs for this organization",
+        )
+
+
+# Parse an ID query parameter
+# Raises an HTTPException if it is not a valid ObjectId
+def parse_object_id(value: str, name: str) -> PyObjectId:
+    if not ObjectId.is_valid(value):
+        raise HTTPException(status_code=400, detail=f"Invalid {name}")
+    return PyObjectId(value)
+
+
+# Build the MongoDB filter for log queries of an organization
+def build_log_filter(
+    org_id: str,
+    entity_type: Optional[EntityType] = None,
+    entity_id: Optional[str] = None,
+    change_type: Optional[ChangeType] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    created_by: Optional[str] = None,
+) -> Dict[str, Any]:
+    filter: Dict[str, Any] = {"org_id": parse_object_id(org_id, "org_id")}
+    if entity_type:
+        filter["entity_type"] = entity_type.value
+    if entity_id:
+        filter["entity_id"] = parse_object_id(entity_id, "entity_id")
+    if change_type:
+        filter["change_type"] = change_type.value
+    if created_by:
+        filter["created_by"] = parse_object_id(created_by, "created_by")
+    # Restrict to the requested time range, start inclusive and end exclusive
+    if start or end:
+        filter["created_at"] = {}
+        if start:
+            filter["created_at"]["$gte"] = start
+        if end:
+            filter["created_at"]["$lt"] = end
+    return filter
+
+
+# Find the index serving a log filter
+# Raises an HTTPException for filter combinations without a matching index
+def select_log_index(filter: Dict[str, Any]) -> LogIndex:
+    fields = frozenset(key for key in filter if key not in ("org_id", "created_at"))
+    index = LOG_QUERY_SHAPES.get(fields)
+    if index is None:
+        supported = ", ".join(
+            "+".join(sorted(shape)) or "(none)" for shape in LOG_QUERY_SHAPES
+        )
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported log filter combination, supported filters: {supported}",
+        )
+    return index
+
 
 # Endpoint to list all logs
 # Returns a list of all log entries
 @router.get("/get-all-logs", response_model=List[LogEntry])
 async def list_logs():
-    logs = await LogEntry.find_all()
+    logs = await LogEntry.find_all(secondary_ok=True)
     return logs
 
 
 # Endpoint to get logs by organization
-# Accepts organization ID and the current user as input
-# Returns a list of log entries for the specified organization
+# Accepts organization ID, optional audit filters, a time range and the current user as input
+# Returns the newest log entries matching the filters, at most `limit` of them
+# To page further back, pass the created_at of the last entry received as `end`
 @router.get("/get-logs-by-org", response_model=List[LogEntry])
-async def get_logs_by_org(org_id: str, user: User = Depends(get_current_user)):
-    if not user.current_org or str(user.current_org.org_id) != org_id:
-        raise HTTPException(
-            status_code=403,
-            detail="You are not authorized to view logs for this organization",
-        )
-    logs = await LogEntry.find_all({"org_id": PyObjectId(org_id)})
+async def get_logs_by_org(
+    org_id: str,
+    entity_type: Optional[EntityType] = None,
+    entity_id: Optional[str] = None,
+    change_type: Optional[ChangeType] = None,
+    created_by: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=500),
+    user: User = Depends(get_current_user),
+):
+    check_log_access(org_id, user)
+    filter = build_log_filter(
+        org_id, entity_type, entity_id, change_type, start, end, created_by
+    )
+    index = select_log_index(filter)
+    cursor = LogEntry.find_cursor(
+        filter, batch_size=limit, hint=index.value, secondary_ok=True
+    )
+    logs = [LogEntry(**doc) async for doc in cursor.limit(limit)]
     return logs
+
+
+# Endpoint to export logs of an organization as NDJSON or CSV
+# Accepts organization ID, optional time range and entity filters, and the current user as input
+# Streams the matching log entries, newest first, without an upper limit
+@router.get("/export-logs")
+async def export_logs(
+    org_id: str,
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    entity_type: Optional[EntityType] = None,
+    entity_id: Optional[str] = None,
+    change_type: Optional[ChangeType] = None,
+    created_by: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user: User = Depends(get_current_user),
+):
+    check_log_access(org_id, user)
+    filter = build_log_filter(
+        org_id, entity_type, entity_id, change_type, start, end, created_by
+    )
+    index = select_log_index(filter)
+    cursor = LogEntry.find_cursor(
+        filter, batch_size=EXPORT_BATCH_SIZE, hint=index.value, secondary_ok=True
+    )
+    return export_response(cursor, export_format, LOG_EXPORT_COLUMNS, "logs")
@@ -11,6 +11,7 @@ from typing import List
 from app.dependencies.auth import get_current_user
 from app.models.user_model import OrgMembership, User, UserRole
 from fastapi import Depends
+from app.core.org_directory import org_directory
 
 
 # Create a router for organization-related endpoints with a prefix and tags
@@ -25,7 +26,7 @@ async def create_org(
     org_data: OrganizationCreate, user: User = Depends(get_current_user)
 ):
     # Check if an organization with the same domain or org_slug already exists
-    existing_org = await Organization.collection().find_one(
+    existing_org = await Organization.find_one(
         {
             "$or": [
                 {"domain": org_data.domain},
@@ -48,6 +49,8 @@ async def create_org(
         created_by_username=user.full_name,
     )
     org = await org.save()
+    # Make the new organization resolvable without a database lookup
+    org_directory.add(org)
     # If the organization is successfully saved, create a new organization membership for the user
     if org.id:
         new_org_membership = OrgMembership(
@@ -56,16 +59,10 @@ async def create_org(
             role=UserRole.ADMIN,
         )
         user.org_memberships.append(new_org_membership)
-        user.current_org = new_org_membership
-        org_memberships_dicts = [
-            membership.model_dump() for membership in user.org_memberships
-        ]
-        current_org_dict = user.current_org.model_dump()
-
         await user.update(
             {
-                "org_memberships": org_memberships_dicts,
-                "current_org": current_org_dict,
+                "org_memberships": user.org_memberships,
+                "current_org": new_org_membership,
             }
         )
 
@@ -79,12 +76,9 @@ async def create_org(
 async def list_orgs(user: User = Depends(get_current_user)):
     user_org_memberships = user.org_memberships
     org_ids = [membership.org_id for membership in user_org_memberships]
-    orgs = await Organization.find_all(
-        {
-            "_id": {"$in": org_ids},
-        }
-    )
-    return orgs
+    orgs = await Organization.loader().load_many(org_ids)
+    # Most recently created first
+    return sorted(orgs, key=lambda org: org.created_at, reverse=True)
 
 
 # Endpoint to get an organization by its domain
@@ -92,7 +86,7 @@ async def list_orgs(user: User = Depends(get_current_user)):
 # Returns the organization if found
 @router.get("/get-org-by-domain", response_model=Organization)
 async def get_org(domain: str):
-    org = await Organization.collection().find_one({"domain": domain})
+    org = await org_directory.get_by_domain(domain)
     if not org:
         raise HTTPException(status_code=404, detail="Organization not found")
-    return Organization(**org)
+    return org
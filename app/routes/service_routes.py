@@ -4,16 +4,27 @@
 # Authentication dependency
 # Typing for type hints
 # Websocket manager for broadcasting messages
+# Status page stream for public viewers
+# Batch ID parsing for the batch endpoints
+from bson import ObjectId
 from fastapi import APIRouter, HTTPException
-from app.models.base import PyObjectId
+from app.models.base import PyObjectId, same_id
 from app.models.service_model import Service
-from app.schemas.service_schema import ServiceCreate, ServiceUpdate
+from app.schemas.service_schema import (
+    ServiceCreate,
+    ServiceStatusBatchUpdate,
+    ServiceUpdate,
+)
 from app.models.user_model import User
 from app.dependencies.auth import get_current_user
 from fastapi import Depends
-from typing import List
+from typing import Any, Dict, List
+from app.dependencies.batch import batch_ids
 from app.models.log_model import LogEntry, EntityType, ChangeType
 from app.websocket_manager import broadcast_message
+from app.core.service_status import apply_service_statuses
+from app.core.status_page import schedule_status_export
+from app.core.status_stream import publish_status_events
 
 
 # Create a router for service-related endpoints with a prefix and tags
@@ -72,6 +83,10 @@ async def create_service(
 
     # Broadcast the creation of the service to connected clients
     await broadcast_message({"type": "service", "data": result.model_dump_json()})
+
+    # Refresh the static status page of the organization and push the change to its viewers
+    schedule_status_export(service.org_id)
+    publish_status_events(service.org_id, [("service", "create", result.model_dump_json())])
     return result
 
 
@@ -93,7 +108,7 @@ async def update_service(
         raise HTTPException(
             status_code=403, detail="You are not authorized to update this service"
         )
-    if str(service.org_id) != str(user.current_org.org_id):
+    if not same_id(service.org_id, user.current_org.org_id):
         raise HTTPException(
             status_code=403, detail="You are not authorized to update this service"
         )
@@ -139,6 +154,10 @@ async def update_service(
 
     # Broadcast the update of the service to connected clients
     await broadcast_message({"type": "service", "data": service.model_dump_json()})
+
+    # Refresh the static status page of the organization and push the change to its viewers
+    schedule_status_export(service.org_id)
+    publish_status_events(service.org_id, [("service", "update", service.model_dump_json())])
     return service
 
 
@@ -147,11 +166,12 @@ async def update_service(
 # Returns a list of services
 @router.get("/get-all-services", response_model=List[Service])
 async def list_services(org_id: str, user: User = Depends(get_current_user)):
-    # Find all services for the given organization ID
+    # Find all services for the given organization ID, a secondary may serve the list
     services = await Service.find_all(
         {
             "org_id": PyObjectId(org_id),
-        }
+        },
+        secondary_ok=True,
     )
     # Return the list of services
     return services
@@ -173,7 +193,7 @@ async def delete_service(service_id: str, user: User = Depends(get_current_user)
         raise HTTPException(
             status_code=403, detail="You are not authorized to delete this service"
         )
-    if str(service.org_id) != str(user.current_org.org_id):
+    if not same_id(service.org_id, user.current_org.org_id):
         raise HTTPException(
             status_code=403, detail="You are not authorized to delete this service"
         )
@@ -207,9 +227,63 @@ async def delete_service(service_id: str, user: User = Depends(get_current_user)
     await broadcast_message(
         {"type": "service", "data": service.model_dump_json(), "action": "delete"}
     )
+
+    # Refresh the static status page of the organization and push the change to its viewers
+    schedule_status_export(service.org_id)
+    publish_status_events(service.org_id, [("service", "delete", service.model_dump_json())])
     return service
 
 
+# Endpoint to update the status of many services at once, e.g. from deploy automation
+# Accepts the status changes and the current user as input
+# Returns the updated services, and the IDs left unchanged or not found
+@router.post("/batch-update-status")
+async def batch_update_service_status(
+    batch: ServiceStatusBatchUpdate, user: User = Depends(get_current_user)
+) -> Dict[str, Any]:
+    # Check if the user is authorized to update services of an organization
+    # Raise an HTTPException if not
+    if not user.current_org:
+        raise HTTPException(
+            status_code=403, detail="You are not authorized to update these services"
+        )
+    if user.id is None:
+        raise HTTPException(status_code=500, detail="User ID is not available.")
+    invalid = [c.service_id for c in batch.updates if not ObjectId.is_valid(c.service_id)]
+    if invalid:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid service IDs: {', '.join(invalid[:10])}"
+        )
+    # The last change requested for a service wins
+    statuses = {ObjectId(change.service_id): change.status for change in batch.updates}
+
+    # Load the services in one query, services of other organizations count as not found
+    org_id = user.current_org.org_id
+    services = await Service.find_by_ids(list(statuses), {"org_id": org_id})
+    found = {service.id for service in services}
+    not_found = [str(_id) for _id in statuses if _id not in found]
+    unchanged = [str(service.id) for service in services if service.status == statuses[service.id]]
+
+    # Apply, log and broadcast the changes like single updates, in one write each
+    updated = await apply_service_statuses(org_id, services, statuses, user.id)
+
+    return {"updated": updated, "unchanged": unchanged, "not_found": not_found}
+
+
+# Endpoint to fetch many services by their IDs in one query
+# Accepts repeated or comma-separated IDs and the current user as input
+# Returns the services of the user's organization that were found, in request order
+@router.get("/get-services-by-ids", response_model=List[Service])
+async def fetch_services_by_ids(
+    ids: List[ObjectId] = Depends(batch_ids), user: User = Depends(get_current_user)
+):
+    if not user.current_org:
+        raise HTTPException(
+            status_code=403, detail="You are not authorized to view these services"
+        )
+    return await Service.find_by_ids(ids, {"org_id": user.current_org.org_id})
+
+
 # Endpoint to fetch a specific service by its ID
 # Accepts service ID as input
 # Returns the service if found
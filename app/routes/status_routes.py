@@ -1,14 +1,49 @@
 # Import necessary modules and dependencies
 # FastAPI components for routing and exceptions
-# Custom models for organizations, services, and incidents
+# cachetools for the last good status page of each organization
+# Org directory for resolving organizations by slug
+# Status page payload builder shared with the static exporter
+# Circuit breaker and deadline errors, answered from the stale copy when there is one
+# Server-sent events stream of the status page
 
-from fastapi import APIRouter, HTTPException
+from typing import Any, Dict, Optional, Tuple
+
+from cachetools import TTLCache
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.core.circuit_breaker import DatabaseUnavailable
+from app.core.config import get_settings
+from app.core.deadlines import DeadlineExceeded, deadline, route_budget
+from app.core.org_directory import org_directory
+from app.core.status_page import build_status_payload
+from app.core.status_stream import StatusStreamResponse
 from app.models.org_model import Organization
-from app.models.service_model import Service
-from app.models.incident_model import Incident
 
 router = APIRouter(prefix="/status", tags=["Status"])
 
+# Last status page served per slug, kept for STATUS_STALE_TTL seconds
+# Served instead of an error while the database is unavailable or too slow
+_last_status: TTLCache = TTLCache(
+    maxsize=get_settings().org_directory_max_size,
+    ttl=get_settings().status_stale_ttl,
+)
+
+
+# Build the public status payload of an organization, JSON-compatible
+# Returns the last good copy and True when the database is unavailable or too slow
+async def _status_payload(org: Organization) -> Tuple[Dict[str, Any], bool]:
+    try:
+        # The public page tolerates bounded staleness, so a secondary may serve it
+        payload = jsonable_encoder(await build_status_payload(org, secondary_ok=True))
+    except (DatabaseUnavailable, DeadlineExceeded):
+        payload = _last_status.get(org.org_slug)
+        if payload is None:
+            raise
+        return payload, True
+    _last_status[org.org_slug] = payload
+    return payload, False
+
 
 # Endpoint to get the status of an organization
 # Accepts organization slug as input
@@ -19,20 +54,42 @@ router = APIRouter(prefix="/status", tags=["Status"])
 async def get_all_statuses(org_slug: str):
     # Find the organization by its slug
     # Raise an HTTPException if not found
-    org = await Organization.collection().find_one({"org_slug": org_slug})
+    try:
+        org = await org_directory.get_by_slug(org_slug)
+    except (DatabaseUnavailable, DeadlineExceeded):
+        payload = _last_status.get(org_slug)
+        if payload is None:
+            raise
+        return JSONResponse(payload, headers={"Warning": '110 - "Response is Stale"'})
     if not org:
         raise HTTPException(status_code=404, detail="Organization not found")
-    org = Organization(**org)
 
-    # Find all services for the organization
-    org_services = await Service.find_all({"org_id": org.id})
+    # Return the organization, services, and incidents
+    payload, stale = await _status_payload(org)
+    if stale:
+        # Tell clients and caches this is an older copy
+        return JSONResponse(payload, headers={"Warning": '110 - "Response is Stale"'})
+    return payload
+
 
-    # Find all incidents for the organization
-    incidents = await Incident.find_all({"org_id": org.id})
+# Endpoint streaming the status of an organization as server-sent events
+# Accepts organization slug as input, and Last-Event-ID when reconnecting
+# Sends a snapshot event with the same data as /status/get-org-status, then service
+# and incident events with their action and data as they happen
+@router.get("/stream")
+async def stream_status(org_slug: str, last_event_id: Optional[str] = Header(None)):
+    org = await org_directory.get_by_slug(org_slug)
+    if not org:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    org_id = org.id
 
-    # Return the organization, services, and incidents
-    return {
-        "org": org,
-        "org_services": org_services,
-        "incidents": incidents,
-    }
+    # Snapshots are built for the channel of the organization, not for this viewer,
+    # so they get the budget of a status page request rather than the stream's
+    async def build_snapshot() -> Dict[str, Any]:
+        with deadline(route_budget("/status/get-org-status")):
+            current = await org_directory.get_by_id(org_id)
+            if current is None:
+                raise HTTPException(status_code=404, detail="Organization not found")
+            return (await _status_payload(current))[0]
+
+    return StatusStreamResponse(str(org_id), build_snapshot, last_event_id)
@@ -23,10 +23,8 @@ router = APIRouter(prefix="/team", tags=["Teams"])
 # Returns the created team
 @router.post("/create-team", response_model=Team)
 async def create_team(team_data: TeamCreate, user: User = Depends(get_current_user)):
-    # Find all users with the given member IDs
-    members = await User.find_all(
-        {"_id": {"$in": [PyObjectId(member_id) for member_id in team_data.member_ids]}}
-    )
+    # Find all users with the given member IDs, with one query
+    members = await User.loader().load_many(team_data.member_ids)
     # Create a new team object from the provided data
     team = Team(
         name=team_data.name,
@@ -53,11 +51,12 @@ async def create_team(team_data: TeamCreate, user: User = Depends(get_current_us
 # Returns a list of teams
 @router.get("/get-all-teams", response_model=List[Team])
 async def list_teams(org_id: str, user: User = Depends(get_current_user)):
-    # Find all teams for the given organization ID
+    # Find all teams for the given organization ID, a secondary may serve the list
     teams = await Team.find_all(
         {
             "org_id": PyObjectId(org_id),
-        }
+        },
+        secondary_ok=True,
     )
     # Return the list of teams
     return teams
@@ -1,5 +1,6 @@
-from fastapi import APIRouter, HTTPException
-from app.models.org_model import Organization
+import asyncio
+from fastapi import APIRouter, HTTPException, Request
+from app.core.org_directory import org_directory
 from app.models.user_model import User, OrgMembership, UserRole
 from app.schemas.user_schema import UserCreate
 from app.dependencies.auth import get_current_user
@@ -7,16 +8,21 @@ from fastapi import Depends
 from app.core.logger import logger
 from typing import List
 from bson import ObjectId
-from app.models.base import PyObjectId
-from firebase_admin import auth
+from pymongo.errors import DuplicateKeyError
+from app.models.base import PyObjectId, same_id
+from app.core.firebase_admin import get_auth
+from app.core.user_provisioning import BatchFormatError, parse_batch, provision_users
 
 # Import necessary modules and dependencies
 # FastAPI components for routing and exceptions
-# Custom models and schemas for users and organizations
+# Custom models and schemas for users
+# Org directory for resolving organizations
 # Authentication dependency
 # Logger for logging
 # Typing for type hints
 # ObjectId for MongoDB
+# DuplicateKeyError for users created concurrently under the same email
+# Bulk provisioning of users from CSV or JSON batches
 
 
 # Create a router for user-related endpoints with a prefix and tags
@@ -39,7 +45,14 @@ async def sync_user_to_db(user_data: UserCreate):
         full_name=user_data.full_name,
         photo_url=user_data.photo_url,
     )
-    await user.save()
+    try:
+        await user.save()
+    except DuplicateKeyError:
+        # A concurrent first login created the user meanwhile, return that one
+        existing_user = await User.find_one({"email": user_data.email})
+        if not existing_user:
+            raise
+        return existing_user
     return user
 
 
@@ -48,14 +61,14 @@ async def sync_user_to_db(user_data: UserCreate):
 # Returns the updated user
 @router.post("/update-current-org", response_model=User)
 async def update_current_org(org_id: str, user: User = Depends(get_current_user)):
-    org = await Organization.find_by_id(org_id)
+    org = await org_directory.get_by_id(org_id)
     if not org:
         raise HTTPException(status_code=404, detail="Organization not found")
     user_org_membership = next(
         (
             membership
             for membership in user.org_memberships
-            if str(membership.org_id) == org_id
+            if same_id(membership.org_id, org_id)
         ),
         None,
     )
@@ -64,11 +77,7 @@ async def update_current_org(org_id: str, user: User = Depends(get_current_user)
             status_code=404, detail="User not a member of this organization"
         )
 
-    # Convert ObjectId to string in user_org_membership
-    user_org_membership_dict = user_org_membership.model_dump()
-    user_org_membership_dict["org_id"] = str(user_org_membership.org_id)
-
-    await user.update({"current_org": user_org_membership_dict})
+    await user.update({"current_org": user_org_membership})
     return user
 
 
@@ -88,28 +97,24 @@ async def fetch_user(user_id: str):
 # Returns a list of users
 @router.get("/org/{org_id}/users", response_model=List[User])
 async def fetch_org_users(org_id: str, current_user: User = Depends(get_current_user)):
-    org = await Organization.find_by_id(org_id)
+    org = await org_directory.get_by_id(org_id)
     if not org:
         raise HTTPException(status_code=404, detail="Organization not found")
     users = await User.find_all(
-        {"org_memberships.org_id": PyObjectId(org_id), "_id": {"$ne": current_user.id}}
+        {"org_memberships.org_id": PyObjectId(org_id), "_id": {"$ne": current_user.id}},
+        secondary_ok=True,
     )
     return users
 
 
-# Endpoint to create a user in an organization
-# Accepts user data, organization ID, and the current user as input
-# Returns the newly created user
-@router.post("/create-user-in-org", response_model=User)
-async def create_user_in_org(
-    user_data: UserCreate, org_id: str, current_user: User = Depends(get_current_user)
-):
-    # Check if the current user has admin access in the organization
+# Get the user's admin membership in an organization
+# Raise an HTTPException if the user is not an admin there
+def require_admin_membership(user: User, org_id: str) -> OrgMembership:
     user_org_membership = next(
         (
             membership
-            for membership in current_user.org_memberships
-            if str(membership.org_id) == org_id and membership.role == UserRole.ADMIN
+            for membership in user.org_memberships
+            if same_id(membership.org_id, org_id) and membership.role == UserRole.ADMIN
         ),
         None,
     )
@@ -118,13 +123,26 @@ async def create_user_in_org(
             status_code=403,
             detail="User does not have admin access in this organization",
         )
+    return user_org_membership
+
+
+# Endpoint to create a user in an organization
+# Accepts user data, organization ID, and the current user as input
+# Returns the newly created user
+@router.post("/create-user-in-org", response_model=User)
+async def create_user_in_org(
+    user_data: UserCreate, org_id: str, current_user: User = Depends(get_current_user)
+):
+    # Check if the current user has admin access in the organization
+    user_org_membership = require_admin_membership(current_user, org_id)
 
     # Find the org_slug from the current user's org_membership
     org_slug = user_org_membership.org_slug
 
-    # Create the new user in Firebase
+    # Create the new user in Firebase, in a worker thread as the call blocks
     try:
-        firebase_user = auth.create_user(
+        firebase_user = await asyncio.to_thread(
+            get_auth().create_user,
             email=user_data.email,
             password=user_data.password if user_data.password else None,
             display_name=user_data.full_name,
@@ -150,5 +168,28 @@ async def create_user_in_org(
             )
         ],
     )
-    await new_user.save()
+    try:
+        await new_user.save()
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="User already exists")
     return new_user
+
+
+# Endpoint to create many users in an organization at once
+# Accepts a CSV (Content-Type: text/csv) or JSON batch, organization ID, and the current user
+# Returns a summary and a result per row; rows fail individually, not the whole batch
+@router.post("/bulk-create-users-in-org")
+async def bulk_create_users_in_org(
+    request: Request, org_id: str, current_user: User = Depends(get_current_user)
+):
+    # Check if the current user has admin access in the organization
+    user_org_membership = require_admin_membership(current_user, org_id)
+
+    try:
+        rows = parse_batch(await request.body(), request.headers.get("content-type", ""))
+    except BatchFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return await provision_users(
+        rows, org_id, user_org_membership.org_slug, current_user.id
+    )
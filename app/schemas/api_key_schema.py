@@ -0,0 +1,5 @@
+from pydantic import BaseModel, Field
+
+
+class ApiKeyCreate(BaseModel):
+    name: str = Field(min_length=1, max_length=100)
@@ -0,0 +1,33 @@
+from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from app.core.config import get_settings
+from app.core.health_checks import parse_target
+from app.models.health_check_model import CheckKind
+from app.models.service_model import ServiceStatus
+
+
+class HealthCheckCreate(BaseModel):
+    service_id: str
+    kind: CheckKind
+    target: str
+    interval: float = Field(60.0, ge=get_settings().health_check_min_interval, le=86400)
+    timeout: float = Field(10.0, gt=0, le=60)
+    expected_status: Optional[int] = Field(None, ge=100, le=599)
+    failure_threshold: int = Field(3, ge=1, le=100)
+    success_threshold: int = Field(2, ge=1, le=100)
+    failure_status: ServiceStatus = ServiceStatus.OUTAGE
+    enabled: bool = True
+
+    # The target must suit the kind, e.g. a URL for HTTP checks
+    @model_validator(mode="after")
+    def check_target(self):
+        parse_target(self.kind, self.target)
+        if self.timeout > self.interval:
+            raise ValueError("timeout must not exceed interval")
+        if self.failure_status in (ServiceStatus.OPERATIONAL, ServiceStatus.UNKNOWN):
+            raise ValueError("failure_status must be a failing status")
+        return self
+
+
+class HealthCheckUpdate(HealthCheckCreate):
+    health_check_id: str
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import List
+from pydantic import BaseModel, Field
+from app.dependencies.batch import MAX_BATCH_SIZE
 from app.models.service_model import ServiceStatus
 
 
@@ -11,3 +13,12 @@ class ServiceCreate(BaseModel):
 
 class ServiceUpdate(ServiceCreate):
     service_id: str
+
+
+class ServiceStatusChange(BaseModel):
+    service_id: str
+    status: ServiceStatus
+
+
+class ServiceStatusBatchUpdate(BaseModel):
+    updates: List[ServiceStatusChange] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
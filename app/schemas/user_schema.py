@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import Optional
 
 
@@ -7,3 +7,9 @@ class UserCreate(BaseModel):
     full_name: str
     photo_url: Optional[str] = None
     password: Optional[str] = None
+
+    # Emails are stored lowercased, as Firebase does, so each has one user
+    @field_validator("email")
+    @classmethod
+    def lowercase_email(cls, email: str) -> str:
+        return email.strip().lower()
@@ -1,12 +1,52 @@
 from fastapi import WebSocket
 import json
+import time
+from app.core.logger import logger
+from app.core.tracing import span
+from app.core.metrics import (
+    websocket_broadcast_duration_seconds,
+    websocket_connections,
+    websocket_messages_dropped_total,
+    websocket_messages_sent_total,
+)
 
 # List to store active WebSocket connections
 active_connections = []
 
 
+# Register an accepted WebSocket connection
+def connect(websocket: WebSocket):
+    active_connections.append(websocket)
+    websocket_connections.set(value=len(active_connections))
+
+
+# Unregister a WebSocket connection, safe to call more than once
+def disconnect(websocket: WebSocket):
+    if websocket in active_connections:
+        active_connections.remove(websocket)
+    websocket_connections.set(value=len(active_connections))
+
+
 async def broadcast_message(message: dict):
-    # Serialize the message to a JSON string
-    message_json = json.dumps(message)
-    for connection in active_connections:
-        await connection.send_text(message_json)
+    with span("ws.broadcast", type=message.get("type")) as current:
+        # Serialize the message to a JSON string
+        message_json = json.dumps(message)
+        start = time.perf_counter()
+        sent = 0
+        failed = []
+        # Iterate over a copy, connections may close while we are sending
+        for connection in list(active_connections):
+            try:
+                await connection.send_text(message_json)
+                sent += 1
+            except Exception as e:
+                # Count the dropped message and forget the broken connection
+                logger.warning(f"Dropping websocket message: {e}")
+                failed.append(connection)
+        for connection in failed:
+            disconnect(connection)
+        current.set_attribute("sent", sent)
+        current.set_attribute("dropped", len(failed))
+    websocket_messages_sent_total.inc(amount=sent)
+    websocket_messages_dropped_total.inc(amount=len(failed))
+    websocket_broadcast_duration_seconds.observe(time.perf_counter() - start)
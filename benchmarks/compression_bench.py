@@ -0,0 +1,222 @@
+"""Wire compression benchmark for large incident lists
+
+Usage:
+  python -m benchmarks.compression_bench --mongo-url mongodb://db.internal:27017
+  python -m benchmarks.compression_bench --incidents 5000 --limit 1000 --compressors zlib,zstd
+
+Seeds one organization with incidents carrying realistic, text-heavy descriptions
+and update timelines, then reads the incident list the way /incident/get-all-incidents
+does (Incident.find_all) through one client per compressor. For every compressor it
+reports query latency and, when the user may run serverStatus, the bytes the server
+sent per query after compression.
+
+Needs a real mongod, compression happens on the wire. Against localhost the numbers
+mostly show the CPU cost of compressing; the bandwidth savings pay off when the
+database is across a network. zstd needs the zstandard package, snappy python-snappy.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.db import collections
+from app.models.incident_model import Incident, IncidentSeverity, IncidentStatus
+from benchmarks.routes import percentile
+
+# Words the synthetic incident texts are made of, so they compress like real prose
+VOCABULARY = (
+    "api gateway latency elevated errors database primary failover region users "
+    "requests timeout degraded performance investigating identified monitoring fix "
+    "deployed rollback cache cluster node queue backlog recovering customers impact "
+    "dashboard login payments webhook delivery delayed upstream provider resolved"
+).split()
+
+# Modules needed by each compressor besides PyMongo itself
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy"}
+
+
+def _text(rng: random.Random, size: int) -> str:
+    words: List[str] = []
+    length = 0
+    while length < size:
+        word = rng.choice(VOCABULARY)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+# Whether PyMongo can use the compressor in this environment
+def compressor_available(name: str) -> bool:
+    module = COMPRESSOR_MODULES.get(name)
+    if module is None:
+        return True
+    try:
+        __import__(module)
+        return True
+    except ImportError:
+        return False
+
+
+async def seed_incidents(database, args: argparse.Namespace) -> ObjectId:
+    rng = random.Random(args.seed)
+    org_id, user_id = ObjectId(), ObjectId()
+    now = datetime.utcnow()
+    documents = []
+    for n in range(args.incidents):
+        started_at = now - timedelta(minutes=n * 7)
+        documents.append(
+            {
+                "title": f"Incident {n}: " + _text(rng, 40),
+                "description": _text(rng, args.description_bytes),
+                "status": rng.choice(list(IncidentStatus)).value,
+                "severity": rng.choice(list(IncidentSeverity)).value,
+                "affected_services": [
+                    {
+                        "service_id": ObjectId(),
+                        "service_name": f"Service {rng.randint(0, 50)}",
+                        "status": "outage",
+                        "created_at": started_at,
+                        "created_by": user_id,
+                    }
+                    for _ in range(rng.randint(1, 4))
+                ],
+                "org_id": org_id,
+                "started_at": started_at,
+                "updates": [
+                    {
+                        "message": _text(rng, args.update_bytes),
+                        "created_at": started_at + timedelta(minutes=u * 10),
+                        "created_by": user_id,
+                        "created_by_username": "Benchmark Admin",
+                    }
+                    for u in range(args.updates)
+                ],
+                "created_at": started_at,
+                "created_by": user_id,
+                "created_by_username": "Benchmark Admin",
+            }
+        )
+    await database["incidents"].create_indexes(Incident.indexes())
+    for start in range(0, len(documents), 1000):
+        await database["incidents"].insert_many(documents[start : start + 1000])
+    return org_id
+
+
+# Bytes the server has sent so far, after compression; None without serverStatus access
+async def bytes_out(client: AsyncIOMotorClient) -> Optional[int]:
+    try:
+        status = await client.admin.command("serverStatus")
+    except Exception:
+        return None
+    network = status.get("network", {})
+    return network.get("physicalBytesOut", network.get("bytesOut"))
+
+
+async def measure(
+    args: argparse.Namespace, name: str, database_name: str, org_id: ObjectId
+) -> Dict[str, Any]:
+    options = {} if name == "none" else {"compressors": name}
+    client = AsyncIOMotorClient(args.mongo_url, **options)
+    collections.use_database(client[database_name])
+    try:
+        for _ in range(args.warmup):
+            await Incident.find_all({"org_id": org_id}, limit=args.limit)
+        before = await bytes_out(client)
+        latencies = []
+        count = 0
+        for _ in range(args.queries):
+            start = time.perf_counter()
+            incidents = await Incident.find_all({"org_id": org_id}, limit=args.limit)
+            latencies.append(time.perf_counter() - start)
+            count = len(incidents)
+        after = await bytes_out(client)
+    finally:
+        client.close()
+    latencies.sort()
+    # serverStatus replies are counted too, they are small next to the lists
+    per_query = (after - before) / args.queries if before is not None and after is not None else None
+    return {
+        "compressor": name,
+        "incidents": count,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "kb_per_query": round(per_query / 1024, 1) if per_query is not None else None,
+    }
+
+
+async def main(args: argparse.Namespace) -> int:
+    names = ["none"] + [name for name in args.compressors if name != "none"]
+    missing = [name for name in names if not compressor_available(name)]
+    for name in missing:
+        print(f"Skipping {name}: pip install {COMPRESSOR_MODULES[name]}")
+    names = [name for name in names if name not in missing]
+
+    database_name = f"bench_{uuid.uuid4().hex[:8]}"
+    seed_client = AsyncIOMotorClient(args.mongo_url, serverSelectionTimeoutMS=5000)
+    try:
+        started = time.perf_counter()
+        org_id = await seed_incidents(seed_client[database_name], args)
+        stats = await seed_client[database_name].command("collStats", "incidents")
+        print(
+            f"Seeded {args.incidents} incidents, {stats['avgObjSize'] / 1024:.1f} kB each, "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+        results = []
+        print(f"\n{'compressor':10} {'incidents':>9} {'p50 ms':>9} {'p99 ms':>9} {'kB/query':>9} {'vs none':>8}")
+        for name in names:
+            result = await measure(args, name, database_name, org_id)
+            baseline = results[0]["kb_per_query"] if results else None
+            ratio = (
+                f"{result['kb_per_query'] / baseline:.0%}"
+                if baseline and result["kb_per_query"] is not None
+                else "-"
+            )
+            results.append(result)
+            print(
+                f"{name:10} {result['incidents']:>9} {result['p50_ms']:>9} "
+                f"{result['p99_ms']:>9} {result['kb_per_query'] or '-':>9} {ratio:>8}"
+            )
+    finally:
+        await seed_client.drop_database(database_name)
+        seed_client.close()
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"args": vars(args), "results": results}, output, indent=2, default=str)
+        print(f"\nWrote results to {args.output}")
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument(
+        "--compressors",
+        type=lambda value: value.split(","),
+        default=["zlib", "snappy", "zstd"],
+        help="comma separated compressors compared against none",
+    )
+    parser.add_argument("--incidents", type=int, default=2000, help="incidents seeded")
+    parser.add_argument("--description-bytes", type=int, default=2000)
+    parser.add_argument("--updates", type=int, default=5, help="updates per incident")
+    parser.add_argument("--update-bytes", type=int, default=300)
+    parser.add_argument("--limit", type=int, default=100, help="incidents per list, the route returns 100")
+    parser.add_argument("--queries", type=int, default=50, help="measured queries per compressor")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,213 @@
+"""Health check scheduler benchmark against local stand-in servers
+
+Usage:
+  python -m benchmarks.health_check_bench
+  python -m benchmarks.health_check_bench --checks 5000 --interval 1 --concurrency 500
+  python -m benchmarks.health_check_bench --mongo-url mongodb://localhost:27017 --failing 0.2
+
+Starts keep-alive HTTP servers and a TCP server in a separate process, registers
+checks against them for one organization and runs the scheduler for --duration
+seconds. A share of the HTTP checks (--failing) gets 503s, so thresholds are crossed
+and service statuses go through the normal write path. Reports probes per second, the
+scheduler's CPU time per probe (probes per second one core sustains) and how late
+probes started; a growing lag means the concurrency limit or the core is saturated.
+
+Uses the in-memory database unless --mongo-url is given.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import time
+import uuid
+from typing import List, Optional
+
+from bson import ObjectId
+
+from benchmarks.routes import percentile
+
+HTTP_OK = b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nContent-Type: text/plain\r\n\r\nok"
+HTTP_FAIL = b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 4\r\nContent-Type: text/plain\r\n\r\nfail"
+
+
+# Answer HTTP/1.1 requests on one keep-alive connection, 503 for paths under /fail
+async def _serve_http(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            path = head.split(b" ", 2)[1]
+            writer.write(HTTP_FAIL if path.startswith(b"/fail") else HTTP_OK)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _serve_tcp(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    writer.close()
+
+
+# Run the stand-in servers until the process is terminated
+# Each HTTP port is a separate origin, like the distinct hosts of real checks
+def run_servers(http_ports: List[int], tcp_port: int, ready) -> None:
+    async def serve() -> None:
+        servers = [
+            await asyncio.start_server(_serve_http, "127.0.0.1", port, backlog=4096)
+            for port in http_ports
+        ]
+        servers.append(await asyncio.start_server(_serve_tcp, "127.0.0.1", tcp_port, backlog=4096))
+        ready.set()
+        await asyncio.gather(*(server.serve_forever() for server in servers))
+
+    asyncio.run(serve())
+
+
+async def main(args: argparse.Namespace) -> int:
+    # Settings are read on import, so set them before the app is imported
+    os.environ["HEALTH_CHECK_ALLOW_PRIVATE"] = "true"
+    database_name = f"bench_{uuid.uuid4().hex[:8]}"
+    os.environ["MONGO_URL"] = args.mongo_url or "mongodb://localhost:27017"
+    os.environ["MONGO_DB"] = database_name
+
+    from app.core.health_checks import HealthCheckScheduler
+    from app.db import collections
+    from app.models.health_check_model import CheckKind, HealthCheck
+    from app.models.service_model import Service, ServiceStatus
+    from benchmarks.stubs import in_memory_database, use_database
+
+    if args.mongo_url:
+        collections.connect()
+    else:
+        use_database(in_memory_database(database_name))
+
+    http_ports = [args.http_port + n for n in range(args.origins)]
+    tcp_port = args.http_port + args.origins
+    ready = multiprocessing.Event()
+    servers = multiprocessing.Process(
+        target=run_servers, args=(http_ports, tcp_port, ready), daemon=True
+    )
+    servers.start()
+    if not ready.wait(10):
+        sys.exit("Stand-in servers did not start")
+
+    try:
+        rng = random.Random(args.seed)
+        org_id, user_id = ObjectId(), ObjectId()
+        services = [
+            Service(
+                name=f"Service {n}",
+                org_id=org_id,
+                created_by=user_id,
+                created_by_username="bench",
+                status=ServiceStatus.OPERATIONAL,
+            )
+            for n in range(args.services)
+        ]
+        await Service.insert_many(services)
+        service_ids = [service.id for service in services]
+        kinds = [CheckKind(kind) for kind in args.kinds]
+        checks = []
+        for n in range(args.checks):
+            kind = kinds[n % len(kinds)]
+            failing = kind == CheckKind.HTTP and rng.random() < args.failing
+            target = (
+                f"http://127.0.0.1:{http_ports[n % len(http_ports)]}/{'fail' if failing else 'ok'}/{n}"
+                if kind == CheckKind.HTTP
+                else f"127.0.0.1:{tcp_port}"
+            )
+            checks.append(
+                HealthCheck(
+                    service_id=service_ids[n % len(service_ids)],
+                    org_id=org_id,
+                    kind=kind,
+                    target=target,
+                    interval=args.interval,
+                    timeout=args.timeout,
+                    failure_threshold=2,
+                    success_threshold=1,
+                    # As after a restart of the scheduler, only failing checks change state
+                    healthy=True,
+                    created_by=user_id,
+                )
+            )
+        await HealthCheck.insert_many(checks)
+        print(
+            f"Registered {args.checks} checks ({', '.join(args.kinds)}) on {args.services} "
+            f"services, every {args.interval}s"
+        )
+
+        lags: List[float] = []
+
+        # Record how late every probe started
+        class MeasuredScheduler(HealthCheckScheduler):
+            async def _probe(self, check_id, due, generation):
+                lags.append(asyncio.get_running_loop().time() - due)
+                await super()._probe(check_id, due, generation)
+
+        scheduler = MeasuredScheduler(
+            concurrency=args.concurrency, jitter=args.jitter, reload_interval=3600
+        )
+        task = asyncio.ensure_future(scheduler.run())
+        # Measuring starts after the failing checks were written, the in-memory
+        # database takes a while for that
+        await asyncio.sleep(args.warmup if args.warmup is not None else 2 * args.interval + 3)
+        probes, cpu, wall = scheduler.probes, time.process_time(), time.perf_counter()
+        lags.clear()
+        await asyncio.sleep(args.duration)
+        probes = scheduler.probes - probes
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+        lags.sort()
+        down = await Service.collection().count_documents(
+            {"org_id": org_id, "status": ServiceStatus.OUTAGE.value}
+        )
+        demand = args.checks / args.interval
+        print(f"\n{'probes/s':>9} {'demand/s':>9} {'cpu s':>7} {'probes/cpu s':>13} {'lag p50 ms':>11} {'lag p99 ms':>11}")
+        print(
+            f"{probes / wall:>9.0f} {demand:>9.0f} {cpu:>7.2f} {probes / cpu if cpu else 0:>13.0f} "
+            f"{percentile(lags, 50) * 1000:>11.1f} {percentile(lags, 99) * 1000:>11.1f}"
+        )
+        print(f"\nServices set to outage by failing checks: {down} of {args.services}")
+    finally:
+        servers.terminate()
+        if args.mongo_url:
+            await collections.get_client().drop_database(database_name)
+            collections.close()
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", help="use this mongod instead of the in-memory database")
+    parser.add_argument("--checks", type=int, default=2000)
+    parser.add_argument("--services", type=int, default=200)
+    parser.add_argument("--kinds", type=lambda value: value.split(","), default=["http", "tcp"])
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between probes of a check")
+    parser.add_argument("--timeout", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--failing", type=float, default=0.1, help="share of HTTP checks answered with 503")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds")
+    parser.add_argument(
+        "--warmup",
+        type=float,
+        help="seconds before measuring, by default until every check crossed its threshold",
+    )
+    parser.add_argument("--origins", type=int, default=16, help="HTTP servers the checks are spread over")
+    parser.add_argument("--http-port", type=int, default=18080, help="first port, the TCP server follows the HTTP ones")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
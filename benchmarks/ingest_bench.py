@@ -0,0 +1,188 @@
+"""Alert ingestion benchmark
+
+Usage:
+  python -m benchmarks.ingest_bench
+  python -m benchmarks.ingest_bench --orgs 20 --batch 1000 --requests 500
+  python -m benchmarks.ingest_bench --mongo-url mongodb://localhost:27017 --resolved 0.5
+
+Seeds services and an API key per organization, then posts Alertmanager payloads to
+/ingest/alerts through the app, lifespan included, so the pipeline flushes in the
+background while requests arrive. Every alert is one of --fingerprints alerts of a
+random service; a share of the notifications (--resolved) resolves it, the rest fire
+with a random severity. Reports alerts per second, the CPU time per alert, request
+latency and how long flushes took; flush time grows with the services alerting per
+flush, not with the number of alerts.
+
+Uses the in-memory database unless --mongo-url is given.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+
+from benchmarks.routes import percentile
+from benchmarks.stubs import install_firebase_stub
+
+SEVERITIES = ["critical", "warning"]
+
+
+def _payload(rng: random.Random, services: List[str], args: argparse.Namespace) -> Dict[str, Any]:
+    alerts = []
+    for _ in range(args.batch):
+        service = rng.choice(services)
+        fingerprint = f"{service}-{rng.randrange(args.fingerprints)}"
+        alerts.append(
+            {
+                "status": "resolved" if rng.random() < args.resolved else "firing",
+                "labels": {
+                    "alertname": "HighErrorRate",
+                    "service": service,
+                    "severity": rng.choice(SEVERITIES),
+                },
+                "annotations": {"summary": f"Error rate above 5% ({fingerprint})"},
+                "fingerprint": fingerprint,
+            }
+        )
+    return {"version": "4", "status": "firing", "alerts": alerts}
+
+
+async def main(args: argparse.Namespace) -> int:
+    # Stub Firebase and choose the database before the app is imported
+    install_firebase_stub()
+    database_name = f"bench_{uuid.uuid4().hex[:8]}"
+    os.environ["MONGO_URL"] = args.mongo_url or "mongodb://localhost:27017"
+    os.environ["MONGO_DB"] = database_name
+    os.environ["INGEST_FLUSH_INTERVAL"] = str(args.flush_interval)
+
+    import httpx
+
+    from app.core.alert_ingest import alert_pipeline
+    from app.core.api_keys import generate_api_key
+    from app.db import collections
+    from app.main import app
+    from app.models.api_key_model import ApiKey
+    from app.models.service_model import Service, ServiceStatus
+    from benchmarks.stubs import in_memory_database, use_database
+
+    if not args.mongo_url:
+        use_database(in_memory_database(database_name))
+
+    flushes: List[float] = []
+    flush = alert_pipeline.flush
+
+    # Time every flush of the pipeline
+    async def timed_flush() -> None:
+        start = time.perf_counter()
+        await flush()
+        flushes.append(time.perf_counter() - start)
+
+    alert_pipeline.flush = timed_flush  # type: ignore
+
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    try:
+        async with app.router.lifespan_context(app):
+            tenants = []
+            for n in range(args.orgs):
+                org_id, user_id = ObjectId(), ObjectId()
+                services = [
+                    Service(
+                        name=f"service-{n}-{i}",
+                        org_id=org_id,
+                        created_by=user_id,
+                        created_by_username="bench",
+                        status=ServiceStatus.OPERATIONAL,
+                    )
+                    for i in range(args.services)
+                ]
+                await Service.insert_many(services)
+                key, prefix, key_hash = generate_api_key()
+                await ApiKey(
+                    org_id=org_id,
+                    name="bench",
+                    prefix=prefix,
+                    key_hash=key_hash,
+                    created_by=user_id,
+                    created_by_username="bench",
+                ).save()
+                tenants.append((key, [service.name for service in services]))
+            payloads = [
+                (key, _payload(rng, names, args))
+                for key, names in (rng.choice(tenants) for _ in range(args.requests))
+            ]
+            print(
+                f"Posting {args.requests} batches of {args.batch} alerts for {args.orgs} orgs "
+                f"x {args.services} services, {args.concurrency} at a time"
+            )
+
+            latencies: List[float] = []
+            totals: Dict[str, int] = {}
+            errors: Dict[int, int] = {}
+            queue = list(reversed(payloads))
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+                async def worker() -> None:
+                    while queue:
+                        key, payload = queue.pop()
+                        start = time.perf_counter()
+                        response = await client.post(
+                            "/ingest/alerts", json=payload, headers={"X-API-Key": key}
+                        )
+                        latencies.append(time.perf_counter() - start)
+                        if response.status_code != 202:
+                            errors[response.status_code] = errors.get(response.status_code, 0) + 1
+                            continue
+                        for result, count in response.json().items():
+                            totals[result] = totals.get(result, 0) + count
+
+                cpu, wall = time.process_time(), time.perf_counter()
+                await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+                await alert_pipeline.flush()
+                cpu = time.process_time() - cpu
+                wall = time.perf_counter() - wall
+    finally:
+        alert_pipeline.flush = flush  # type: ignore
+        if args.mongo_url:
+            await collections.get_client().drop_database(database_name)
+
+    alerts = args.requests * args.batch
+    latencies.sort()
+    flushes.sort()
+    print(
+        f"\n{'alerts/s':>9} {'alerts/cpu s':>13} {'req p50 ms':>11} {'req p99 ms':>11} "
+        f"{'flushes':>8} {'flush p50 ms':>13} {'flush max ms':>13}"
+    )
+    print(
+        f"{alerts / wall:>9.0f} {alerts / cpu if cpu else 0:>13.0f} "
+        f"{percentile(latencies, 50) * 1000:>11.1f} {percentile(latencies, 99) * 1000:>11.1f} "
+        f"{len(flushes):>8} {percentile(flushes, 50) * 1000:>13.1f} "
+        f"{(flushes[-1] if flushes else 0) * 1000:>13.1f}"
+    )
+    print(f"\nAlerts by result: {totals}" + (f", errors: {errors}" if errors else ""))
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", help="use this mongod instead of the in-memory database")
+    parser.add_argument("--orgs", type=int, default=5)
+    parser.add_argument("--services", type=int, default=20, help="services per organization")
+    parser.add_argument("--fingerprints", type=int, default=10, help="distinct alerts per service")
+    parser.add_argument("--batch", type=int, default=500, help="alerts per request")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--resolved", type=float, default=0.3, help="share of resolved notifications")
+    parser.add_argument("--flush-interval", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
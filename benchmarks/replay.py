@@ -0,0 +1,299 @@
+"""Replay recorded traffic against a local instance
+
+Usage:
+  TRAFFIC_RECORD_PATH=traffic.jsonl uvicorn app.main:app      # record in production
+  python -m benchmarks.replay traffic.jsonl --in-memory --speed 1,2,4
+
+Re-drives the request mix captured by the traffic recorder middleware at one or more
+speed multipliers, keeping the recorded inter-arrival times divided by the speed.
+Each recorded tenant is mapped to a seeded tenant and each pseudonymized identifier
+to a seeded document of that tenant, so hot entities stay hot. Request bodies are not
+recorded: writes get a synthetic body from the route benchmark's endpoint builders.
+Deletes are skipped so the seeded data survives the replay.
+
+The server is started through benchmarks.serve unless --url is given. For every
+speed the tool reports per-route latency and errors, and how far requests started
+behind schedule, which grows once the server no longer keeps up.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.routes import ENDPOINTS, Endpoint, percentile
+from benchmarks.seed import Tenant
+from benchmarks.serve import raise_file_limit, start_server
+from benchmarks.stubs import issue_token
+
+# Seeded documents standing in for each kind of recorded identifier
+ID_POOLS = {
+    "incident_id": ("incident_ids",),
+    "service_id": ("service_ids",),
+    "team_id": ("team_ids",),
+    "user_id": ("user_ids",),
+    "entity_id": ("service_ids", "incident_ids"),
+}
+
+
+# Read recorded requests, oldest first
+def load_records(path: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    with open(path) as record_file:
+        records = [json.loads(line) for line in record_file if line.strip()]
+    records.sort(key=lambda record: record["t"])
+    return records[:limit] if limit else records
+
+
+# Maps recorded tenants and identifiers onto the seeded dataset
+class TenantMapper:
+    def __init__(self, tenants: List[Tenant], seed: int):
+        self.tenants = tenants
+        self.rng = random.Random(seed)
+        self._tenants: Dict[Optional[str], Tenant] = {}
+        self._ids: Dict[Tuple[str, str, str], str] = {}
+
+    def tenant(self, recorded: Optional[str]) -> Tenant:
+        if recorded not in self._tenants:
+            self._tenants[recorded] = self.tenants[len(self._tenants) % len(self.tenants)]
+        return self._tenants[recorded]
+
+    # Seeded value for a recorded parameter, None when it cannot be mapped
+    def value(self, tenant: Tenant, name: str, recorded: str) -> Optional[str]:
+        if not recorded.startswith("h:"):
+            return recorded
+        if name == "org_id":
+            return str(tenant.org_id)
+        if name == "org_slug":
+            return tenant.org_slug
+        if name == "domain":
+            return tenant.domain
+        pools = ID_POOLS.get(name)
+        if not pools:
+            return None
+        key = (tenant.org_slug, name, recorded)
+        if key not in self._ids:
+            candidates = [str(i) for pool in pools for i in getattr(tenant, pool)]
+            if not candidates:
+                return None
+            self._ids[key] = self.rng.choice(candidates)
+        return self._ids[key]
+
+
+# Endpoint builders of the route benchmark for writes, keyed by (method, route)
+def write_builders(tenant: Tenant) -> Dict[Tuple[str, str], Endpoint]:
+    builders = {}
+    rng = random.Random(0)
+    for endpoint in ENDPOINTS:
+        method, url, body = endpoint.request(tenant, rng)
+        if method != "GET":
+            builders[(method, url.split("?")[0])] = endpoint
+    return builders
+
+
+# Turn a record into (method, url, json body), None when it cannot be replayed
+def build_request(
+    record: Dict[str, Any],
+    mapper: TenantMapper,
+    builders: Dict[Tuple[str, str], Endpoint],
+    rng: random.Random,
+) -> Optional[Tuple[Tenant, str, str, Any]]:
+    method, route = record["method"], record["route"]
+    if route == "unmatched" or method == "DELETE":
+        return None
+    tenant = mapper.tenant(record.get("tenant"))
+    if method != "GET":
+        endpoint = builders.get((method, route))
+        if endpoint is None:
+            return None
+        return (tenant, *endpoint.request(tenant, rng))
+    path = route
+    for name, recorded in record.get("path_params", {}).items():
+        value = mapper.value(tenant, name, recorded)
+        if value is None:
+            return None
+        path = path.replace("{" + name + "}", value)
+    query = {}
+    for name, recorded in record.get("query", {}).items():
+        value = mapper.value(tenant, name, recorded)
+        if value is not None:
+            query[name] = value
+    url = str(httpx.URL(path, params=query)) if query else path
+    return tenant, method, url, None
+
+
+# Replay all records once at the given speed and summarise the run
+async def replay(
+    http: httpx.AsyncClient,
+    records: List[Dict[str, Any]],
+    mapper: TenantMapper,
+    builders: Dict[Tuple[str, str], Endpoint],
+    speed: float,
+    max_in_flight: int,
+    seed: int,
+) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    tokens: Dict[str, str] = {}
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, Dict[str, int]] = defaultdict(dict)
+    lags: List[float] = []
+    skipped = 0
+    in_flight = asyncio.Semaphore(max_in_flight)
+    tasks = []
+
+    async def send(route: str, tenant: Tenant, method: str, url: str, body: Any):
+        if tenant.admin_email not in tokens:
+            tokens[tenant.admin_email] = issue_token(tenant.admin_email)
+        headers = {"Authorization": f"Bearer {tokens[tenant.admin_email]}"}
+        start = time.perf_counter()
+        try:
+            response = await http.request(method, url, json=body, headers=headers)
+            key = str(response.status_code) if response.status_code >= 400 else None
+        except httpx.HTTPError as e:
+            key = type(e).__name__
+        finally:
+            in_flight.release()
+        latencies[route].append(time.perf_counter() - start)
+        if key:
+            errors[route][key] = errors[route].get(key, 0) + 1
+
+    first = records[0]["t"]
+    started = time.perf_counter()
+    for record in records:
+        request = build_request(record, mapper, builders, rng)
+        if request is None:
+            skipped += 1
+            continue
+        scheduled = (record["t"] - first) / speed
+        delay = scheduled - (time.perf_counter() - started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        # Waiting for a free slot shows up as lag, the server is not keeping up
+        await in_flight.acquire()
+        lags.append(max(0.0, time.perf_counter() - started - scheduled))
+        route = f"{record['method']} {record['route']}"
+        tasks.append(asyncio.create_task(send(route, *request)))
+    await asyncio.gather(*tasks)
+    duration = time.perf_counter() - started
+
+    lags.sort()
+    recorded_span = (records[-1]["t"] - first) / speed
+    routes = {}
+    for route, values in sorted(latencies.items(), key=lambda item: -len(item[1])):
+        values.sort()
+        routes[route] = {
+            "requests": len(values),
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+            "errors": errors.get(route, {}),
+        }
+    sent = len(tasks)
+    return {
+        "speed": speed,
+        "requests": sent,
+        "skipped": skipped,
+        "target_rps": round(sent / recorded_span, 1) if recorded_span else None,
+        "achieved_rps": round(sent / duration, 1) if duration else None,
+        "lag_p50_ms": round(percentile(lags, 50) * 1000, 3),
+        "lag_p99_ms": round(percentile(lags, 99) * 1000, 3),
+        "routes": routes,
+    }
+
+
+def print_run(run: Dict[str, Any]) -> None:
+    print(
+        f"\nspeed x{run['speed']}: {run['requests']} requests ({run['skipped']} skipped), "
+        f"target {run['target_rps']} rps, achieved {run['achieved_rps']} rps, "
+        f"start lag p50 {run['lag_p50_ms']} ms, p99 {run['lag_p99_ms']} ms"
+    )
+    print(f"{'route':48} {'requests':>8} {'p50 ms':>9} {'p99 ms':>9} errors")
+    for route, result in run["routes"].items():
+        print(
+            f"{route:48} {result['requests']:>8} {result['p50_ms']:>9} "
+            f"{result['p99_ms']:>9} {result['errors'] or ''}"
+        )
+
+
+async def main(args: argparse.Namespace) -> int:
+    raise_file_limit()
+    records = load_records(args.records, args.limit)
+    if not records:
+        sys.exit(f"No records in {args.records}")
+    recorded_tenants = {record.get("tenant") for record in records}
+    print(f"Loaded {len(records)} records from {len(recorded_tenants)} tenants")
+
+    server = None
+    tenant_file = args.tenant_file
+    if not args.url:
+        tenant_file = tempfile.mkstemp(suffix=".json")[1]
+        server = start_server(
+            tenant_file,
+            "--port",
+            str(args.port),
+            "--mongo-url",
+            args.mongo_url,
+            "--orgs",
+            str(min(len(recorded_tenants), args.max_tenants)),
+            *(["--in-memory"] if args.in_memory else []),
+        )
+    base_url = args.url or f"http://127.0.0.1:{args.port}"
+    try:
+        with open(tenant_file) as handle:
+            tenants = [Tenant(**tenant) for tenant in json.load(handle)["tenants"]]
+        mapper = TenantMapper(tenants, args.seed)
+        builders = write_builders(tenants[0])
+        runs = []
+        limits = httpx.Limits(max_connections=args.max_in_flight)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as http:
+            for speed in args.speed:
+                run = await replay(
+                    http, records, mapper, builders, speed, args.max_in_flight, args.seed
+                )
+                print_run(run)
+                runs.append(run)
+        if args.output:
+            with open(args.output, "w") as output:
+                json.dump({"records": args.records, "runs": runs}, output, indent=2)
+            print(f"\nWrote results to {args.output}")
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+            os.unlink(tenant_file)
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("records", help="file written by the traffic recorder middleware")
+    parser.add_argument("--url", help="base URL of a running benchmarks.serve, started locally when omitted")
+    parser.add_argument("--tenant-file", help="tenant file written by benchmarks.serve, required with --url")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--in-memory", action="store_true", help="use mongomock-motor instead of mongod")
+    parser.add_argument(
+        "--speed",
+        type=lambda value: [float(speed) for speed in value.split(",")],
+        default=[1.0],
+        help="comma separated speed multipliers, e.g. 1,2,4",
+    )
+    parser.add_argument("--limit", type=int, help="replay only the first N records")
+    parser.add_argument("--max-tenants", type=int, default=50, help="tenants seeded for the replay")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="concurrent requests")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+    if args.url and not args.tenant_file:
+        parser.error("--url requires --tenant-file")
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
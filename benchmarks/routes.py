@@ -0,0 +1,467 @@
+"""Route-level benchmark driving every router in-process
+
+Usage:
+  python -m benchmarks.routes --in-memory --output results.json
+  python -m benchmarks.routes --mongo-url mongodb://localhost:27017 --compare baseline.json
+
+The app runs in-process behind httpx's ASGI transport with Firebase replaced by
+locally signed tokens. Synthetic tenants are seeded into a throwaway database,
+then every endpoint is driven with a fixed number of requests at a fixed
+concurrency. RPS and latency percentiles are reported per endpoint and can be
+stored as JSON and compared against a previous run.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import sys
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.stubs import install_firebase_stub, issue_token
+
+
+# A benchmarked endpoint
+# request builds (method, url, json body) for a randomly picked tenant
+# in_memory is False for routes using operators mongomock does not implement
+@dataclass
+class Endpoint:
+    name: str
+    request: Callable[[Any, random.Random], tuple]
+    auth: bool = True
+    in_memory: bool = True
+
+
+def incident_body(tenant, rng: random.Random) -> Dict[str, Any]:
+    service_id = str(rng.choice(tenant.service_ids))
+    now = datetime.utcnow().isoformat()
+    return {
+        "title": "Benchmark incident",
+        "description": "Created by the route benchmark",
+        "status": "investigating",
+        "severity": "major",
+        "affected_services": [
+            {"service_id": service_id, "service_name": "Service", "status": "outage"}
+        ],
+        "org_id": str(tenant.org_id),
+        "started_at": now,
+        "resolved_at": None,
+        "updates": [],
+    }
+
+
+def incident_update_body(tenant, rng: random.Random) -> Dict[str, Any]:
+    now = datetime.utcnow().isoformat()
+    body = incident_body(tenant, rng)
+    body["incident_id"] = str(rng.choice(tenant.incident_ids))
+    body["status"] = "monitoring"
+    body["affected_services"] = [
+        {**service, "created_at": now} for service in body["affected_services"]
+    ]
+    return body
+
+
+# Every endpoint driven by the benchmark, grouped by router
+ENDPOINTS: List[Endpoint] = [
+    # org
+    Endpoint("org.get-all-orgs", lambda t, r: ("GET", "/org/get-all-orgs", None)),
+    Endpoint(
+        "org.get-org-by-domain",
+        lambda t, r: ("GET", f"/org/get-org-by-domain?domain={t.domain}", None),
+        auth=False,
+    ),
+    Endpoint(
+        "org.create-org",
+        lambda t, r: (
+            "POST",
+            "/org/create-org",
+            {
+                "name": "Benchmark Org",
+                "domain": f"{uuid.uuid4().hex}.example.com",
+                "org_slug": uuid.uuid4().hex,
+            },
+        ),
+    ),
+    # user
+    Endpoint(
+        "user.sync-user-to-db",
+        lambda t, r: (
+            "POST",
+            "/user/sync-user-to-db",
+            {"email": t.admin_email, "full_name": "Benchmark Admin"},
+        ),
+        auth=False,
+    ),
+    Endpoint(
+        "user.update-current-org",
+        lambda t, r: ("POST", f"/user/update-current-org?org_id={t.org_id}", None),
+    ),
+    Endpoint(
+        "user.fetch-user",
+        lambda t, r: ("GET", f"/user/{r.choice(t.user_ids)}", None),
+    ),
+    Endpoint(
+        "user.org-users",
+        lambda t, r: ("GET", f"/user/org/{t.org_id}/users", None),
+    ),
+    Endpoint(
+        "user.create-user-in-org",
+        lambda t, r: (
+            "POST",
+            f"/user/create-user-in-org?org_id={t.org_id}",
+            {"email": f"{uuid.uuid4().hex}@example.com", "full_name": "New User"},
+        ),
+    ),
+    Endpoint(
+        "user.bulk-create-users-in-org",
+        lambda t, r: (
+            "POST",
+            f"/user/bulk-create-users-in-org?org_id={t.org_id}",
+            [
+                {"email": f"{uuid.uuid4().hex}@example.com", "full_name": "New User"}
+                for _ in range(50)
+            ],
+        ),
+    ),
+    # team
+    Endpoint(
+        "team.create-team",
+        lambda t, r: (
+            "POST",
+            "/team/create-team",
+            {
+                "name": "Benchmark Team",
+                "org_id": str(t.org_id),
+                "member_ids": [str(user_id) for user_id in t.user_ids[:3]],
+            },
+        ),
+    ),
+    Endpoint(
+        "team.get-all-teams",
+        lambda t, r: ("GET", f"/team/get-all-teams?org_id={t.org_id}", None),
+    ),
+    Endpoint(
+        "team.fetch-team", lambda t, r: ("GET", f"/team/{r.choice(t.team_ids)}", None)
+    ),
+    # service
+    Endpoint(
+        "service.create-service",
+        lambda t, r: (
+            "POST",
+            "/service/create-service",
+            {
+                "name": "Benchmark Service",
+                "description": "Created by the route benchmark",
+                "status": "operational",
+                "org_id": str(t.org_id),
+            },
+        ),
+    ),
+    Endpoint(
+        "service.update-service",
+        lambda t, r: (
+            "POST",
+            "/service/update-service",
+            {
+                "service_id": str(r.choice(t.service_ids)),
+                "name": "Benchmark Service",
+                "description": "Updated by the route benchmark",
+                "status": r.choice(["operational", "degraded_performance", "outage"]),
+                "org_id": str(t.org_id),
+            },
+        ),
+    ),
+    Endpoint(
+        "service.get-all-services",
+        lambda t, r: ("GET", f"/service/get-all-services?org_id={t.org_id}", None),
+    ),
+    Endpoint(
+        "service.fetch-service",
+        lambda t, r: ("GET", f"/service/{r.choice(t.service_ids)}", None),
+    ),
+    Endpoint(
+        "service.batch-update-status",
+        lambda t, r: (
+            "POST",
+            "/service/batch-update-status",
+            {
+                "updates": [
+                    {
+                        "service_id": str(service_id),
+                        "status": r.choice(["operational", "degraded_performance", "outage"]),
+                    }
+                    for service_id in r.sample(t.service_ids, min(20, len(t.service_ids)))
+                ]
+            },
+        ),
+    ),
+    Endpoint(
+        "service.get-services-by-ids",
+        lambda t, r: (
+            "GET",
+            "/service/get-services-by-ids?ids="
+            + ",".join(str(i) for i in r.sample(t.service_ids, min(20, len(t.service_ids)))),
+            None,
+        ),
+    ),
+    # incident
+    Endpoint(
+        "incident.create-incident",
+        lambda t, r: ("POST", "/incident/create-incident", incident_body(t, r)),
+    ),
+    Endpoint(
+        "incident.update-incident",
+        lambda t, r: ("POST", "/incident/update-incident", incident_update_body(t, r)),
+    ),
+    Endpoint(
+        "incident.get-all-incidents",
+        lambda t, r: ("GET", f"/incident/get-all-incidents?org_id={t.org_id}", None),
+    ),
+    Endpoint(
+        "incident.get-incident-analytics",
+        lambda t, r: (
+            "GET",
+            f"/incident/get-incident-analytics?org_id={t.org_id}",
+            None,
+        ),
+        # The aggregation groups by $dateTrunc
+        in_memory=False,
+    ),
+    Endpoint(
+        "incident.fetch-incident",
+        lambda t, r: ("GET", f"/incident/{r.choice(t.incident_ids)}", None),
+    ),
+    Endpoint(
+        "incident.get-incidents-by-ids",
+        lambda t, r: (
+            "GET",
+            "/incident/get-incidents-by-ids?ids="
+            + ",".join(str(i) for i in r.sample(t.incident_ids, min(20, len(t.incident_ids)))),
+            None,
+        ),
+    ),
+    # status
+    Endpoint(
+        "status.get-org-status",
+        lambda t, r: ("GET", f"/status/get-org-status?org_slug={t.org_slug}", None),
+        auth=False,
+    ),
+    # log
+    Endpoint("log.get-all-logs", lambda t, r: ("GET", "/log/get-all-logs", None)),
+    Endpoint(
+        "log.get-logs-by-org",
+        lambda t, r: ("GET", f"/log/get-logs-by-org?org_id={t.org_id}", None),
+    ),
+    Endpoint(
+        "log.get-logs-by-entity",
+        lambda t, r: (
+            "GET",
+            f"/log/get-logs-by-org?org_id={t.org_id}&entity_id={r.choice(t.service_ids)}",
+            None,
+        ),
+    ),
+]
+
+
+# Nearest-rank percentile of sorted values
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+# Drive one endpoint and summarise its latencies
+async def run_endpoint(
+    client,
+    endpoint: Endpoint,
+    tenants: list,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    rng: random.Random,
+) -> Dict[str, Any]:
+    tokens = {tenant.admin_email: issue_token(tenant.admin_email) for tenant in tenants}
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    remaining = warmup + requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            measured = remaining < requests
+            tenant = rng.choice(tenants)
+            method, url, body = endpoint.request(tenant, rng)
+            headers = (
+                {"Authorization": f"Bearer {tokens[tenant.admin_email]}"}
+                if endpoint.auth
+                else {}
+            )
+            start = time.perf_counter()
+            response = await client.request(method, url, json=body, headers=headers)
+            elapsed = time.perf_counter() - start
+            if not measured:
+                continue
+            latencies.append(elapsed)
+            if response.status_code >= 400:
+                key = str(response.status_code)
+                errors[key] = errors.get(key, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    measured_wall = wall * requests / (requests + warmup) if requests else wall
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / measured_wall, 1) if measured_wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+    }
+
+
+# Compare results against a baseline run
+# Returns the endpoints whose p50 latency regressed by more than the threshold
+def compare(
+    results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], threshold: float
+) -> List[str]:
+    regressions = []
+    print(f"\n{'endpoint':36} {'p50 base':>10} {'p50 now':>10} {'change':>8}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or not base["p50_ms"]:
+            continue
+        change = result["p50_ms"] / base["p50_ms"] - 1
+        marker = " !" if change > threshold else ""
+        print(
+            f"{name:36} {base['p50_ms']:>10.3f} {result['p50_ms']:>10.3f} "
+            f"{change:>+7.1%}{marker}"
+        )
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+async def main(args: argparse.Namespace) -> int:
+    # Stub Firebase and choose the database before the app is imported
+    install_firebase_stub()
+    database_name = f"bench_{uuid.uuid4().hex[:8]}"
+    os.environ["MONGO_URL"] = args.mongo_url
+    os.environ["MONGO_DB"] = database_name
+
+    import httpx
+
+    from app.main import app
+    from benchmarks.seed import SeedScale, seed_tenants
+    from benchmarks.stubs import in_memory_database, use_database
+
+    if args.in_memory:
+        use_database(in_memory_database(database_name))
+    from app.db import collections
+
+    scale = SeedScale(
+        orgs=args.orgs,
+        users_per_org=args.users,
+        services_per_org=args.services,
+        incidents_per_org=args.incidents,
+        logs_per_org=args.logs,
+    )
+    seed_started = time.perf_counter()
+    tenants = await seed_tenants(scale, seed=args.seed)
+    print(f"Seeded {len(tenants)} tenants in {time.perf_counter() - seed_started:.1f}s")
+
+    pattern = re.compile(args.endpoints) if args.endpoints else None
+    endpoints = [e for e in ENDPOINTS if not pattern or pattern.search(e.name)]
+    if args.in_memory:
+        unsupported = [e.name for e in endpoints if not e.in_memory]
+        if unsupported:
+            print(f"Skipping endpoints unsupported in memory: {', '.join(unsupported)}")
+        endpoints = [e for e in endpoints if e.in_memory]
+    rng = random.Random(args.seed)
+    results: Dict[str, Dict[str, Any]] = {}
+    # Unhandled exceptions count as 500s instead of aborting the run
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    try:
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                print(f"\n{'endpoint':36} {'rps':>8} {'p50 ms':>9} {'p99 ms':>9} errors")
+                for endpoint in endpoints:
+                    result = await run_endpoint(
+                        client,
+                        endpoint,
+                        tenants,
+                        args.requests,
+                        args.concurrency,
+                        args.warmup,
+                        rng,
+                    )
+                    results[endpoint.name] = result
+                    print(
+                        f"{endpoint.name:36} {result['rps']:>8} {result['p50_ms']:>9} "
+                        f"{result['p99_ms']:>9} {result['errors'] or ''}"
+                    )
+    finally:
+        if not args.in_memory and not args.keep_data:
+            await collections.get_client().drop_database(database_name)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": "in-memory" if args.in_memory else args.mongo_url,
+            "scale": asdict(scale),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"\nWrote results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} endpoint(s) regressed: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--in-memory", action="store_true", help="use mongomock-motor instead of mongod")
+    parser.add_argument("--keep-data", action="store_true", help="keep the seeded database")
+    parser.add_argument("--orgs", type=int, default=10)
+    parser.add_argument("--users", type=int, default=5, help="users per org")
+    parser.add_argument("--services", type=int, default=20, help="services per org")
+    parser.add_argument("--incidents", type=int, default=50, help="incidents per org")
+    parser.add_argument("--logs", type=int, default=200, help="log entries per org")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--endpoints", help="regex selecting endpoints, e.g. '^status\\.'")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p50 regression")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
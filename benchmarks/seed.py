@@ -0,0 +1,198 @@
+# Import necessary modules
+# dataclasses for describing the seeded tenants
+# random for synthetic data
+# Custom models, inserted in bulk straight into their collections
+
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+
+from app.models.incident_model import (
+    AffectedService,
+    Incident,
+    IncidentSeverity,
+    IncidentStatus,
+    IncidentUpdate,
+)
+from app.models.log_model import ChangeType, EntityType, LogEntry
+from app.models.org_model import Organization
+from app.models.service_model import Service, ServiceStatus
+from app.models.team_model import Team, TeamMember
+from app.models.user_model import OrgMembership, User, UserRole
+
+
+# Size of the synthetic dataset
+@dataclass
+class SeedScale:
+    orgs: int = 10
+    users_per_org: int = 5
+    services_per_org: int = 20
+    incidents_per_org: int = 50
+    logs_per_org: int = 200
+    teams_per_org: int = 3
+
+
+# IDs of the documents seeded for one tenant
+@dataclass
+class Tenant:
+    org_id: ObjectId
+    org_slug: str
+    domain: str
+    admin_email: str
+    user_ids: List[ObjectId] = field(default_factory=list)
+    service_ids: List[ObjectId] = field(default_factory=list)
+    incident_ids: List[ObjectId] = field(default_factory=list)
+    team_ids: List[ObjectId] = field(default_factory=list)
+
+
+def _documents(models) -> list:
+    return [model.dict(by_alias=True, exclude_none=True) for model in models]
+
+
+# Seed one tenant and return the IDs of its documents
+async def seed_tenant(index: int, scale: SeedScale, rng: random.Random) -> Tenant:
+    slug = f"bench-org-{index}"
+    tenant = Tenant(
+        org_id=ObjectId(),
+        org_slug=slug,
+        domain=f"{slug}.example.com",
+        admin_email=f"admin@{slug}.example.com",
+    )
+    admin_id = ObjectId()
+    membership = OrgMembership(org_id=tenant.org_id, org_slug=slug, role=UserRole.ADMIN)
+
+    org = Organization(
+        _id=tenant.org_id,
+        name=f"Benchmark Org {index}",
+        domain=tenant.domain,
+        org_slug=slug,
+        created_by=admin_id,
+        created_by_username="Benchmark Admin",
+    )
+    await Organization.collection().insert_one(org.dict(by_alias=True, exclude_none=True))
+
+    users = [
+        User(
+            _id=admin_id if n == 0 else ObjectId(),
+            email=tenant.admin_email if n == 0 else f"user{n}@{slug}.example.com",
+            full_name="Benchmark Admin" if n == 0 else f"Benchmark User {n}",
+            role=UserRole.ADMIN if n == 0 else UserRole.MEMBER,
+            org_memberships=[membership],
+            current_org=membership,
+        )
+        for n in range(max(scale.users_per_org, 1))
+    ]
+    await User.collection().insert_many(_documents(users))
+    tenant.user_ids = [user.id for user in users]
+
+    services = [
+        Service(
+            _id=ObjectId(),
+            name=f"Service {n}",
+            description=f"Synthetic service {n} of {slug}",
+            status=rng.choice(list(ServiceStatus)),
+            org_id=tenant.org_id,
+            created_by=admin_id,
+            created_by_username="Benchmark Admin",
+        )
+        for n in range(scale.services_per_org)
+    ]
+    if services:
+        await Service.collection().insert_many(_documents(services))
+    tenant.service_ids = [service.id for service in services]
+
+    now = datetime.utcnow()
+    incidents = []
+    for n in range(scale.incidents_per_org):
+        started_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+        status = rng.choice(list(IncidentStatus))
+        affected = rng.sample(services, k=min(len(services), rng.randint(1, 3)))
+        incidents.append(
+            Incident(
+                _id=ObjectId(),
+                title=f"Incident {n}",
+                description=f"Synthetic incident {n} of {slug}",
+                status=status,
+                severity=rng.choice(list(IncidentSeverity)),
+                affected_services=[
+                    AffectedService(
+                        service_id=service.id,
+                        service_name=service.name,
+                        status=ServiceStatus.OUTAGE,
+                    )
+                    for service in affected
+                ],
+                org_id=tenant.org_id,
+                started_at=started_at,
+                resolved_at=(
+                    started_at + timedelta(minutes=rng.randint(5, 600))
+                    if status == IncidentStatus.RESOLVED
+                    else None
+                ),
+                updates=[
+                    IncidentUpdate(
+                        message=f"Update {u}",
+                        created_by=admin_id,
+                        created_by_username="Benchmark Admin",
+                    )
+                    for u in range(rng.randint(0, 4))
+                ],
+                created_by=admin_id,
+                created_by_username="Benchmark Admin",
+            )
+        )
+    if incidents:
+        await Incident.collection().insert_many(_documents(incidents))
+    tenant.incident_ids = [incident.id for incident in incidents]
+
+    teams = [
+        Team(
+            _id=ObjectId(),
+            name=f"Team {n}",
+            org_id=tenant.org_id,
+            members=[
+                TeamMember(
+                    user_id=user.id,
+                    user_name=user.full_name,
+                    user_email=user.email,
+                    role=UserRole.MEMBER,
+                )
+                for user in users[:3]
+            ],
+            created_by=admin_id,
+        )
+        for n in range(scale.teams_per_org)
+    ]
+    if teams:
+        await Team.collection().insert_many(_documents(teams))
+    tenant.team_ids = [team.id for team in teams]
+
+    entities = [(EntityType.SERVICE, service.id) for service in services] + [
+        (EntityType.INCIDENT, incident.id) for incident in incidents
+    ]
+    logs = []
+    for n in range(scale.logs_per_org if entities else 0):
+        entity_type, entity_id = rng.choice(entities)
+        logs.append(
+            LogEntry(
+                entity_id=entity_id,
+                entity_type=entity_type,
+                change_type=rng.choice(list(ChangeType)),
+                changes={"status": "operational"},
+                org_id=tenant.org_id,
+                created_by=rng.choice(tenant.user_ids),
+                created_at=now - timedelta(minutes=n),
+            )
+        )
+    if logs:
+        await LogEntry.collection().insert_many(_documents(logs))
+    return tenant
+
+
+# Seed every tenant, returning them in order
+async def seed_tenants(scale: SeedScale, seed: int = 1) -> List[Tenant]:
+    rng = random.Random(seed)
+    return [await seed_tenant(index, scale, rng) for index in range(scale.orgs)]
@@ -0,0 +1,116 @@
+"""Run the app under uvicorn with the benchmark stand-ins
+
+Usage:
+  python -m benchmarks.serve --port 8000 --in-memory --tenant-file /tmp/tenants.json
+
+Firebase is stubbed so benchmark clients can sign their own tokens, synthetic
+tenants are seeded before the server starts accepting connections, and the seeded
+tenants are written as JSON for the load tools driving the server.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import asdict
+from typing import List, Optional
+
+from benchmarks.stubs import install_firebase_stub
+
+
+# Raise the open file limit to its hard limit, each websocket holds a descriptor
+def raise_file_limit() -> int:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+# Start this module in a subprocess and wait for it to write its tenants
+# options are passed on as command line arguments
+def start_server(tenant_file: str, *options: str) -> subprocess.Popen:
+    command = [sys.executable, "-m", "benchmarks.serve", "--tenant-file", tenant_file, *options]
+    server = subprocess.Popen(command)
+    deadline = time.time() + 60
+    while not os.path.getsize(tenant_file):
+        if server.poll() is not None or time.time() > deadline:
+            server.kill()
+            sys.exit("The benchmark server did not start")
+        time.sleep(0.1)
+    return server
+
+
+async def serve(args: argparse.Namespace) -> None:
+    # Stub Firebase and choose the database before the app is imported
+    install_firebase_stub()
+    database_name = f"bench_{uuid.uuid4().hex[:8]}"
+    os.environ["MONGO_URL"] = args.mongo_url
+    os.environ["MONGO_DB"] = database_name
+
+    import uvicorn
+
+    from app.main import app
+    from benchmarks.seed import SeedScale, seed_tenants
+    from benchmarks.stubs import in_memory_database, use_database
+
+    if args.in_memory:
+        use_database(in_memory_database(database_name))
+    from app.db import collections
+
+    # Seed on the serving loop, Motor binds its client to the first loop using it
+    scale = SeedScale(
+        orgs=args.orgs,
+        services_per_org=args.services,
+        incidents_per_org=args.incidents,
+    )
+    tenants = await seed_tenants(scale)
+    config = uvicorn.Config(
+        app,
+        host=args.host,
+        port=args.port,
+        ws=args.ws,
+        backlog=args.backlog,
+        log_level=args.log_level,
+    )
+    server = uvicorn.Server(config)
+    try:
+        serving = asyncio.create_task(server.serve())
+        while not server.started and not serving.done():
+            await asyncio.sleep(0.05)
+        if args.tenant_file:
+            with open(args.tenant_file, "w") as tenant_file:
+                json.dump(
+                    {"pid": os.getpid(), "tenants": [asdict(t) for t in tenants]},
+                    tenant_file,
+                    default=str,
+                )
+        await serving
+    finally:
+        if not args.in_memory:
+            await collections.get_client().drop_database(database_name)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--in-memory", action="store_true", help="use mongomock-motor instead of mongod")
+    parser.add_argument("--orgs", type=int, default=1)
+    parser.add_argument("--services", type=int, default=20, help="services per org")
+    parser.add_argument("--incidents", type=int, default=20, help="incidents per org")
+    parser.add_argument("--ws", default="auto", help="uvicorn websocket implementation")
+    parser.add_argument("--backlog", type=int, default=4096)
+    parser.add_argument("--log-level", default="warning")
+    parser.add_argument("--tenant-file", help="write the seeded tenants as JSON to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    raise_file_limit()
+    asyncio.run(serve(parse_args()))
@@ -0,0 +1,157 @@
+"""Cold start benchmark
+
+Usage:
+  python -m benchmarks.startup_bench --in-memory --runs 10
+  python -m benchmarks.startup_bench --mongo-url mongodb://localhost:27017 --importtime 15
+
+Starts a fresh interpreter per run and measures, in that process:
+  import     importing app.main
+  startup    installing the Firebase stub and running the lifespan startup
+  first      the first authenticated request, including lazy imports and connections
+  second     the same request again, for comparison with a warm worker
+Seeding the request's data happens between startup and the first request and is
+not measured. --importtime lists the modules slowest to import, from -X importtime.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional
+
+PHASES = ("import", "startup", "first", "second")
+
+
+# Measure one cold start in this process, printing the timings as JSON
+async def child(args: argparse.Namespace) -> None:
+    os.environ["MONGO_URL"] = args.mongo_url
+    os.environ["MONGO_DB"] = f"bench_{uuid.uuid4().hex[:8]}"
+    timings: Dict[str, float] = {}
+
+    start = time.perf_counter()
+    from app.main import app
+
+    timings["import"] = time.perf_counter() - start
+
+    import httpx
+
+    from benchmarks.seed import SeedScale, seed_tenant
+    from benchmarks.stubs import (
+        in_memory_database,
+        install_firebase_stub,
+        issue_token,
+        use_database,
+    )
+    from app.db import collections
+
+    if args.in_memory:
+        use_database(in_memory_database(os.environ["MONGO_DB"]))
+
+    start = time.perf_counter()
+    # Stands in for init_firebase, which imports the Firebase auth module
+    install_firebase_stub()
+    async with app.router.lifespan_context(app):
+        timings["startup"] = time.perf_counter() - start
+        tenant = await seed_tenant(0, SeedScale(orgs=1), random.Random(1))
+        headers = {"Authorization": f"Bearer {issue_token(tenant.admin_email)}"}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for phase in ("first", "second"):
+                start = time.perf_counter()
+                response = await client.get(
+                    f"/service/get-all-services?org_id={tenant.org_id}", headers=headers
+                )
+                timings[phase] = time.perf_counter() - start
+                response.raise_for_status()
+        if not args.in_memory:
+            await collections.get_client().drop_database(os.environ["MONGO_DB"])
+    print(json.dumps(timings))
+
+
+# Parse -X importtime output into (cumulative microseconds, module), slowest first
+def slowest_imports(stderr: str, limit: int) -> List[tuple]:
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative), name.rstrip()))
+    modules.sort(reverse=True)
+    return modules[:limit]
+
+
+def run_child(args: argparse.Namespace, importtime: bool = False) -> subprocess.CompletedProcess:
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += [
+        "-m",
+        "benchmarks.startup_bench",
+        "--child",
+        "--mongo-url",
+        args.mongo_url,
+    ]
+    if args.in_memory:
+        command.append("--in-memory")
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"Benchmark run failed:\n{result.stderr[-4000:]}")
+    return result
+
+
+def main(args: argparse.Namespace) -> int:
+    runs: List[Dict[str, float]] = []
+    for _ in range(args.runs):
+        result = run_child(args)
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    print(f"{'phase':8} {'median ms':>10} {'min ms':>9} {'max ms':>9}")
+    summary = {}
+    for phase in PHASES:
+        values = [run[phase] * 1000 for run in runs]
+        summary[phase] = {
+            "median_ms": round(statistics.median(values), 1),
+            "min_ms": round(min(values), 1),
+            "max_ms": round(max(values), 1),
+        }
+        print(
+            f"{phase:8} {summary[phase]['median_ms']:>10} "
+            f"{summary[phase]['min_ms']:>9} {summary[phase]['max_ms']:>9}"
+        )
+
+    if args.importtime:
+        result = run_child(args, importtime=True)
+        print(f"\n{'cumulative ms':>13}  module")
+        for cumulative, name in slowest_imports(result.stderr, args.importtime):
+            print(f"{cumulative / 1000:>13.1f}  {name}")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"runs": runs, "summary": summary}, output, indent=2)
+        print(f"\nWrote results to {args.output}")
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--in-memory", action="store_true", help="use mongomock-motor instead of mongod")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes started")
+    parser.add_argument("--importtime", type=int, default=0, help="list the N slowest imports")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    if arguments.child:
+        asyncio.run(child(arguments))
+    else:
+        sys.exit(main(arguments))
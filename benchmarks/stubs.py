@@ -0,0 +1,94 @@
+# Import necessary modules
+# PyJWT for issuing locally signed ID tokens
+# firebase_admin, patched so no Google credentials or network access are needed;
+# imported on use so startup measurements include loading it
+# Motor database handles swapped in for a local mongod or an in-memory stand-in
+
+import sys
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import jwt
+
+# Secret used to sign benchmark tokens
+STUB_TOKEN_SECRET = "status-app-benchmark-secret"
+
+
+# Issue an ID token for the given email, accepted by the stubbed verify_id_token
+def issue_token(email: str, ttl: int = 3600) -> str:
+    now = int(time.time())
+    claims = {"email": email, "iat": now, "exp": now + ttl, "sub": email}
+    return jwt.encode(claims, STUB_TOKEN_SECRET, algorithm="HS256")
+
+
+# Verify a token issued by issue_token, mirroring firebase_admin.auth.verify_id_token
+def _verify_id_token(token: str, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+    try:
+        return jwt.decode(token, STUB_TOKEN_SECRET, algorithms=["HS256"])
+    except jwt.PyJWTError as e:
+        from firebase_admin.auth import InvalidIdTokenError
+
+        raise InvalidIdTokenError(str(e))
+
+
+# Create a user record without calling Firebase
+def _create_user(**kwargs: Any) -> SimpleNamespace:
+    return SimpleNamespace(uid=uuid.uuid4().hex, **kwargs)
+
+
+# Look accounts up by identifier without calling Firebase, none of them exist
+def _get_users(identifiers: List[Any], *args: Any, **kwargs: Any) -> SimpleNamespace:
+    return SimpleNamespace(users=[], not_found=list(identifiers))
+
+
+# Import or delete user records without calling Firebase, every one succeeds
+def _import_users(users: List[Any], *args: Any, **kwargs: Any) -> SimpleNamespace:
+    return SimpleNamespace(success_count=len(users), failure_count=0, errors=[])
+
+
+def _delete_users(uids: List[str], *args: Any, **kwargs: Any) -> SimpleNamespace:
+    return SimpleNamespace(success_count=len(uids), failure_count=0, errors=[])
+
+
+# Replace the Firebase Admin SDK calls used by the app with local stubs
+# Must run before the app's lifespan starts, as it initializes Firebase
+def install_firebase_stub() -> None:
+    import firebase_admin
+    from firebase_admin import auth as firebase_auth
+
+    firebase_admin._apps.setdefault(firebase_admin._DEFAULT_APP_NAME, object())
+    firebase_auth.verify_id_token = _verify_id_token
+    firebase_auth.create_user = _create_user
+    firebase_auth.get_users = _get_users
+    firebase_auth.import_users = _import_users
+    firebase_auth.delete_users = _delete_users
+
+
+# Create an in-memory Motor-compatible database
+# Requires the optional mongomock-motor package
+def in_memory_database(name: str):
+    try:
+        from mongomock.collection import BulkOperationBuilder
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("The in-memory database requires: pip install mongomock-motor")
+    # PyMongo 4.9+ passes the sort option of UpdateOne to bulk builders, which
+    # mongomock does not know yet; the app never sets it
+    add_update = BulkOperationBuilder.add_update
+    if not getattr(add_update, "drops_sort", False):
+
+        def add_update_without_sort(self, *args, sort=None, **kwargs):
+            return add_update(self, *args, **kwargs)
+
+        add_update_without_sort.drops_sort = True
+        BulkOperationBuilder.add_update = add_update_without_sort
+    return AsyncMongoMockClient()[name]
+
+
+# Point the app at the given database handle instead of connecting to MONGO_URL
+def use_database(database) -> None:
+    from app.db import collections
+
+    collections.use_database(database)
@@ -0,0 +1,403 @@
+"""Websocket scale and broadcast latency benchmark
+
+Usage:
+  python -m benchmarks.ws_load --in-memory --steps 100,1000,5000,10000 --plot ws.png
+  python -m benchmarks.ws_load --url http://127.0.0.1:8000 --tenant-file /tmp/tenants.json
+
+Opens an increasing number of /ws clients against a local server, started through
+benchmarks.serve unless --url is given, then updates services and incidents through
+the HTTP routes. Every update carries a sequence number in its description, so each
+client can match the broadcast it receives to the time the update was sent.
+For every connection count it reports the end-to-end delivery latency over all
+clients, the time the triggering request took (it awaits the broadcast), and the
+server's resident memory per connection.
+
+The slow-consumer scenario makes a fraction of the clients read one message per
+--slow-delay seconds with a one-message receive queue, so their TCP buffers fill
+up and the server feels the backpressure.
+
+All clients share one event loop: at high connection counts the reported latency
+includes the time this process needs to read every copy of the broadcast.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+from websockets.asyncio.client import connect
+
+from benchmarks.routes import incident_update_body, percentile
+from benchmarks.seed import Tenant
+from benchmarks.serve import raise_file_limit, start_server
+from benchmarks.stubs import issue_token
+
+# Marker embedded in the description of every triggered update
+MARKER = re.compile(r"wsload-(\d+)-")
+
+
+# Delivery bookkeeping shared by all clients
+class Deliveries:
+    def __init__(self):
+        self.sent_at: Dict[int, float] = {}
+        self.latencies: Dict[int, List[float]] = {}
+        self.slow_received = 0
+        self.expected = 0
+        self._waiters: Dict[int, asyncio.Event] = {}
+
+    def expect(self, seq: int) -> asyncio.Event:
+        self.latencies[seq] = []
+        self._waiters[seq] = asyncio.Event()
+        self.sent_at[seq] = time.perf_counter()
+        return self._waiters[seq]
+
+    def record(self, raw: str, received_at: float, slow: bool) -> None:
+        match = MARKER.search(raw)
+        if not match:
+            return
+        seq = int(match.group(1))
+        if seq not in self.sent_at:
+            return
+        if slow:
+            self.slow_received += 1
+            return
+        latencies = self.latencies[seq]
+        latencies.append(received_at - self.sent_at[seq])
+        if len(latencies) >= self.expected:
+            self._waiters[seq].set()
+
+
+# One websocket client reading broadcasts until cancelled
+async def run_client(
+    url: str,
+    deliveries: Deliveries,
+    connected: asyncio.Event,
+    slow_delay: float = 0.0,
+) -> None:
+    slow = slow_delay > 0
+    async with connect(
+        url,
+        max_queue=1 if slow else 64,
+        ping_interval=None,
+        open_timeout=60,
+        max_size=None,
+    ) as websocket:
+        connected.set()
+        async for raw in websocket:
+            deliveries.record(raw, time.perf_counter(), slow)
+            if slow:
+                await asyncio.sleep(slow_delay)
+
+
+# A running client and whether it is a slow consumer
+@dataclass
+class Client:
+    task: asyncio.Task
+    slow: bool
+
+
+# Results of one connection count in one scenario
+@dataclass
+class StepResult:
+    scenario: str
+    connections: int
+    slow_connections: int
+    updates: int
+    delivered: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    max_ms: float
+    trigger_p50_ms: float
+    trigger_max_ms: float
+    rss_mb: Optional[float]
+    kb_per_connection: Optional[float]
+    errors: Dict[str, int] = field(default_factory=dict)
+
+
+# Resident memory of a local process in kB, None when it cannot be read
+def read_rss_kb(pid: Optional[int]) -> Optional[int]:
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+# Benchmark driving one server through every scenario and connection count
+class WebsocketLoad:
+    def __init__(self, args: argparse.Namespace, base_url: str, tenant: Tenant, pid: Optional[int]):
+        self.args = args
+        self.base_url = base_url
+        self.ws_url = re.sub(r"^http", "ws", base_url) + "/ws"
+        self.tenant = tenant
+        self.pid = pid
+        self.rng = random.Random(args.seed)
+        self.padding = "x" * args.payload_bytes
+        self.seq = 0
+
+    # Send one service or incident update carrying the sequence marker
+    async def trigger(self, http: httpx.AsyncClient, seq: int):
+        marker = f"wsload-{seq}- {self.padding}"
+        if seq % 2 == 0 or not self.tenant.incident_ids:
+            body = {
+                "service_id": str(self.rng.choice(self.tenant.service_ids)),
+                "name": "Load Service",
+                "description": marker,
+                "status": self.rng.choice(["operational", "degraded_performance", "outage"]),
+                "org_id": str(self.tenant.org_id),
+            }
+            return await http.post("/service/update-service", json=body)
+        body = incident_update_body(self.tenant, self.rng)
+        body["description"] = marker
+        return await http.post("/incident/update-incident", json=body)
+
+    async def run_step(
+        self,
+        http: httpx.AsyncClient,
+        scenario: str,
+        clients: List[Client],
+        deliveries: Deliveries,
+        connections: int,
+        rss_base: Optional[int],
+    ) -> StepResult:
+        slow_fraction = self.args.slow_fraction if scenario == "slow" else 0.0
+        slow_open = sum(client.slow for client in clients)
+        # Open the missing clients in batches to stay under the listen backlog
+        while len(clients) < connections:
+            batch = min(self.args.connect_batch, connections - len(clients))
+            events = []
+            for _ in range(batch):
+                # Spread the slow consumers evenly over the population
+                slow = slow_open < round((len(clients) + 1) * slow_fraction)
+                slow_open += slow
+                connected = asyncio.Event()
+                task = asyncio.create_task(
+                    run_client(
+                        self.ws_url,
+                        deliveries,
+                        connected,
+                        self.args.slow_delay if slow else 0.0,
+                    )
+                )
+                clients.append(Client(task, slow))
+                events.append(connected)
+            await asyncio.wait_for(
+                asyncio.gather(*(event.wait() for event in events)), timeout=120
+            )
+        await asyncio.sleep(self.args.settle)
+        slow_count = sum(client.slow for client in clients)
+        deliveries.expected = sum(
+            not client.slow and not client.task.done() for client in clients
+        )
+        rss = read_rss_kb(self.pid)
+
+        latencies: List[float] = []
+        triggers: List[float] = []
+        errors: Dict[str, int] = {}
+        delivered = 0
+        for _ in range(self.args.updates):
+            self.seq += 1
+            done = deliveries.expect(self.seq)
+            start = time.perf_counter()
+            try:
+                response = await self.trigger(http, self.seq)
+                key = str(response.status_code) if response.status_code >= 400 else None
+            except httpx.HTTPError as e:
+                key = type(e).__name__
+            triggers.append(time.perf_counter() - start)
+            if key:
+                errors[key] = errors.get(key, 0) + 1
+                continue
+            try:
+                await asyncio.wait_for(done.wait(), timeout=self.args.timeout)
+            except asyncio.TimeoutError:
+                errors["timeout"] = errors.get("timeout", 0) + 1
+            received = deliveries.latencies[self.seq]
+            delivered += len(received)
+            latencies.extend(received)
+            await asyncio.sleep(self.args.interval)
+
+        latencies.sort()
+        triggers.sort()
+        expected = deliveries.expected * self.args.updates
+        return StepResult(
+            scenario=scenario,
+            connections=connections,
+            slow_connections=slow_count,
+            updates=self.args.updates,
+            delivered=round(delivered / expected, 4) if expected else 0.0,
+            p50_ms=round(percentile(latencies, 50) * 1000, 3),
+            p90_ms=round(percentile(latencies, 90) * 1000, 3),
+            p99_ms=round(percentile(latencies, 99) * 1000, 3),
+            max_ms=round(latencies[-1] * 1000, 3) if latencies else 0.0,
+            trigger_p50_ms=round(percentile(triggers, 50) * 1000, 3),
+            trigger_max_ms=round(triggers[-1] * 1000, 3) if triggers else 0.0,
+            rss_mb=round(rss / 1024, 1) if rss else None,
+            kb_per_connection=(
+                round((rss - rss_base) / connections, 2)
+                if rss and rss_base and connections
+                else None
+            ),
+            errors=errors,
+        )
+
+    async def run_scenario(self, http: httpx.AsyncClient, scenario: str) -> List[StepResult]:
+        deliveries = Deliveries()
+        clients: List[Client] = []
+        rss_base = read_rss_kb(self.pid)
+        results = []
+        try:
+            for connections in self.args.steps:
+                result = await self.run_step(
+                    http, scenario, clients, deliveries, connections, rss_base
+                )
+                results.append(result)
+                print(
+                    f"{scenario:6} {connections:>7} {result.delivered:>9.2%} "
+                    f"{result.p50_ms:>9} {result.p99_ms:>9} {result.max_ms:>9} "
+                    f"{result.trigger_p50_ms:>10} {result.kb_per_connection or '-':>8} "
+                    f"{result.errors or ''}"
+                )
+        finally:
+            for client in clients:
+                client.task.cancel()
+            await asyncio.gather(
+                *(client.task for client in clients), return_exceptions=True
+            )
+            # Let the server notice the closed sockets before the next scenario
+            await asyncio.sleep(self.args.settle)
+        return results
+
+
+def write_outputs(args: argparse.Namespace, results: List[StepResult]) -> None:
+    rows = [asdict(result) for result in results]
+    with open(args.csv, "w", newline="") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, "errors": json.dumps(row["errors"])})
+    print(f"\nWrote results to {args.csv}")
+    if not args.plot:
+        return
+    try:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("Plotting requires matplotlib, the CSV holds the same data")
+        return
+    figure, (latency_axis, memory_axis) = plt.subplots(1, 2, figsize=(12, 5))
+    for scenario in sorted({result.scenario for result in results}):
+        points = [result for result in results if result.scenario == scenario]
+        counts = [result.connections for result in points]
+        latency_axis.plot(counts, [r.p50_ms for r in points], marker="o", label=f"{scenario} p50")
+        latency_axis.plot(counts, [r.p99_ms for r in points], marker="o", linestyle="--", label=f"{scenario} p99")
+        memory_axis.plot(counts, [r.rss_mb or 0 for r in points], marker="o", label=scenario)
+    latency_axis.set(xlabel="connections", ylabel="delivery latency (ms)", title="Broadcast latency")
+    memory_axis.set(xlabel="connections", ylabel="server RSS (MB)", title="Server memory")
+    for axis in (latency_axis, memory_axis):
+        axis.set_xscale("log")
+        axis.grid(True, alpha=0.3)
+        axis.legend()
+    figure.tight_layout()
+    figure.savefig(args.plot)
+    print(f"Wrote plot to {args.plot}")
+
+
+async def main(args: argparse.Namespace) -> int:
+    print(f"Open file limit: {raise_file_limit()}")
+    server = None
+    tenant_file = args.tenant_file
+    if not args.url:
+        tenant_file = tempfile.mkstemp(suffix=".json")[1]
+        server = start_server(
+            tenant_file,
+            "--port",
+            str(args.port),
+            "--mongo-url",
+            args.mongo_url,
+            "--ws",
+            args.ws,
+            *(["--in-memory"] if args.in_memory else []),
+        )
+    base_url = args.url or f"http://127.0.0.1:{args.port}"
+    try:
+        with open(tenant_file) as handle:
+            served = json.load(handle)
+        tenant = Tenant(**served["tenants"][0])
+        pid = args.server_pid or served.get("pid")
+        load = WebsocketLoad(args, base_url, tenant, pid)
+        headers = {"Authorization": f"Bearer {issue_token(tenant.admin_email)}"}
+        results: List[StepResult] = []
+        async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=300) as http:
+            print(
+                f"\n{'scenario':6} {'clients':>7} {'delivered':>9} {'p50 ms':>9} {'p99 ms':>9} "
+                f"{'max ms':>9} {'trigger ms':>10} {'kB/conn':>8} errors"
+            )
+            for scenario in args.scenarios:
+                results += await load.run_scenario(http, scenario)
+        write_outputs(args, results)
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+            os.unlink(tenant_file)
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running benchmarks.serve, started locally when omitted")
+    parser.add_argument("--tenant-file", help="tenant file written by benchmarks.serve, required with --url")
+    parser.add_argument("--server-pid", type=int, help="server process to sample memory from, with --url")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--in-memory", action="store_true", help="use mongomock-motor instead of mongod")
+    parser.add_argument("--ws", default="auto", help="uvicorn websocket implementation")
+    parser.add_argument(
+        "--steps",
+        type=lambda value: sorted(int(step) for step in value.split(",")),
+        default=[10, 100, 1000, 5000, 10000],
+        help="comma separated connection counts",
+    )
+    parser.add_argument(
+        "--scenarios",
+        type=lambda value: value.split(","),
+        default=["normal", "slow"],
+        help="comma separated scenarios: normal, slow",
+    )
+    parser.add_argument("--updates", type=int, default=20, help="updates triggered per step")
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between updates")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for a broadcast")
+    parser.add_argument("--payload-bytes", type=int, default=8192, help="padding added to each update, large enough to fill socket buffers")
+    parser.add_argument("--slow-fraction", type=float, default=0.01, help="share of slow clients")
+    parser.add_argument("--slow-delay", type=float, default=1.0, help="seconds a slow client waits per message")
+    parser.add_argument("--connect-batch", type=int, default=500, help="clients connecting at once")
+    parser.add_argument("--settle", type=float, default=1.0, help="seconds to wait after connecting")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--csv", default="ws_load.csv", help="write results as CSV to this file")
+    parser.add_argument("--plot", help="plot latency and memory against connections (needs matplotlib)")
+    args = parser.parse_args(argv)
+    if args.url and not args.tenant_file:
+        parser.error("--url requires --tenant-file")
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,90 @@
+import asyncio
+
+from bson import ObjectId
+
+from app.core import alert_ingest
+from app.core.alert_ingest import Alert, AlertPipeline
+from app.models.api_key_model import ApiKey
+from app.models.service_model import ServiceStatus
+
+
+def _alert(fingerprint: str, firing: bool = True) -> Alert:
+    return Alert(
+        fingerprint=fingerprint,
+        service="api",
+        firing=firing,
+        status=ServiceStatus.OUTAGE,
+        title="High error rate",
+        description="",
+    )
+
+
+def _api_key() -> ApiKey:
+    return ApiKey.model_construct(id=ObjectId(), org_id=ObjectId())
+
+
+def test_failed_write_is_retried_on_next_flush(monkeypatch):
+    written = []
+    failures = [RuntimeError("database unavailable")]
+
+    async def write_alerts(org_id, entries):
+        if failures:
+            raise failures.pop()
+        written.extend((org_id, alert.fingerprint) for alert, _ in entries)
+
+    monkeypatch.setattr(alert_ingest, "write_alerts", write_alerts)
+    pipeline = AlertPipeline(max_pending=10, max_pending_per_org=10)
+    api_key = _api_key()
+    pipeline.submit(api_key, [_alert("a"), _alert("b")])
+
+    asyncio.run(pipeline.flush())
+    assert written == []
+
+    asyncio.run(pipeline.flush())
+    assert sorted(written) == [(api_key.org_id, "a"), (api_key.org_id, "b")]
+
+
+def test_requeue_keeps_newer_state_of_an_alert(monkeypatch):
+    written = []
+    pipeline = AlertPipeline(max_pending=10, max_pending_per_org=10)
+    api_key = _api_key()
+
+    async def write_alerts(org_id, entries):
+        if not written:
+            written.append(None)
+            # The alert resolves while its firing state is being written
+            pipeline.submit(api_key, [_alert("a", firing=False)])
+            raise RuntimeError("database unavailable")
+        written.extend((alert.fingerprint, alert.firing) for alert, _ in entries)
+
+    monkeypatch.setattr(alert_ingest, "write_alerts", write_alerts)
+    pipeline.submit(api_key, [_alert("a")])
+
+    asyncio.run(pipeline.flush())
+    asyncio.run(pipeline.flush())
+    assert written[1:] == [("a", False)]
+
+
+def test_requeue_drops_alerts_beyond_the_caps(monkeypatch):
+    async def write_alerts(org_id, entries):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(alert_ingest, "write_alerts", write_alerts)
+    pipeline = AlertPipeline(max_pending=10, max_pending_per_org=2)
+    api_key = _api_key()
+    pipeline.submit(api_key, [_alert("a"), _alert("b")])
+
+    async def flush_with_newer_alert():
+        flush = pipeline.flush()
+        task = asyncio.ensure_future(flush)
+        await asyncio.sleep(0)
+        pipeline.submit(api_key, [_alert("c")])
+        await task
+
+    asyncio.run(flush_with_newer_alert())
+    pending = pipeline._pending[api_key.org_id]
+    assert len(pending) == 2
+    assert "c" in pending
+    # The dropped alert is forgotten, so its sender's next notification is accepted
+    dropped = ({"a", "b"} - set(pending)).pop()
+    assert (api_key.org_id, dropped) not in pipeline._seen